@@ -1,11 +1,23 @@
+import startup
 import streamlit as st
 import data_manager_sql as dm
+import change_feed
 from models import Project, Hypothesis
 import time
-# Replaced agraph with st_cytoscape
-from st_cytoscape import cytoscape
 import datetime
 import os 
+import tempfile
+import uuid
+import exporter
+from contextlib import nullcontext
+from database import collect_queries, routing_scope, start_pool_warmup
+
+# Replaced agraph with st_cytoscape; the component loads on the first graph render
+st_cytoscape = startup.LazyModule("st_cytoscape")
+
+startup.mark("imports done")
+# Schema check and first connections run while the first page renders
+start_pool_warmup()
 
 st.set_page_config(page_title="Research Manager", layout="wide")
 
@@ -26,7 +38,7 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def build_project_summary(project_id, snapshot_data=None):
+def build_project_summary(project_id, snapshot_data=None, live=False):
     project = next((p for p in dm.get_projects() if p.id == project_id), None)
     if not project: return "Project not found."
 
@@ -58,6 +70,11 @@ def build_project_summary(project_id, snapshot_data=None):
         - ⚠️ Tested: {statuses['tested']}
         - 🟦 Open: {statuses['open']}
     """
+    if live:
+        # Stored roll-ups of the live tree (see status_rollup.py); a past version has none
+        derived = dm.get_status_summary(project_id)["derived"]
+        summary += (f"- **Rolled up**: {derived.get('proven', 0)} proven, {derived.get('disproven', 0)} disproven, "
+                    f"{derived.get('tested', 0)} tested, {derived.get('open', 0)} open\n")
     return summary
 
 # --- CUSTOM TREE LAYOUT ALGORITHM ---
@@ -112,7 +129,18 @@ def calculate_tree_positions(root_id, snapshot_data=None):
     
     return positions
 
-def build_cytoscape_elements(project_id: str, north_star_id: str, snapshot_data=None, default_positions=None, force_positions=False):
+def build_cytoscape_elements(project_id: str, north_star_id: str, snapshot_data=None, default_positions=None, force_positions=False, selected_id=None, adjacency=None, changes=None):
+    """
+    Nodes are laid out from the tree. Edges come from `adjacency` (the project's
+    tree links and cross-links, see dm.get_project_edges) when given, else from
+    the tree alone, as in historical versions. `changes` (from dm.diff_versions)
+    marks added, changed and moved nodes for highlighting.
+    """
+    change_of = {}
+    for kind in ("moved", "changed", "added"):  # a node both moved and changed shows as changed
+        for h_id in (changes or {}).get(kind, ()):
+            change_of[h_id] = kind
+
     # Calculate positions via backend engine if strict forced
     if force_positions:
          positions = calculate_tree_positions(north_star_id, snapshot_data)
@@ -150,25 +178,154 @@ def build_cytoscape_elements(project_id: str, north_star_id: str, snapshot_data=
              node_data["position"] = positions[h.id]
         
         # If no position is set, Cytoscape preset layout might place it at 0,0, so we ensured defaults
+
+        if h.id == selected_id:
+             node_data["selected"] = True
+        if h.id in change_of:
+             node_data["data"]["change"] = change_of[h.id]
             
         elements.append(node_data)
         
         for child_id in h.children:
-            edge_id = f"e_{h.id}_{child_id}"
-            elements.append({
-                "data": {
-                    "id": edge_id,
-                    "source": h.id,
-                    "target": child_id,
-                }
-            })
+            if adjacency is None:
+                elements.append(tree_edge(h.id, child_id))
             traverse(child_id)
 
+    def tree_edge(source, target):
+        return {"data": {"id": f"e_{source}_{target}", "source": source, "target": target, "kind": "tree"}}
+
     traverse(north_star_id)
+    if adjacency is not None:
+        shown = {el["data"]["id"] for el in elements}
+        for link in adjacency:
+            if link["source"] not in shown or link["target"] not in shown:
+                continue
+            if link["kind"] == "tree":
+                elements.append(tree_edge(link["source"], link["target"]))
+            else:
+                elements.append({"data": {"id": f"link_{link['id']}", "source": link["source"],
+                                          "target": link["target"], "kind": link["kind"], "link_id": link["id"]}})
     # Sort elements by ID
     elements.sort(key=lambda x: x["data"]["id"])
     return elements
 
+def sync_live_project(project_id):
+    """
+    Returns the session's node map for a project, kept current from the change feed.
+    Only changes after the stored cursor are fetched and applied; a full reload
+    happens on first open or when a change can't be patched in (undo).
+    """
+    live = st.session_state.get("live_project")
+    if live and live["project_id"] == project_id:
+        changes, cursor = dm.get_changes_since(project_id, live["cursor"])
+        if not changes:
+            return live["nodes"]
+        if change_feed.apply_changes(live["nodes"], None, changes):
+            live["cursor"] = cursor
+            return live["nodes"]
+
+    nodes, cursor = dm.load_project_nodes(project_id)
+    st.session_state["live_project"] = {"project_id": project_id, "nodes": nodes, "cursor": cursor}
+    return nodes
+
+@st.fragment(run_every=5)
+def watch_project_changes(project_id):
+    """Cheap poll of the feed head; reruns the page only when someone else changed the project."""
+    live = st.session_state.get("live_project")
+    if live and live["project_id"] == project_id and dm.get_latest_revision(project_id) > live["cursor"]:
+        st.rerun()
+
+def parse_metrics_input(raw: str) -> dict:
+    """Parses 'accuracy=0.91, loss=0.3' into {"accuracy": 0.91, "loss": 0.3}."""
+    metrics = {}
+    for part in (raw or "").replace(";", ",").split(","):
+        if "=" not in part:
+            continue
+        name, value = part.split("=", 1)
+        try:
+            metrics[name.strip()] = float(value)
+        except ValueError:
+            continue
+    return metrics
+
+def render_search_sidebar():
+    """Sidebar search box. Picking a hit opens its project with the node selected."""
+    query = st.sidebar.text_input("🔍 Search", placeholder="Hypotheses & evidence...", key="search_query")
+    if not query:
+        return
+
+    if st.session_state.get("search_last_query") != query:
+        st.session_state["search_last_query"] = query
+        st.session_state["search_page"] = 0
+    page = st.session_state.get("search_page", 0)
+    page_size = 10
+
+    results = dm.search_hypotheses(query, page=page, page_size=page_size)
+    if not results["hits"]:
+        st.sidebar.caption("No matches.")
+        return
+
+    st.sidebar.caption(f"{results['total']} matches")
+    for i, hit in enumerate(results["hits"]):
+        icon = "💡" if hit["kind"] == "hypothesis" else "🧪"
+        st.sidebar.markdown(f"{icon} {hit['snippet']}")
+        label = f"{hit['project_title'] or 'Unknown Project'} › {(hit['hypothesis_statement'] or '')[:30]}"
+        if st.sidebar.button(label, key=f"search_hit_{page}_{i}_{hit['entity_id']}"):
+            st.session_state["active_project"] = hit["project_id"]
+            st.session_state["focus_node"] = hit["hypothesis_id"]
+            st.session_state["nav_request"] = "Project View"
+            st.session_state["graph_version"] = st.session_state.get("graph_version", 0) + 1
+            st.rerun()
+
+    col_prev, col_next = st.sidebar.columns(2)
+    if page > 0 and col_prev.button("◀ Prev", key="search_prev"):
+        st.session_state["search_page"] = page - 1
+        st.rerun()
+    if (page + 1) * page_size < results["total"] and col_next.button("Next ▶", key="search_next"):
+        st.session_state["search_page"] = page + 1
+        st.rerun()
+
+def render_project_list():
+    """Dashboard listing, one keyset page at a time, most recently active first."""
+    col_filter, col_status = st.columns([0.7, 0.3])
+    title_prefix = col_filter.text_input("Filter by title", placeholder="Title starts with...", key="dashboard_prefix")
+    status = col_status.selectbox("Status", ["all"] + dm.get_project_statuses(), key="dashboard_status")
+    filters = (title_prefix, status)
+    if st.session_state.get("dashboard_filters") != filters:
+        # Cursors of earlier pages belong to the old filters
+        st.session_state["dashboard_filters"] = filters
+        st.session_state["dashboard_cursors"] = [None]
+    cursors = st.session_state["dashboard_cursors"]
+
+    page = dm.get_dashboard_projects(cursor=cursors[-1], status=None if status == "all" else status,
+                                     title_prefix=title_prefix or None)
+    if not page["projects"]:
+        st.caption("No projects match.")
+    for p in page["projects"]:
+        with st.container():
+            col1, col2 = st.columns([0.8, 0.2])
+            col1.markdown(f"### {p['title']}")
+            counts = p["status_counts"]
+            last_update = (datetime.datetime.fromtimestamp(p["last_update"]).strftime('%Y-%m-%d %H:%M')
+                           if p["last_update"] else "no evidence yet")
+            col1.caption(
+                f"Status: {p['status']} · {p['node_count']} hypotheses "
+                f"({counts['proven']} proven, {counts['disproven']} disproven, {counts['tested']} tested, "
+                f"{counts['open']} open) · Last update: {last_update}"
+            )
+            if col2.button(f"Open", key=p["id"]):
+                st.session_state["active_project"] = p["id"]
+                st.session_state["nav_request"] = "Project View"
+                st.rerun()
+
+    col_prev, col_next = st.columns(2)
+    if len(cursors) > 1 and col_prev.button("◀ Newer", key="dashboard_prev"):
+        cursors.pop()
+        st.rerun()
+    if page["next_cursor"] and col_next.button("Older ▶", key="dashboard_next"):
+        cursors.append(page["next_cursor"])
+        st.rerun()
+
 def main():
     st.sidebar.title("Research Manager")
     
@@ -180,6 +337,7 @@ def main():
         st.session_state["current_page"] = "Dashboard"
         
     page = st.sidebar.radio("Navigate", ["Dashboard", "Project View", "People View"], key="current_page")
+    render_search_sidebar()
     
     if page == "Dashboard":
         st.title("Projects Dashboard")
@@ -197,16 +355,7 @@ def main():
         
         st.divider()
         st.subheader("Active Projects")
-        projects = dm.get_projects()
-        for p in projects:
-            with st.container():
-                col1, col2 = st.columns([0.8, 0.2])
-                col1.markdown(f"### {p.title}")
-                col1.caption(f"Status: {p.status}")
-                if col2.button(f"Open", key=p.id):
-                    st.session_state["active_project"] = p.id
-                    st.session_state["nav_request"] = "Project View"
-                    st.rerun() 
+        render_project_list()
 
     elif page == "Project View":
         if "active_project" not in st.session_state:
@@ -233,22 +382,64 @@ def main():
              mime="text/markdown"
         )
 
+        # Full export: streamed to a temp file (spills to disk when large), built only on request
+        export_choices = {"Markdown": ("markdown", None), "JSON Lines": ("jsonl", None)}
+        export_choices.update({f"CSV: {t}": ("csv", t) for t in exporter.CSV_TABLES})
+        export_choice = st.sidebar.selectbox("Full Export", list(export_choices))
+        if st.sidebar.button("📦 Prepare Export"):
+            fmt, table = export_choices[export_choice]
+            spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+            for chunk in dm.export_project(project.id, fmt, table or "updates"):
+                spool.write(chunk.encode("utf-8"))
+            spool.seek(0)
+            st.sidebar.download_button(
+                label="⬇️ Download Export",
+                data=spool,
+                file_name=exporter.export_filename(project.title, fmt, table),
+                mime=exporter.FORMATS[fmt][1],
+            )
+
         st.sidebar.header("History & Versioning")
-        snapshots = dm.get_snapshots(project.id)
+        history = dm.get_snapshot_history(project.id)
+        writer_stats = dm.get_snapshot_writer_stats()
+        if writer_stats["queue_depth"] or writer_stats["in_flight"]:
+            st.sidebar.caption("⏳ Saving latest version...")
         
-        selected_snapshot_ts = None
-        if snapshots:
-            options = ["Current"] + [datetime.datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S') for ts in snapshots]
-            selection = st.sidebar.selectbox("View Version", options)
-            
-            if selection != "Current":
-                idx = options.index(selection) - 1
-                selected_snapshot_ts = snapshots[idx]
-                st.warning(f"Viewing historical version: {selection}. Read-only Mode.")
+        selected_version = None
+        version_changes = None
+        if history:
+            labels = {
+                entry["version"]: datetime.datetime.fromtimestamp(entry["taken_at"]).strftime('%Y-%m-%d %H:%M:%S')
+                + (f" · {entry['action']}" if entry["action"] else "")
+                for entry in history
+            }
+            label = lambda v: "Current" if v is None else labels[v]
+            selected_version = st.sidebar.selectbox("View Version", [None] + list(labels), format_func=label)
+            if selected_version is not None:
+                st.warning(f"Viewing historical version: {label(selected_version)}. Read-only Mode.")
+
+            # Highlight what changed between another version and the one shown
+            compare_options = [None] + [v for v in labels if v != selected_version]
+            compare_version = st.sidebar.selectbox("Highlight changes since", compare_options,
+                                                   format_func=lambda v: "Nothing" if v is None else labels[v])
+            if compare_version is not None:
+                version_changes = dm.diff_versions(project.id, compare_version, selected_version)
+        if version_changes:
+            st.sidebar.caption(
+                f"🟢 {len(version_changes['added'])} added · 🟠 {len(version_changes['changed'])} changed · "
+                f"🟣 {len(version_changes['moved'])} moved · {len(version_changes['removed'])} removed"
+            )
 
         snapshot_data = None
-        if selected_snapshot_ts:
-            snapshot_data = dm.load_snapshot_hypotheses(project.id, selected_snapshot_ts)
+        if selected_version:
+            snapshot_data = dm.load_snapshot_hypotheses(project.id, selected_version)
+
+        # Graph and summary read from the live node map (or the selected version)
+        if snapshot_data:
+            graph_data = snapshot_data
+        else:
+            graph_data = sync_live_project(project.id)
+            watch_project_changes(project.id)
 
         # --- LAYOUT CONTROL (REMOVED DROPDOWN) ---
         
@@ -283,9 +474,12 @@ def main():
             elements = build_cytoscape_elements(
                 project.id, 
                 project.north_star_hypothesis_id, 
-                snapshot_data, 
+                graph_data, 
                 default_positions=positions, # Fallback
-                force_positions=force_positions
+                force_positions=force_positions,
+                selected_id=st.session_state.get("focus_node"),
+                adjacency=None if snapshot_data else dm.get_project_edges(project.id),
+                changes=version_changes,
             )
             
             stylesheet = [
@@ -331,6 +525,9 @@ def main():
                 {"selector": "node[status='disproven']", "style": {"background-color": "#e74c3c"}},
                 {"selector": "node[status='tested']", "style": {"background-color": "#f1c40f"}},
                 {"selector": "node[status='open']", "style": {"background-color": "#3498db"}},
+                {"selector": "node[change='added']", "style": {"border-width": 5, "border-color": "#27ae60"}},
+                {"selector": "node[change='changed']", "style": {"border-width": 5, "border-color": "#e67e22"}},
+                {"selector": "node[change='moved']", "style": {"border-width": 5, "border-color": "#8e44ad", "border-style": "dashed"}},
                 {
                     "selector": "edge",
                     "style": {
@@ -341,11 +538,14 @@ def main():
                         "target-arrow-color": "#95a5a6"
                     }
                 },
+                {"selector": "edge[kind='subhypothesis']", "style": {"line-style": "dashed"}},
+                {"selector": "edge[kind='supports']", "style": {"line-style": "dashed", "line-color": "#27ae60", "target-arrow-color": "#27ae60"}},
+                {"selector": "edge[kind='depends_on']", "style": {"line-style": "dotted", "line-color": "#8e44ad", "target-arrow-color": "#8e44ad"}},
                 {"selector": "edge:selected", "style": {"line-color": "#e74c3c", "target-arrow-color": "#e74c3c", "width": 6}}
             ]
 
             # Render
-            selected_element = cytoscape(
+            selected_element = st_cytoscape.cytoscape(
                 elements,
                 stylesheet,
                 layout_config,
@@ -363,8 +563,7 @@ def main():
             
             st.subheader("Settings")
             # --- UNDO OPERATIONS ---
-            snap_list = dm.get_snapshots(project.id)
-            if len(snap_list) >= 2 and not selected_snapshot_ts:
+            if len(history) >= 2 and not selected_version:
                 if st.button("↩️ Undo Last Change", help="Revert the last topology change (Delete, Reverse, etc.)"):
                      if dm.undo_last_action(project.id):
                          st.success("Undone!")
@@ -372,7 +571,7 @@ def main():
                          st.session_state["graph_version"] += 1
                          st.rerun()
                      else:
-                         st.error("Could not undo.")
+                         st.error("Could not undo: nothing to go back to, or someone else has edited since your change.")
 
             # --- SELECTION & MANUAL CONTROLS ---
             clicked_node_id = None
@@ -398,7 +597,16 @@ def main():
                     elif isinstance(first_edge, dict):
                          clicked_edge_id = first_edge.get("data", {}).get("id") or first_edge.get("id")
 
-            if clicked_node_id and not selected_snapshot_ts:
+            # The clicked edge's endpoints and kind come from its element data, never from its id
+            clicked_edge = next((el["data"] for el in elements if el["data"]["id"] == clicked_edge_id), None) if clicked_edge_id else None
+
+            # A search hit opens its node until the user clicks something else
+            if clicked_node_id or clicked_edge_id:
+                st.session_state.pop("focus_node", None)
+            elif st.session_state.get("focus_node"):
+                clicked_node_id = st.session_state["focus_node"]
+
+            if clicked_node_id and not selected_version:
                 h_clicked = dm.get_hypothesis(clicked_node_id, snapshot_data)
                 
                 if h_clicked:
@@ -408,22 +616,45 @@ def main():
                     
                     # Position controls removed (Cleanup)
 
-                    st.caption(f"Status: {h_clicked.status}")
+                    derived = getattr(h_clicked, "derived_status", None)
+                    st.caption(f"Status: {h_clicked.status}" + (f" · rolls up to {derived}" if derived and derived != h_clicked.status else ""))
 
                     with st.expander("Scientific Evidence", expanded=True):
-                        # Scrollable container for reading evidence
+                        counts = dm.get_evidence_counts(h_clicked.id)
+                        if counts["total"]:
+                            st.caption(f"✅ {counts['supporting']} supporting · ❌ {counts['refuting']} refuting · "
+                                       f"⬜ {counts['neutral']} neutral")
+                        # Scrollable container for reading evidence, newest first, one page at a time
                         with st.container(height=200):
-                            if h_clicked.updates:
-                                for u in h_clicked.updates:
+                            # Cursors of the pages loaded so far; "Load more" at the bottom adds the next
+                            cursors = st.session_state.setdefault(f"timeline_{h_clicked.id}", [None])
+                            shown, next_cursor = 0, None
+                            for cursor in cursors:
+                                page = dm.get_updates(h_clicked.id, before=cursor)
+                                for u in page["items"]:
                                     icon = "⬜"
-                                    if u.evidence_status == "supporting": icon = "✅"
-                                    elif u.evidence_status == "refuting": icon = "❌"
-                                    st.markdown(f"{icon} **{u.author}**: {u.content}")
-                            else:
+                                    if u["evidence_status"] == "supporting": icon = "✅"
+                                    elif u["evidence_status"] == "refuting": icon = "❌"
+                                    st.markdown(f"{icon} **{u['author']}**: {u['content']}")
+                                shown += len(page["items"])
+                                next_cursor = page["next_cursor"]
+                            if not shown:
                                 st.caption("No evidence logged.")
+                            elif next_cursor and st.button(f"Load more ({shown} of {counts['total']})", key=f"more_{h_clicked.id}"):
+                                cursors.append(next_cursor)
+                                st.rerun()
+
+                        series = dm.get_metric_series(h_clicked.id)
+                        if not series.empty:
+                            st.line_chart(series, height=160)
+                        if h_clicked.metrics:
+                            st.caption("Targets: " + ", ".join(
+                                f"{m['name']} {'≤' if m.get('goal') == 'minimize' else '≥'} {m['target']}"
+                                for m in h_clicked.metrics if isinstance(m, dict) and "name" in m
+                            ))
                             
                         st.divider()
-                        action = st.radio("Log Data", ["Update", "Set Status"], key=f"sci_act_{h_clicked.id}")
+                        action = st.radio("Log Data", ["Update", "Set Status", "Set Target"], key=f"sci_act_{h_clicked.id}")
                         if action == "Update":
                              with st.form(f"up_{h_clicked.id}"):
                                 existing_authors = dm.get_all_authors()
@@ -436,19 +667,28 @@ def main():
                                     final_auth = sel_auth
                                     
                                 cont = st.text_area("Content")
+                                raw_metrics = st.text_input("Metrics", placeholder="accuracy=0.91, loss=0.3")
                                 ev = st.selectbox("Type", ["neutral", "supporting", "refuting"])
                                 if st.form_submit_button("Log"):
                                     if final_auth and cont:
-                                        dm.add_update(h_clicked.id, final_auth, cont, {}, ev)
+                                        dm.add_update(h_clicked.id, final_auth, cont, parse_metrics_input(raw_metrics), ev)
                                         st.rerun()
 
                         elif action == "Set Status":
                             ns = st.selectbox("Status", ["open", "tested", "proven", "disproven"])
                             if st.button("Update"):
-                                h_clicked.status = ns
-                                dm.save_hypothesis(h_clicked)
+                                dm.set_hypothesis_status(h_clicked.id, ns)
                                 st.rerun()
 
+                        elif action == "Set Target":
+                            with st.form(f"target_{h_clicked.id}"):
+                                t_name = st.text_input("Metric", placeholder="accuracy")
+                                t_value = st.number_input("Target", value=0.0, format="%.4f")
+                                t_goal = st.selectbox("Goal", ["maximize", "minimize"])
+                                if st.form_submit_button("Save Target") and t_name.strip():
+                                    dm.set_metric_target(h_clicked.id, t_name.strip(), t_value, t_goal)
+                                    st.rerun()
+
                     st.divider()
                     st.markdown("#### Node Operations")
                     if st.button("🗑️ Delete Node & Children", type="primary"):
@@ -461,38 +701,66 @@ def main():
                             dm.add_subhypothesis(clicked_node_id, new_stmt)
                             st.rerun()
 
-            elif clicked_edge_id and not selected_snapshot_ts:
-                parts = clicked_edge_id.split("_")
-                if len(parts) >= 3:
-                    source_id = parts[1]
-                    target_id = parts[2]
-                    
-                    st.info(f"**Selected Edge**")
-                    col_rev, col_del = st.columns(2)
-                    with col_rev:
-                        if st.button("🔄 Reverse Direction"):
+                    others = {h_id: node["statement"] for h_id, node in graph_data.items() if h_id != clicked_node_id}
+                    if others:
+                        with st.form(f"link_{clicked_node_id}"):
+                            link_target = st.selectbox("Link to", list(others), format_func=lambda h_id: others[h_id][:60])
+                            link_kind = st.selectbox("As", ["supports", "depends_on", "subhypothesis"],
+                                                     format_func=lambda k: {"supports": "supports it", "depends_on": "depends on it",
+                                                                            "subhypothesis": "parent of it"}[k])
+                            if st.form_submit_button("Link"):
+                                try:
+                                    dm.link_hypotheses(clicked_node_id, link_target, link_kind)
+                                    st.rerun()
+                                except ValueError as e:
+                                    st.error(str(e))
+
+            elif clicked_edge and clicked_edge["kind"] != "tree" and not selected_version:
+                st.info("**Selected Link**")
+                if st.button("✂️ Remove Link"):
+                    dm.unlink_hypotheses(clicked_edge["link_id"])
+                    st.rerun()
+            elif clicked_edge and not selected_version:
+                target_id = clicked_edge["target"]
+
+                st.info(f"**Selected Edge**")
+                col_rev, col_del = st.columns(2)
+                with col_rev:
+                    if st.button("🔄 Reverse Direction"):
+                        try:
                             dm.reverse_relationship(target_id)
                             st.rerun()
-                    with col_del:
-                        if st.button("✂️ Delete Edge"):
-                             st.session_state["confirm_delete_edge"] = clicked_edge_id
-                             st.rerun()
-                    
-                    if "confirm_delete_edge" in st.session_state and st.session_state["confirm_delete_edge"] == clicked_edge_id:
-                         # ... delete branch logic ...
-                        if st.button("Confirm Delete Branch", type="primary"):
-                            dm.delete_hypothesis(target_id)
-                            del st.session_state["confirm_delete_edge"]
-                            st.rerun()
+                        except ValueError as e:
+                            st.error(str(e))
+                with col_del:
+                    if st.button("✂️ Delete Edge"):
+                         st.session_state["confirm_delete_edge"] = clicked_edge_id
+                         st.rerun()
+
+                if "confirm_delete_edge" in st.session_state and st.session_state["confirm_delete_edge"] == clicked_edge_id:
+                     # ... delete branch logic ...
+                    if st.button("Confirm Delete Branch", type="primary"):
+                        dm.delete_hypothesis(target_id)
+                        del st.session_state["confirm_delete_edge"]
+                        st.rerun()
             elif not clicked_node_id and not clicked_edge_id:
                   st.info("Select a node or edge to view details.")
 
         st.divider()
         st.subheader("Project Overview")
-        st.markdown(build_project_summary(project.id, snapshot_data))
+        st.markdown(build_project_summary(project.id, graph_data, live=not snapshot_data))
+
+        if not snapshot_data:
+            targets = dm.evaluate_project_targets(project.id)
+            if not targets.empty:
+                st.markdown(f"**Metric Targets**: {int(targets['attained'].sum())} / {len(targets)} met")
+                st.dataframe(
+                    targets[["statement", "name", "target", "goal", "latest", "best", "points", "slope_per_day", "attained"]],
+                    hide_index=True,
+                    use_container_width=True,
+                )
 
     elif page == "People View":
-        # ... People View Code ...
         st.title("People & Contributions")
         col_list, col_details = st.columns([0.25, 0.75])
         authors = dm.get_all_authors()
@@ -504,22 +772,100 @@ def main():
                  selected_author = None
         with col_details:
              if selected_author:
-                  updates = dm.get_updates_by_author(selected_author)
-                  st.header(f"👤 {selected_author}")
-                  # ... summary code ...
-                  st.markdown("### 🤖 AI Activity Summary")
-                  st.info(f"Analysis for {selected_author}: ...")
-                  
-                  st.divider()
-                  for update in updates:
-                      with st.container():
-                            st.markdown(f"**{update['date'][:10]}** | *{update['project_title']}*")
-                            st.markdown(f"> **Hypothesis:** {update['hypothesis_statement']}")
-                            icon = "⬜"
-                            if update['evidence'] == "supporting": icon = "✅"
-                            elif update['evidence'] == "refuting": icon = "❌"
-                            st.markdown(f"{icon} {update['content']}")
-                            st.divider()
+                  render_author(selected_author)
+
+def render_author(author):
+    """Rollup stats first, then the activity feed one page at a time."""
+    st.header(f"👤 {author}")
+    summary = dm.get_author_summary(author)
+    if not summary:
+        st.info("No activity yet.")
+        return
+
+    evidence = summary["evidence"]
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Updates", summary["updates"])
+    c2.metric("Projects", len(summary["projects"]))
+    c3.metric("Supporting / Refuting", f"{evidence['supporting']} / {evidence['refuting']}")
+    c4.metric("Last active", datetime.datetime.fromtimestamp(summary["last_date"]).strftime('%Y-%m-%d'))
+
+    st.markdown("### Activity Summary")
+    weeks = summary["weekly"]
+    busiest = max(weeks, key=lambda w: w["updates"])
+    st.markdown(
+        f"{summary['updates']} updates over {len(weeks)} active weeks, "
+        f"busiest the week of {datetime.datetime.fromtimestamp(busiest['week']).strftime('%Y-%m-%d')} "
+        f"({busiest['updates']}). Evidence mix: {evidence['supporting']} supporting, "
+        f"{evidence['refuting']} refuting, {evidence['neutral']} neutral. Most recent project: "
+        f"*{summary['projects'][0]['title']}*."
+    )
+    st.bar_chart({datetime.datetime.fromtimestamp(w["week"]).strftime('%Y-%m-%d'): w["updates"] for w in weeks})
+
+    # Pages already shown stay on screen; "Load more" appends the next one
+    state_key = f"author_pages_{author}"
+    cursors = st.session_state.setdefault(state_key, [None])
+    st.divider()
+    next_cursor = None
+    for cursor in cursors:
+        page = dm.get_author_activity(author, cursor=cursor)
+        next_cursor = page["next_cursor"]
+        for update in page["items"]:
+            with st.container():
+                st.markdown(f"**{datetime.datetime.fromtimestamp(update['date']).strftime('%Y-%m-%d')}** | *{update['project_title']}*")
+                st.markdown(f"> **Hypothesis:** {update['hypothesis_statement']}")
+                icon = "⬜"
+                if update['evidence'] == "supporting": icon = "✅"
+                elif update['evidence'] == "refuting": icon = "❌"
+                st.markdown(f"{icon} {update['content']}")
+                st.divider()
+    if next_cursor and st.button("Load more", key=f"author_more_{author}"):
+        cursors.append(next_cursor)
+        st.rerun()
+
+def render_query_debug_panel(stats):
+    """Per-rerun SQL cost: statement count, timings, rows and a per-function breakdown."""
+    st.sidebar.divider()
+    st.sidebar.toggle("🛠️ Query Debug Panel", key="debug_queries")
+    if stats is None:
+        return
+
+    data = stats.to_dict()
+    with st.expander(f"🛠️ Queries this rerun: {data['statements']} statements, {data['total_ms']:.1f} ms", expanded=False):
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Statements", data["statements"])
+        c2.metric("SQL time (ms)", f"{data['total_ms']:.1f}")
+        c3.metric("p95 (ms)", f"{data['p95_ms']:.2f}")
+        c4.metric("Rows", data["rows"])
+        st.dataframe(
+            [{"function": name, **vals} for name, vals in sorted(data["by_function"].items(), key=lambda kv: -kv[1]["ms"])],
+            hide_index=True,
+            use_container_width=True,
+        )
+        st.dataframe(data["queries"], hide_index=True, use_container_width=True)
+        boot = startup.report()
+        st.caption("Startup: " + ", ".join(
+            [f"{k} at {v:.0f} ms" for k, v in boot["milestones_ms"].items()] +
+            [f"{k} {v:.0f} ms" for k, v in boot["durations_ms"].items()]
+        ))
+        cache = dm.get_read_cache_stats()
+        st.caption(
+            f"Read cache: {cache['hit_rate']:.0%} hits ({cache['hits']}/{cache['hits'] + cache['misses']}), "
+            f"{cache['entries']} entries, {cache['bytes'] / 1e6:.1f} MB, "
+            f"{cache['evictions']} evictions, {cache['invalidations']} invalidations"
+        )
+        st.download_button(
+            label="Export JSON",
+            data=stats.to_json(),
+            file_name=f"queries_{int(time.time())}.json",
+            mime="application/json",
+        )
 
 if __name__ == "__main__":
-    main()
+    debug = st.session_state.get("debug_queries", False)
+    # Each browser session edits as its own actor, so its undo can't revert another's edits
+    actor = st.session_state.setdefault("actor", str(uuid.uuid4()))
+    # Reads go to replicas until this rerun writes, then to the primary
+    with change_feed.acting_as(actor), routing_scope(), (collect_queries("rerun") if debug else nullcontext()) as query_stats:
+        main()
+    startup.mark("first render")
+    render_query_debug_panel(query_stats)
@@ -0,0 +1,485 @@
+"""
+Compact, versioned project archives and migration between the two backends.
+
+    python archive.py export --from sql backup.rarc                 # every project in DATABASE_URL
+    python archive.py export --from json --data-dir data --project ID backup.rarc
+    python archive.py import --to sql backup.rarc [--replace]
+    python archive.py import --to json --data-dir data backup.rarc
+    python archive.py migrate --from json --data-dir data --to sql   # no intermediate file
+    python archive.py info backup.rarc
+
+An archive is a gzip-compressed stream of msgpack values. The first value is a
+header: {"format": "research-archive", "version": 3, "fields": {kind: [names]}, ...}.
+Every following value is one record, [kind, *values], with values in the order
+the header lists for that kind, so readers of later versions can still map old
+archives by name. Per project, records come in this order: the project, its
+hypotheses (parents before children), its edges, its updates, then its snapshots.
+Version 2 added edge records (hypothesis_edges); the JSON backend has no edges
+and skips them. Version 3 added the version id and action label of snapshots;
+older snapshots get a version from their timestamp on import.
+
+Readers and writers stream record by record. The SQL loader inserts in batches
+through Core inside a single transaction, deriving metric points on the way,
+then rebuilds the search index of the imported projects.
+"""
+import gzip
+import json
+import os
+import time
+
+import msgpack
+
+from models_sql import Project, Hypothesis, HypothesisEdge, Update, Snapshot, MetricPoint, UpdateAuthor, AuthorRollup
+
+FORMAT = "research-archive"
+VERSION = 3
+
+FIELDS = {
+    "project": ("id", "title", "north_star_hypothesis_id", "status", "members", "layout_mode", "created_at"),
+    "hypothesis": ("id", "project_id", "parent_id", "statement", "status", "metrics", "position", "created_at"),
+    "edge": ("id", "source_id", "target_id", "kind", "created_at"),
+    "update": ("id", "hypothesis_id", "author", "date", "content", "metrics", "evidence_status"),
+    "snapshot": ("project_id", "version", "timestamp", "action", "data"),
+}
+
+BATCH_SIZE = 5000
+SNAPSHOT_BATCH_SIZE = 50
+
+def _parents_first(hypotheses):
+    """Orders hypothesis dicts so every parent precedes its children."""
+    by_id = {h["id"]: h for h in hypotheses}
+    children = {}
+    roots = []
+    for h in hypotheses:
+        if h.get("parent_id") in by_id:
+            children.setdefault(h["parent_id"], []).append(h)
+        else:
+            h["parent_id"] = None  # dangling parent links can't be inserted
+            roots.append(h)
+    ordered = []
+    seen = set()
+    def walk(root):
+        stack = [root]
+        while stack:
+            h = stack.pop()
+            if h["id"] in seen:
+                continue
+            seen.add(h["id"])
+            ordered.append(h)
+            stack.extend(reversed(children.get(h["id"], [])))
+    for h in roots:
+        walk(h)
+    for h in hypotheses:
+        if h["id"] not in seen:
+            h["parent_id"] = None  # part of a parent cycle; break it here
+            walk(h)
+    return ordered
+
+# --- ARCHIVE FILES ---
+
+def write_archive(path: str, records, source: str = "", compress: bool = True) -> dict:
+    """Writes (kind, dict) records to `path`. Returns record counts per kind."""
+    counts = {kind: 0 for kind in FIELDS}
+    packer = msgpack.Packer(use_bin_type=True)
+    opener = gzip.open if compress else open
+    with opener(path, "wb") as f:
+        f.write(packer.pack({
+            "format": FORMAT,
+            "version": VERSION,
+            "created_at": int(time.time()),
+            "source": source,
+            "fields": {kind: list(names) for kind, names in FIELDS.items()},
+        }))
+        for kind, record in records:
+            f.write(packer.pack([kind] + [record.get(name) for name in FIELDS[kind]]))
+            counts[kind] += 1
+    return counts
+
+def _open(path: str):
+    with open(path, "rb") as f:
+        magic = f.read(2)
+    return gzip.open(path, "rb") if magic == b"\x1f\x8b" else open(path, "rb")
+
+def read_header(path: str) -> dict:
+    with _open(path) as f:
+        header = next(iter(msgpack.Unpacker(f, raw=False)))
+    if not isinstance(header, dict) or header.get("format") != FORMAT:
+        raise ValueError(f"{path} is not a {FORMAT} file")
+    if header.get("version", 0) > VERSION:
+        raise ValueError(f"{path} has archive version {header['version']}; this build reads up to {VERSION}")
+    return header
+
+def read_archive(path: str):
+    """Yields (kind, dict) records from an archive, one at a time."""
+    header = read_header(path)
+    fields = header["fields"]
+    with _open(path) as f:
+        unpacker = msgpack.Unpacker(f, raw=False, strict_map_key=False)
+        next(unpacker)  # header
+        for value in unpacker:
+            kind, values = value[0], value[1:]
+            yield kind, dict(zip(fields[kind], values))
+
+# --- SQL BACKEND ---
+
+def read_sql(db, project_ids=None):
+    """Streams projects (all, or `project_ids`) from the SQL backend."""
+    from sqlalchemy import literal
+    from sqlalchemy.orm import aliased
+
+    query = db.query(Project).order_by(Project.created_at, Project.id)
+    if project_ids:
+        query = query.filter(Project.id.in_(project_ids))
+    parent = aliased(Hypothesis)
+    for project in query.all():
+        yield "project", {name: getattr(project, name) for name in FIELDS["project"]}
+
+        # Joined on the integer keys; archives carry the public ids
+        columns = dict(project_id=literal(project.id), parent_id=parent.id)
+        rows = (
+            db.query(*[columns.get(name, getattr(Hypothesis, name, None)).label(name) for name in FIELDS["hypothesis"]])
+            .outerjoin(parent, parent.pk == Hypothesis.parent_pk)
+            .filter(Hypothesis.project_pk == project.pk)
+        )
+        for h in _parents_first([dict(r._mapping) for r in rows]):
+            yield "hypothesis", h
+
+        source, target = aliased(Hypothesis), aliased(Hypothesis)
+        links = (
+            db.query(HypothesisEdge.id, source.id.label("source_id"), target.id.label("target_id"),
+                     HypothesisEdge.kind, HypothesisEdge.created_at)
+            .join(source, source.pk == HypothesisEdge.source_pk)
+            .join(target, target.pk == HypothesisEdge.target_pk)
+            .filter(HypothesisEdge.project_pk == project.pk)
+            .order_by(HypothesisEdge.pk)
+        )
+        for e in links:
+            yield "edge", dict(e._mapping)
+
+        columns = dict(hypothesis_id=Hypothesis.id)
+        updates = (
+            db.query(*[columns.get(name, getattr(Update, name, None)).label(name) for name in FIELDS["update"]])
+            .join(Hypothesis, Hypothesis.pk == Update.hypothesis_pk)
+            .filter(Hypothesis.project_pk == project.pk)
+            .order_by(Update.date, Update.id)
+            .yield_per(BATCH_SIZE)
+        )
+        for u in updates:
+            yield "update", dict(u._mapping)
+
+        snapshots = (
+            db.query(literal(project.id).label("project_id"), Snapshot.version, Snapshot.timestamp,
+                     Snapshot.action, Snapshot.data)
+            .filter(Snapshot.project_pk == project.pk)
+            .order_by(Snapshot.version)
+            .yield_per(SNAPSHOT_BATCH_SIZE)
+        )
+        for s in snapshots:
+            yield "snapshot", dict(s._mapping)
+
+def _clear_project(conn, pk: int):
+    """Deletes a project's contents but keeps its row, which the change feed references."""
+    from sqlalchemy import delete, select
+
+    h_pks = select(Hypothesis.pk).where(Hypothesis.project_pk == pk)
+    conn.execute(delete(MetricPoint).where(MetricPoint.project_pk == pk))
+    conn.execute(delete(HypothesisEdge).where(HypothesisEdge.project_pk == pk))
+    conn.execute(delete(AuthorRollup).where(AuthorRollup.project_pk == pk))
+    conn.execute(delete(UpdateAuthor).where(UpdateAuthor.project_pk == pk))
+    conn.execute(delete(Update).where(Update.hypothesis_pk.in_(h_pks)))
+    # Children first is not guaranteed, so drop parent links before deleting
+    conn.execute(Hypothesis.__table__.update().where(Hypothesis.project_pk == pk).values(parent_pk=None))
+    conn.execute(delete(Hypothesis).where(Hypothesis.project_pk == pk))
+    conn.execute(delete(Snapshot).where(Snapshot.project_pk == pk))
+
+def load_sql(records, engine=None, batch_size: int = BATCH_SIZE, replace: bool = False) -> dict:
+    """
+    Bulk-loads archive records into the SQL backend in one transaction. Existing
+    projects raise unless `replace` is set, in which case their contents are replaced.
+    Returns record counts per kind.
+
+    Records carry public ids; the loader maps them to the integer keys as it goes
+    (hypothesis ids for the whole project, update ids for the batch being written).
+    """
+    from sqlalchemy import bindparam, select
+    from sqlalchemy.orm import Session
+    import change_feed
+    import database
+    import metrics_store
+    import people
+    import search
+    import status_rollup
+    from models_sql import insert_returning_pks
+
+    if engine is None:
+        engine = database.engine
+        database.ensure_schema()
+    counts = {kind: 0 for kind in FIELDS}
+    pending = {"hypothesis": [], "edge": [], "update": [], "snapshot": []}
+    project_ids = []
+    project = {"id": None, "pk": None, "hypotheses": {}, "parents": [], "versions": set()}
+    set_parent = (
+        Hypothesis.__table__.update()
+        .where(Hypothesis.pk == bindparam("child_pk"))
+        .values(parent_pk=bindparam("new_parent_pk"))
+    )
+
+    def flush_hypotheses(conn):
+        rows = pending["hypothesis"]
+        if rows:
+            for row in rows:
+                project["parents"].append((row["id"], row.pop("parent_id", None)))
+                row.pop("project_id", None)
+                row["project_pk"] = project["pk"]
+            project["hypotheses"].update(insert_returning_pks(conn, Hypothesis, rows))
+            pending["hypothesis"] = []
+
+    def flush_updates(conn):
+        flush_hypotheses(conn)
+        rows = pending["update"]
+        if not rows:
+            return
+        h_pks = project["hypotheses"]
+        metrics = []
+        for row in rows:
+            h_id = row.pop("hypothesis_id", None)
+            row["hypothesis_pk"] = h_pks.get(h_id)
+            # Metric points come straight from the stream instead of a re-read of every update
+            for name, value in metrics_store.parse_metrics(row.get("metrics")).items():
+                metrics.append((row["id"], row["hypothesis_pk"], name, value, row.get("date")))
+        u_pks = insert_returning_pks(conn, Update, rows)
+        if metrics:
+            conn.execute(MetricPoint.__table__.insert(), [
+                {"project_pk": project["pk"], "hypothesis_pk": h_pk, "update_pk": u_pks[u_id],
+                 "name": name, "value": value, "date": date}
+                for u_id, h_pk, name, value, date in metrics
+            ])
+        pending["update"] = []
+
+    def flush_snapshots(conn):
+        rows = pending["snapshot"]
+        if rows:
+            versions = project["versions"]
+            for row in rows:
+                row.pop("project_id", None)
+                row["project_pk"] = project["pk"]
+                if "version" not in row:
+                    # Archives before version 3 (and the JSON backend) only have the second
+                    version = int(row.get("timestamp") or 0) * 1_000_000
+                    while version in versions:
+                        version += 1
+                    row["version"] = version
+                row.setdefault("timestamp", row["version"] // 1_000_000)
+                versions.add(row["version"])
+            conn.execute(Snapshot.__table__.insert(), rows)
+            pending["snapshot"] = []
+
+    def flush_edges(conn):
+        flush_hypotheses(conn)
+        h_pks = project["hypotheses"]
+        rows = [
+            {"id": row["id"], "project_pk": project["pk"], "source_pk": h_pks[row["source_id"]],
+             "target_pk": h_pks[row["target_id"]], "kind": row["kind"], "created_at": row.get("created_at")}
+            for row in pending["edge"] if row.get("source_id") in h_pks and row.get("target_id") in h_pks
+        ]
+        if rows:
+            conn.execute(HypothesisEdge.__table__.insert(), rows)
+        pending["edge"] = []
+
+    def finish_project(conn):
+        flush_edges(conn)
+        flush_updates(conn)
+        flush_snapshots(conn)
+        h_pks = project["hypotheses"]
+        links = [{"child_pk": h_pks[c], "new_parent_pk": h_pks[p]} for c, p in project["parents"] if p in h_pks]
+        if links:
+            conn.execute(set_parent, links)
+        project.update(hypotheses={}, parents=[], versions=set())
+
+    flushers = {"hypothesis": flush_hypotheses, "edge": flush_edges, "update": flush_updates, "snapshot": flush_snapshots}
+    with engine.begin() as conn:
+        for kind, record in records:
+            counts[kind] += 1
+            # Missing values take the column defaults (e.g. created_at from the JSON backend)
+            row = {k: v for k, v in record.items() if v is not None}
+            if kind == "project":
+                # Everything of the previous project is written before the next one starts
+                finish_project(conn)
+                project_id = row["id"]
+                pk = conn.execute(select(Project.pk).where(Project.id == project_id)).scalar()
+                if pk is not None:
+                    if not replace:
+                        raise ValueError(f"Project {project_id} already exists (use replace=True)")
+                    _clear_project(conn, pk)
+                    conn.execute(Project.__table__.update().where(Project.pk == pk).values(**row))
+                else:
+                    pk = insert_returning_pks(conn, Project, [row])[project_id]
+                project.update(id=project_id, pk=pk)
+                project_ids.append(project_id)
+                continue
+
+            pending[kind].append(row)
+            if len(pending[kind]) >= (SNAPSHOT_BATCH_SIZE if kind == "snapshot" else batch_size):
+                flushers[kind](conn)
+        finish_project(conn)
+
+        with Session(bind=conn) as db:
+            for pid in project_ids:
+                search.reindex_project(db, pid)
+                people.rebuild_author_rollups(db, pid)
+                status_rollup.recompute_project(db, pid)
+                # Live views of an imported project reload it from scratch
+                change_feed.record_change(db, pid, "project", "restore", pid, {"source": "archive"})
+            db.flush()
+    return counts
+
+# --- JSON BACKEND (data_manager.py) ---
+
+def _json_files(data_dir: str):
+    return (os.path.join(data_dir, "projects.json"), os.path.join(data_dir, "hypotheses.json"),
+            os.path.join(data_dir, "history"))
+
+def _load(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def read_json_store(data_dir: str = "data", project_ids=None):
+    """Streams projects from a data_manager JSON store. Its files are single JSON documents, so each is loaded whole."""
+    projects_file, hypotheses_file, history_dir = _json_files(data_dir)
+    projects = _load(projects_file)
+    hypotheses = _load(hypotheses_file)
+    by_project = {}
+    for h in hypotheses.values():
+        by_project.setdefault(h.get("project_id"), []).append(h)
+
+    for pid, p in projects.items():
+        if project_ids and pid not in project_ids:
+            continue
+        yield "project", {name: p.get(name) for name in FIELDS["project"]}
+
+        hyps = [{name: h.get(name) for name in FIELDS["hypothesis"]} for h in by_project.get(pid, [])]
+        for h in _parents_first(hyps):
+            yield "hypothesis", h
+        for h in by_project.get(pid, []):
+            for u in h.get("updates", []):
+                yield "update", dict({name: u.get(name) for name in FIELDS["update"]}, hypothesis_id=h["id"])
+
+        project_history = os.path.join(history_dir, pid)
+        if os.path.isdir(project_history):
+            for ts in sorted(int(f[:-5]) for f in os.listdir(project_history) if f.endswith(".json") and f[:-5].isdigit()):
+                data = _load(os.path.join(project_history, f"{ts}.json"))
+                # JSON snapshots copy the whole hypotheses file; keep this project's part
+                yield "snapshot", {"project_id": pid, "timestamp": ts,
+                                   "data": {k: v for k, v in data.items() if v.get("project_id") == pid}}
+
+def load_json_store(records, data_dir: str = "data", replace: bool = False) -> dict:
+    """Writes archive records into a data_manager JSON store, merging with what is there."""
+    projects_file, hypotheses_file, history_dir = _json_files(data_dir)
+    os.makedirs(history_dir, exist_ok=True)
+    projects = _load(projects_file)
+    hypotheses = _load(hypotheses_file)
+    counts = {kind: 0 for kind in FIELDS}
+
+    for kind, r in records:
+        counts[kind] += 1
+        if kind == "project":
+            if r["id"] in projects:
+                if not replace:
+                    raise ValueError(f"Project {r['id']} already exists (use replace=True)")
+                hypotheses = {k: v for k, v in hypotheses.items() if v.get("project_id") != r["id"]}
+            projects[r["id"]] = {name: r.get(name) for name in ("id", "title", "north_star_hypothesis_id", "status", "members", "layout_mode")}
+        elif kind == "hypothesis":
+            h = {name: r.get(name) for name in ("id", "project_id", "parent_id", "statement", "status", "metrics", "position")}
+            h.update(updates=[], children=[])
+            hypotheses[r["id"]] = h
+            parent = hypotheses.get(r.get("parent_id"))
+            if parent is not None:
+                parent["children"].append(r["id"])
+        elif kind == "update":
+            h = hypotheses.get(r["hypothesis_id"])
+            if h is not None:
+                h["updates"].append({name: r.get(name) for name in FIELDS["update"]})
+        elif kind == "snapshot":
+            project_history = os.path.join(history_dir, r["project_id"])
+            os.makedirs(project_history, exist_ok=True)
+            with open(os.path.join(project_history, f"{r['timestamp']}.json"), "w") as f:
+                json.dump(r["data"], f)
+
+    with open(projects_file, "w") as f:
+        json.dump(projects, f)
+    with open(hypotheses_file, "w") as f:
+        json.dump(hypotheses, f)
+    return counts
+
+# --- CLI ---
+
+def _source(args):
+    if args.source == "json":
+        return read_json_store(args.data_dir, args.project)
+    return _read_sql_database(args.project)
+
+def _read_sql_database(project_ids):
+    from database import SessionLocal, ensure_schema
+    ensure_schema()
+    with SessionLocal() as db:
+        yield from read_sql(db, project_ids)
+
+def _sink(args, records):
+    if args.target == "json":
+        return load_json_store(records, args.data_dir, replace=args.replace)
+    return load_sql(records, replace=args.replace)
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="write an archive from a backend")
+    p_export.add_argument("path")
+    p_export.add_argument("--from", dest="source", choices=["sql", "json"], default="sql")
+    p_export.add_argument("--project", action="append", help="only these project ids (repeatable)")
+    p_export.add_argument("--no-compress", action="store_true")
+
+    p_import = sub.add_parser("import", help="load an archive into a backend")
+    p_import.add_argument("path")
+    p_import.add_argument("--to", dest="target", choices=["sql", "json"], default="sql")
+    p_import.add_argument("--replace", action="store_true", help="overwrite projects that already exist")
+
+    p_migrate = sub.add_parser("migrate", help="copy projects from one backend to the other")
+    p_migrate.add_argument("--from", dest="source", choices=["sql", "json"], default="json")
+    p_migrate.add_argument("--to", dest="target", choices=["sql", "json"], default="sql")
+    p_migrate.add_argument("--project", action="append")
+    p_migrate.add_argument("--replace", action="store_true")
+
+    p_info = sub.add_parser("info", help="print an archive's header and record counts")
+    p_info.add_argument("path")
+
+    for p in (p_export, p_import, p_migrate):
+        p.add_argument("--data-dir", default="data", help="JSON store directory")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.command == "export":
+        counts = write_archive(args.path, _source(args), source=args.source, compress=not args.no_compress)
+    elif args.command == "import":
+        counts = _sink(args, read_archive(args.path))
+    elif args.command == "migrate":
+        if args.source == args.target:
+            parser.error("--from and --to must differ")
+        counts = _sink(args, _source(args))
+    else:
+        header = read_header(args.path)
+        counts = {kind: 0 for kind in header["fields"]}
+        for kind, _ in read_archive(args.path):
+            counts[kind] += 1
+        print(json.dumps({k: v for k, v in header.items() if k != "fields"}, indent=2))
+
+    elapsed = time.perf_counter() - started
+    print(", ".join(f"{n} {kind}" for kind, n in counts.items()) + f" records in {elapsed:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,467 @@
+"""
+Synthetic-workload benchmarks for both data-manager backends.
+
+    python benchmark.py --preset small
+    python benchmark.py --preset large --backend sql --save-baseline
+    python benchmark.py --nodes 5000 --updates 50000 --baseline bench_baseline.json
+
+Generates a deterministic project (same seed -> same ids, text and tree), times
+every public function of data_manager_sql and data_manager plus
+app.build_cytoscape_elements and generate_project_report, writes the results as
+JSON and compares them with a stored baseline.
+"""
+import argparse
+import datetime
+import inspect
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PRESETS = {
+    "tiny": {"nodes": 200, "fanout": 4, "depth": 5, "updates": 1000, "authors": 5},
+    "small": {"nodes": 2000, "fanout": 5, "depth": 6, "updates": 20000, "authors": 20},
+    "medium": {"nodes": 10000, "fanout": 6, "depth": 7, "updates": 100000, "authors": 50},
+    "large": {"nodes": 50000, "fanout": 6, "depth": 8, "updates": 500000, "authors": 200},
+}
+
+WORDS = (
+    "accuracy attention baseline batch benchmark calibration causal cluster dataset "
+    "distillation dropout embedding encoder ensemble gradient inference latency loss "
+    "memory model noise optimizer pretraining probe regularization retrieval robustness "
+    "sampling scaling sparsity tokenizer transfer transformer variance warmup"
+).split()
+
+EVIDENCE = ["supporting", "refuting", "neutral"]
+STATUS_FOR_EVIDENCE = {"supporting": "proven", "refuting": "disproven", "neutral": "tested"}
+
+# --- SYNTHETIC PROJECT ---
+
+def generate_project(seed=0, nodes=2000, fanout=5, depth=6, updates=20000, authors=20, start_ts=1_700_000_000):
+    """
+    Deterministic project as plain dicts: {"project": {...}, "hypotheses": [...], "updates": [...]}.
+    The tree is grown breadth-first up to `depth` levels with `fanout` children per node
+    until `nodes` hypotheses exist; updates are spread over random nodes.
+    """
+    rng = random.Random(seed)
+
+    def new_id():
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    def sentence(n):
+        return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize()
+
+    project_id = new_id()
+    root = {"id": new_id(), "project_id": project_id, "parent_id": None,
+            "statement": sentence(8), "status": "open", "metrics": [{"name": "accuracy", "target": 0.9}],
+            "position": {"x": 0, "y": 0}, "created_at": start_ts, "depth": 0}
+    hypotheses = [root]
+    frontier = [root]
+    while frontier and len(hypotheses) < nodes:
+        next_frontier = []
+        for parent in frontier:
+            if parent["depth"] >= depth:
+                continue
+            for _ in range(fanout):
+                if len(hypotheses) >= nodes:
+                    break
+                h = {"id": new_id(), "project_id": project_id, "parent_id": parent["id"],
+                     "statement": sentence(rng.randint(5, 12)), "status": "open",
+                     "metrics": [], "position": {}, "created_at": start_ts + len(hypotheses),
+                     "depth": parent["depth"] + 1}
+                hypotheses.append(h)
+                next_frontier.append(h)
+        frontier = next_frontier
+
+    author_pool = [f"Author {i}" for i in range(max(authors, 1))]
+    update_rows = []
+    for i in range(updates):
+        h = hypotheses[rng.randrange(len(hypotheses))]
+        evidence = rng.choice(EVIDENCE)
+        names = rng.sample(author_pool, k=min(len(author_pool), rng.choice([1, 1, 1, 2])))
+        update_rows.append({
+            "id": new_id(), "hypothesis_id": h["id"], "author": ", ".join(names),
+            "date": start_ts + 60 * i, "content": sentence(rng.randint(8, 24)),
+            "metrics": {"accuracy": round(rng.random(), 4)}, "evidence_status": evidence,
+        })
+        # Same status rule as add_update
+        if evidence != "neutral" or h["status"] == "open":
+            h["status"] = STATUS_FOR_EVIDENCE[evidence]
+
+    project = {"id": project_id, "title": f"Synthetic {seed}", "north_star_hypothesis_id": root["id"],
+               "status": "active", "members": author_pool[:5], "layout_mode": "breadthfirst",
+               "created_at": start_ts}
+    return {"project": project, "hypotheses": hypotheses, "updates": update_rows}
+
+def load_into_sql(dataset, batch_size=5000):
+    """Bulk-loads a generated project through Core inserts (not the ORM)."""
+    from database import engine, SessionLocal, ensure_schema
+    from models_sql import Project, Hypothesis, Update, insert_returning_pks
+    from sqlalchemy import bindparam
+    import metrics_store
+    import people
+    import status_rollup
+    import search
+
+    def batches(rows):
+        for i in range(0, len(rows), batch_size):
+            yield rows[i:i + batch_size]
+
+    ensure_schema()
+    columns = [c.name for c in Hypothesis.__table__.columns]
+    with engine.begin() as conn:
+        project_pk = insert_returning_pks(conn, Project, [dataset["project"]])[dataset["project"]["id"]]
+        h_pks = {}
+        for chunk in batches(dataset["hypotheses"]):
+            h_pks.update(insert_returning_pks(conn, Hypothesis, [
+                dict({k: h[k] for k in columns if k in h}, project_pk=project_pk) for h in chunk]))
+        # The tree is linked once every row has its integer key
+        links = [{"child_pk": h_pks[h["id"]], "new_parent_pk": h_pks[h["parent_id"]]}
+                 for h in dataset["hypotheses"] if h["parent_id"]]
+        set_parent = (Hypothesis.__table__.update().where(Hypothesis.pk == bindparam("child_pk"))
+                      .values(parent_pk=bindparam("new_parent_pk")))
+        for chunk in batches(links):
+            conn.execute(set_parent, chunk)
+        for chunk in batches(dataset["updates"]):
+            conn.execute(Update.__table__.insert(), [
+                dict({k: v for k, v in u.items() if k != "hypothesis_id"}, hypothesis_pk=h_pks[u["hypothesis_id"]])
+                for u in chunk])
+
+    with SessionLocal() as db:
+        search.reindex_project(db, dataset["project"]["id"])
+        metrics_store.rebuild_metric_points(db, dataset["project"]["id"])
+        people.rebuild_author_rollups(db, dataset["project"]["id"])
+        status_rollup.recompute_project(db, dataset["project"]["id"])
+        db.commit()
+
+def load_into_json(dataset, data_dir):
+    """Writes a generated project in data_manager's JSON file layout."""
+    children = {}
+    for h in dataset["hypotheses"]:
+        children.setdefault(h["parent_id"], []).append(h["id"])
+    updates_of = {}
+    for u in dataset["updates"]:
+        updates_of.setdefault(u["hypothesis_id"], []).append(u)
+
+    hypotheses = {}
+    for h in dataset["hypotheses"]:
+        hypotheses[h["id"]] = {
+            "id": h["id"], "project_id": h["project_id"], "parent_id": h["parent_id"],
+            "statement": h["statement"], "status": h["status"], "metrics": h["metrics"],
+            "updates": updates_of.get(h["id"], []), "children": children.get(h["id"], []),
+            "position": h["position"],
+        }
+    p = dataset["project"]
+    projects = {p["id"]: {k: p[k] for k in ("id", "title", "north_star_hypothesis_id", "status", "members", "layout_mode")}}
+
+    os.makedirs(os.path.join(data_dir, "history"), exist_ok=True)
+    with open(os.path.join(data_dir, "projects.json"), "w") as f:
+        json.dump(projects, f)
+    with open(os.path.join(data_dir, "hypotheses.json"), "w") as f:
+        json.dump(hypotheses, f)
+
+# --- TIMING ---
+
+class Context:
+    """Ids the recipes need; mutations consume leaves so repeats stay comparable."""
+
+    def __init__(self, dataset):
+        hyps = dataset["hypotheses"]
+        self.project_id = dataset["project"]["id"]
+        self.root_id = dataset["project"]["north_star_hypothesis_id"]
+        parents = {h["parent_id"] for h in hyps}
+        self.leaves = [h["id"] for h in hyps if h["id"] not in parents]
+        self.inner = next((h["id"] for h in hyps if h["parent_id"] and h["id"] in parents), self.root_id)
+        self.author = dataset["updates"][0]["author"].split(",")[0] if dataset["updates"] else "Author 0"
+        self.query = dataset["hypotheses"][-1]["statement"].split()[0]
+
+    def leaf(self):
+        return self.leaves.pop()
+
+def time_call(fn, repeat, setup=None, after=None):
+    samples = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        result = fn(*args)
+        if inspect.isgenerator(result):
+            for _ in result:  # streaming functions do their work while consumed
+                pass
+        samples.append((time.perf_counter() - start) * 1000)
+        if after:
+            after()
+    return {
+        "min_ms": round(min(samples), 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "mean_ms": round(statistics.mean(samples), 3),
+        "repeat": repeat,
+    }
+
+def public_functions(module):
+    return sorted(
+        name for name, fn in vars(module).items()
+        if callable(fn) and not name.startswith("_") and getattr(fn, "__module__", None) == module.__name__
+    )
+
+def sql_recipes(dm, ctx):
+    """name -> (setup returning args, optional after-hook). Reads first, then writes."""
+    snapshots = lambda: dm.get_snapshots(ctx.project_id)
+    flush = lambda: dm.flush_snapshots()
+
+    def hypothesis_copy():
+        h = dm.get_hypothesis(ctx.inner)
+        return (h,)
+
+    return {
+        "get_projects": (lambda: (), None),
+        "get_dashboard_projects": (lambda: (), None),
+        "get_project_statuses": (lambda: (), None),
+        "get_hypothesis": (lambda: (ctx.inner,), None),
+        "get_snapshots": (lambda: (ctx.project_id,), None),
+        "get_snapshot_history": (lambda: (ctx.project_id,), None),
+        "load_snapshot_hypotheses": (lambda: (ctx.project_id, snapshots()[0]), None),
+        "get_snapshot_hashes": (lambda: (ctx.project_id, snapshots()[0]), None),
+        "diff_versions": (lambda: (ctx.project_id, snapshots()[-1]), None),
+        "capture_project_state": (lambda: (dm._get_session(), ctx.project_id), None),
+        "load_project_nodes": (lambda: (ctx.project_id,), None),
+        "get_changes_since": (lambda: (ctx.project_id, 0), None),
+        "get_latest_revision": (lambda: (ctx.project_id,), None),
+        "search_hypotheses": (lambda: (ctx.query,), None),
+        "get_metric_series": (lambda: (ctx.root_id,), None),
+        "evaluate_project_targets": (lambda: (ctx.project_id,), None),
+        "get_all_authors": (lambda: (), None),
+        "get_updates_by_author": (lambda: (ctx.author,), None),
+        "get_author_summary": (lambda: (ctx.author,), None),
+        "get_author_activity": (lambda: (ctx.author,), None),
+        "get_updates": (lambda: (ctx.inner,), None),
+        "get_evidence_counts": (lambda: (ctx.inner,), None),
+        "get_status_summary": (lambda: (ctx.project_id,), None),
+        "get_project_edges": (lambda: (ctx.project_id,), None),
+        "generate_project_report": (lambda: (ctx.project_id,), None),
+        "export_project": (lambda: (ctx.project_id, "jsonl"), None),
+        "get_snapshot_writer_stats": (lambda: (), None),
+        "get_read_cache_stats": (lambda: (), None),
+        "clear_read_cache": (lambda: (), None),
+        "get_shared_cache_stats": (lambda: (), None),
+        "flush_snapshots": (lambda: (), None),
+        "save_snapshot": (lambda: (ctx.project_id,), None),
+        "request_snapshot": (lambda: (ctx.project_id,), flush),
+        "create_project": (lambda: ("Bench Project", "Bench root"), flush),
+        "save_project": (lambda: (dm.get_projects()[0],), flush),
+        "save_hypothesis": (hypothesis_copy, flush),
+        "set_hypothesis_status": (lambda: (ctx.inner, "tested"), flush),
+        "set_metric_target": (lambda: (ctx.inner, "accuracy", 0.9), flush),
+        "add_subhypothesis": (lambda: (ctx.inner, "Bench child"), flush),
+        "add_update": (lambda: (ctx.inner, ctx.author, "Bench evidence", {"accuracy": 0.5}, "neutral"), flush),
+        "link_hypotheses": (lambda: (ctx.inner, ctx.root_id, "supports"), None),
+        "unlink_hypotheses": (lambda: (dm.link_hypotheses(ctx.leaf(), ctx.inner, "depends_on"),), None),
+        "reverse_relationship": (lambda: (ctx.leaf(),), flush),
+        "delete_hypothesis": (lambda: (ctx.leaf(),), flush),
+        "undo_last_action": (lambda: (ctx.project_id,), flush),
+    }
+
+def json_recipes(dm, ctx):
+    snapshots = lambda: dm.get_snapshots(ctx.project_id)
+    return {
+        "get_projects": (lambda: (), None),
+        "get_hypothesis": (lambda: (ctx.inner,), None),
+        "get_hypotheses_by_project": (lambda: (ctx.project_id,), None),
+        "get_snapshots": (lambda: (ctx.project_id,), None),
+        "load_snapshot_hypotheses": (lambda: (ctx.project_id, snapshots()[0]), None),
+        "get_all_authors": (lambda: (), None),
+        "get_updates_by_author": (lambda: (ctx.author,), None),
+        "save_snapshot": (lambda: (ctx.project_id,), lambda: time.sleep(1.01)),
+        "save_project": (lambda: (dm.get_projects()[0],), None),
+        "save_hypothesis": (lambda: (dm.get_hypothesis(ctx.inner), False), None),
+        "create_project": (lambda: ("Bench Project", "Bench root"), None),
+        "add_subhypothesis": (lambda: (ctx.inner, "Bench child"), None),
+        "add_update": (lambda: (ctx.inner, ctx.author, "Bench evidence", {"accuracy": 0.5}, "neutral"), None),
+        "reverse_relationship": (lambda: (ctx.leaf(),), None),
+        "delete_edge_relationship": (lambda: (ctx.leaf(),), None),
+        "delete_hypothesis": (lambda: (ctx.leaf(),), None),
+        "undo_last_action": (lambda: (ctx.project_id,), None),
+    }
+
+def run_functions(module, recipes, repeat, skip):
+    results = {}
+    for name in recipes:
+        if name in skip:
+            continue
+        setup, after = recipes[name]
+        try:
+            results[name] = time_call(getattr(module, name), repeat, setup, after)
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+    for name in public_functions(module):
+        if name not in recipes:
+            results[name] = {"skipped": "no benchmark recipe"}
+    return results
+
+def bench_sql(dataset, repeat, skip, workdir):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    import data_manager_sql as dm
+
+    started = time.perf_counter()
+    load_into_sql(dataset)
+    dm.save_snapshot(dataset["project"]["id"])
+    load_ms = (time.perf_counter() - started) * 1000
+
+    ctx = Context(dataset)
+    results = {"_load_ms": round(load_ms, 1)}
+    results.update(extra_benchmarks(dm, ctx, repeat, skip))
+    results.update(run_functions(dm, sql_recipes(dm, ctx), repeat, skip))
+    return results
+
+def bench_json(dataset, repeat, skip, workdir):
+    json_dir = os.path.join(workdir, "json_backend")
+    os.makedirs(json_dir, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(json_dir)  # data_manager resolves its data/ directory relative to cwd
+    try:
+        started = time.perf_counter()
+        load_into_json(dataset, os.path.join(json_dir, "data"))
+        load_ms = (time.perf_counter() - started) * 1000
+        import data_manager
+        data_manager.save_snapshot(dataset["project"]["id"])
+        time.sleep(1.01)  # snapshot files are keyed by whole seconds
+
+        ctx = Context(dataset)
+        results = {"_load_ms": round(load_ms, 1)}
+        results.update(run_functions(data_manager, json_recipes(data_manager, ctx), repeat, skip))
+        return results
+    finally:
+        os.chdir(cwd)
+
+def extra_benchmarks(dm, ctx, repeat, skip):
+    """build_cytoscape_elements renders from app.py, which needs Streamlit installed."""
+    try:
+        import app
+    except Exception as e:
+        return {"app.build_cytoscape_elements": {"skipped": f"app not importable ({type(e).__name__})"}}
+
+    results = {}
+    nodes = lambda: (ctx.project_id, ctx.root_id, dm.load_project_nodes(ctx.project_id)[0])
+    if "app.build_cytoscape_elements[live]" not in skip:
+        results["app.build_cytoscape_elements[live]"] = time_call(app.build_cytoscape_elements, repeat, nodes)
+    if "app.build_cytoscape_elements[db]" not in skip:
+        results["app.build_cytoscape_elements[db]"] = time_call(
+            app.build_cytoscape_elements, repeat, lambda: (ctx.project_id, ctx.root_id, None))
+    return results
+
+# --- BASELINE ---
+
+def compare(results, baseline, threshold):
+    """Per function median ratio vs baseline; ratios above `threshold` are regressions."""
+    report = {}
+    for backend, funcs in results.items():
+        base_funcs = baseline.get("results", {}).get(backend, {})
+        for name, cur in funcs.items():
+            base = base_funcs.get(name)
+            if not isinstance(cur, dict) or not isinstance(base, dict):
+                continue
+            if "median_ms" not in cur or "median_ms" not in base or base["median_ms"] <= 0:
+                continue
+            ratio = cur["median_ms"] / base["median_ms"]
+            report[f"{backend}.{name}"] = {
+                "baseline_ms": base["median_ms"], "current_ms": cur["median_ms"],
+                "ratio": round(ratio, 3), "regression": ratio > threshold,
+            }
+    return report
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True).strip()
+    except Exception:
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    for key in ("nodes", "fanout", "depth", "updates", "authors"):
+        parser.add_argument(f"--{key}", type=int, help=f"override the preset's {key}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backend", choices=["sql", "json", "both"], default="both")
+    parser.add_argument("--skip", default="", help="comma-separated function names to skip")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", default="bench_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=1.25, help="median ratio counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--no-read-cache", action="store_true", help="time the database paths behind the read cache")
+    args = parser.parse_args(argv)
+
+    config = dict(PRESETS[args.preset])
+    for key in config:
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+    skip = {s.strip() for s in args.skip.split(",") if s.strip()}
+
+    started = time.perf_counter()
+    dataset = generate_project(seed=args.seed, **config)
+    gen_ms = (time.perf_counter() - started) * 1000
+    print(f"Generated {len(dataset['hypotheses'])} hypotheses / {len(dataset['updates'])} updates in {gen_ms:.0f} ms")
+
+    os.environ.setdefault("SNAPSHOT_WRITER", "async")
+    if args.no_read_cache:
+        os.environ["READ_CACHE"] = "off"
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10 * config["depth"] + 1000))
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="research_bench_") as workdir:
+        if args.backend in ("sql", "both"):
+            results["sql"] = bench_sql(dataset, args.repeat, skip, workdir)
+        if args.backend in ("json", "both"):
+            results["json"] = bench_json(generate_project(seed=args.seed, **config), args.repeat, skip, workdir)
+
+    output = {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "config": config,
+        "read_cache": not args.no_read_cache,
+        "sizes": {"hypotheses": len(dataset["hypotheses"]), "updates": len(dataset["updates"])},
+        "results": results,
+    }
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print("Warning: baseline was recorded with a different workload config")
+        output["comparison"] = compare(results, baseline, args.threshold)
+        regressions = [k for k, v in output["comparison"].items() if v["regression"]]
+
+    with open(args.baseline if args.save_baseline else args.out, "w") as f:
+        json.dump(output, f, indent=2)
+
+    for backend, funcs in results.items():
+        print(f"\n[{backend}]")
+        for name, r in funcs.items():
+            if isinstance(r, dict) and "median_ms" in r:
+                cmp = output.get("comparison", {}).get(f"{backend}.{name}")
+                delta = f"  x{cmp['ratio']:.2f} vs baseline" if cmp else ""
+                print(f"  {name:<38} {r['median_ms']:>10.2f} ms{delta}")
+            elif isinstance(r, dict):
+                print(f"  {name:<38} {r.get('error') or r.get('skipped')}")
+            else:
+                print(f"  {name:<38} {r}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over x{args.threshold}: " + ", ".join(regressions))
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
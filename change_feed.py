@@ -0,0 +1,265 @@
+from models_sql import Project, Hypothesis, HypothesisEdge, Update, Change, current_time_millis, project_pk
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+from contextlib import contextmanager
+import contextvars
+import select
+import threading
+
+# Append-only change feed. Every data_manager_sql mutation records one row per
+# touched entity inside its own transaction; clients keep the last revision they
+# applied and poll `changes_since`. Works on SQLite and Postgres without a broker;
+# on Postgres each change also fires a NOTIFY so listeners can skip polling.
+
+NOTIFY_CHANNEL = "project_changes"
+
+# Who the changes recorded in this context are by (the app uses one id per
+# browser session); undo reverts a version only if it holds nobody else's changes
+_current_actor = contextvars.ContextVar("feed_actor", default=None)
+
+@contextmanager
+def acting_as(actor: str):
+    token = _current_actor.set(actor)
+    try:
+        yield
+    finally:
+        _current_actor.reset(token)
+
+def current_actor():
+    return _current_actor.get()
+
+def hypothesis_payload(h: Hypothesis) -> dict:
+    # Snapshot-shaped plus the derived status, minus updates/children (children are derived from parent_id)
+    return {
+        "id": h.id,
+        "project_id": h.project_id,
+        "parent_id": h.parent_id,
+        "statement": h.statement,
+        "status": h.status,
+        "derived_status": h.derived_status,
+        "metrics": h.metrics,
+        "position": h.position,
+    }
+
+def update_payload(u: Update) -> dict:
+    return {
+        "id": u.id,
+        "hypothesis_id": u.hypothesis.id,
+        "author": u.author,
+        "date": u.date,
+        "content": u.content,
+        "metrics": u.metrics,
+        "evidence_status": u.evidence_status,
+    }
+
+def edge_payload(e: HypothesisEdge) -> dict:
+    return {
+        "id": e.id,
+        "source_id": e.source_id,
+        "target_id": e.target_id,
+        "kind": e.kind,
+    }
+
+def project_payload(p: Project) -> dict:
+    return {
+        "id": p.id,
+        "title": p.title,
+        "north_star_hypothesis_id": p.north_star_hypothesis_id,
+        "status": p.status,
+        "members": p.members,
+        "layout_mode": p.layout_mode,
+    }
+
+def _next_revision(db: Session, project_id: str):
+    """(project pk, next revision), or None if the project doesn't exist."""
+    query = (
+        db.query(Project.pk, func.max(Change.revision))
+        .outerjoin(Change, Change.project_pk == Project.pk)
+        .filter(Project.id == project_id)
+        .group_by(Project.pk)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        # Serialize writers per project so revisions commit in order and pollers never skip one
+        db.query(Project.pk).filter(Project.id == project_id).with_for_update().first()
+    row = query.first()
+    if row is None:
+        return None
+    pk, current = row
+    pending = [c.revision for c in db.new if isinstance(c, Change) and c.project_pk == pk]
+    return pk, max([current or 0] + pending) + 1
+
+def record_change(db: Session, project_id: str, entity: str, operation: str, entity_id: str = None, payload: dict = None):
+    """Appends a change in the caller's transaction. Call before commit."""
+    if not project_id:
+        return None
+    target = _next_revision(db, project_id)
+    if target is None:
+        return None
+    pk, revision = target
+    now = current_time_millis()
+    change = Change(
+        project_pk=pk,
+        revision=revision,
+        entity=entity,
+        entity_id=entity_id,
+        operation=operation,
+        payload=payload or {},
+        created_at=now,
+        actor=_current_actor.get(),
+    )
+    db.add(change)
+    # The dashboard orders projects by it; once per project and transaction is enough
+    transaction, touched = db.info.get("last_activity", (None, set()))
+    if transaction is not db.get_transaction():
+        touched = set()
+        db.info["last_activity"] = (db.get_transaction(), touched)
+    if pk not in touched:
+        db.query(Project).filter(Project.pk == pk).update({Project.last_activity: now}, synchronize_session=False)
+        touched.add(pk)
+    if db.get_bind().dialect.name == "postgresql":
+        # Delivered by Postgres only when the transaction commits
+        db.execute(text("SELECT pg_notify(:channel, :msg)"),
+                   {"channel": NOTIFY_CHANNEL, "msg": f"{project_id}:{change.revision}"})
+    return change
+
+def record_rollup(db: Session, project_id: str, rolled_up: dict):
+    """Records the derived statuses status_rollup changed ({id: status}), one partial hypothesis change each."""
+    for h_id, status in rolled_up.items():
+        record_change(db, project_id, "hypothesis", "update", h_id, {"id": h_id, "derived_status": status})
+
+# --- READING ---
+
+def latest_revision(db: Session, project_id: str) -> int:
+    return db.query(func.max(Change.revision)).filter(Change.project_pk == project_pk(project_id)).scalar() or 0
+
+def others_since(db: Session, project_pk_value: int, revision: int, actor: str) -> bool:
+    """Whether anyone but `actor` (or an unattributed write) recorded a change after `revision`."""
+    return db.query(
+        db.query(Change.id)
+        .filter(Change.project_pk == project_pk_value, Change.revision > revision,
+                (Change.actor != actor) | Change.actor.is_(None))
+        .exists()
+    ).scalar()
+
+def changes_since(db: Session, project_id: str, cursor: int = 0, limit: int = 500):
+    """Returns (changes, new_cursor) for revisions strictly after `cursor`."""
+    rows = (
+        db.query(Change)
+        .filter(Change.project_pk == project_pk(project_id), Change.revision > cursor)
+        .order_by(Change.revision)
+        .limit(limit)
+        .all()
+    )
+    changes = [{
+        "revision": c.revision,
+        "entity": c.entity,
+        "entity_id": c.entity_id,
+        "operation": c.operation,
+        "payload": c.payload or {},
+        "created_at": c.created_at,
+    } for c in rows]
+    return changes, (changes[-1]["revision"] if changes else cursor)
+
+_UPDATE_FIELDS = ("id", "author", "date", "content", "metrics", "evidence_status")
+
+def _reparent(nodes: dict, h_id: str, old_parent, new_parent):
+    if old_parent in nodes and h_id in nodes[old_parent]["children"]:
+        nodes[old_parent]["children"].remove(h_id)
+    parent = nodes.get(new_parent)
+    if parent is not None and h_id not in parent["children"]:
+        # Children are listed in creation order, which is the order of the node map
+        order = {n: i for i, n in enumerate(nodes)}
+        parent["children"] = sorted(parent["children"] + [h_id], key=lambda n: order.get(n, len(order)))
+
+def apply_changes(nodes: dict, project: dict, changes) -> bool:
+    """
+    Applies hypothesis/update/project changes to a client-side node map (dicts
+    keyed by id, shaped like load_project_nodes) in place. Hypothesis payloads
+    may be partial and are merged. Returns False when the client must reload the
+    project instead, e.g. after an undo restored an older version.
+    """
+    for change in changes:
+        op = change["operation"]
+        entity = change["entity"]
+        payload = change["payload"]
+        if op == "restore":
+            return False
+
+        if entity == "hypothesis":
+            h_id = change["entity_id"]
+            old = nodes.get(h_id)
+            if op == "delete":
+                if old is not None:
+                    _reparent(nodes, h_id, old.get("parent_id"), None)
+                # delete_hypothesis takes the subtree with it
+                doomed = [h_id]
+                while doomed:
+                    gone = nodes.pop(doomed.pop(), None)
+                    if gone is not None:
+                        doomed.extend(gone["children"])
+                continue
+            if old is None:
+                old = {"parent_id": None, "children": [], "updates": []}
+            node = dict(old, **payload)
+            node["children"], node["updates"] = old["children"], old["updates"]
+            nodes[h_id] = node  # an existing key keeps its place in the map
+            if "parent_id" in payload and (payload["parent_id"] != old["parent_id"] or op == "create"):
+                _reparent(nodes, h_id, old["parent_id"], payload["parent_id"])
+        elif entity == "update":
+            u_id = change["entity_id"]
+            for node in nodes.values():
+                if any(u["id"] == u_id for u in node["updates"]):
+                    node["updates"] = [u for u in node["updates"] if u["id"] != u_id]
+            node = nodes.get(payload.get("hypothesis_id"))
+            if op != "delete" and node is not None:
+                # Same order as a reload: by date, then id
+                node["updates"] = sorted(node["updates"] + [{k: payload.get(k) for k in _UPDATE_FIELDS}],
+                                         key=lambda u: (u["date"] or 0, u["id"]))
+        elif entity == "project" and project is not None:
+            project.update(payload)
+    return True
+
+# --- POSTGRES FAST PATH ---
+
+# One LISTENing connection per engine, open across calls so no NOTIFY between them is lost
+_listeners = {}
+_listeners_lock = threading.Lock()
+
+def _listener(engine):
+    dbapi_conn = _listeners.get(engine)
+    if dbapi_conn is None or dbapi_conn.closed:
+        raw = engine.raw_connection()
+        raw.detach()  # held for good, so it leaves the pool
+        dbapi_conn = raw.driver_connection
+        dbapi_conn.autocommit = True
+        with dbapi_conn.cursor() as cur:
+            cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+        _listeners[engine] = dbapi_conn
+    return dbapi_conn
+
+def wait_for_changes(engine, timeout: float = 5.0):
+    """
+    Blocks until a change notification arrives or `timeout` passes (Postgres only).
+    Returns the set of project ids that changed since the previous call; one
+    caller waits at a time. Other dialects return an empty set right away, so
+    callers fall back to polling `changes_since`.
+    """
+    if engine.dialect.name != "postgresql":
+        return set()
+    with _listeners_lock:
+        dbapi_conn = _listener(engine)
+        try:
+            dbapi_conn.poll()  # what arrived since the previous call
+            if not dbapi_conn.notifies:
+                ready, _, _ = select.select([dbapi_conn], [], [], timeout)
+                if ready:
+                    dbapi_conn.poll()
+        except Exception:
+            # The next call listens on a new connection
+            _listeners.pop(engine, None)
+            dbapi_conn.close()
+            raise
+        changed = set()
+        while dbapi_conn.notifies:
+            changed.add(dbapi_conn.notifies.pop(0).payload.split(":", 1)[0])
+        return changed
@@ -0,0 +1,337 @@
+import math
+import sys
+from array import array
+from collections.abc import Mapping
+
+# Compact, read-only form of one project version, for keeping many versions in
+# memory (the snapshot cache). Instead of a dict per hypothesis and per update:
+#
+# - hypothesis ids map to integer indexes; the tree is a parent index array
+#   plus children in CSR form (child_start / child_index),
+# - statuses, evidence statuses and authors are small-integer codes,
+# - updates are columns grouped by hypothesis (update_start); their UUIDs are
+#   packed as 16 bytes and float metrics as (name code, value) columns,
+# - id, author and status strings are interned, so versions of the same
+#   project share one copy of each.
+#
+# CompactTree is a Mapping from hypothesis id to the snapshot-shaped dict, so it
+# drops in wherever snapshot data is read; the dicts are built on access.
+
+STATUSES = ("open", "tested", "proven", "disproven")
+EVIDENCE_STATUSES = ("neutral", "supporting", "refuting")
+
+_NO_POSITION = float("nan")
+
+def _pack_uuid(value):
+    """16 bytes for a canonical (lowercase, hyphenated) UUID string, else None."""
+    if not isinstance(value, str) or len(value) != 36 or value.count("-") != 4 or value != value.lower():
+        return None
+    if value[8] != "-" or value[13] != "-" or value[18] != "-" or value[23] != "-":
+        return None
+    digits = value.replace("-", "")
+    try:
+        packed = bytes.fromhex(digits)
+    except ValueError:
+        return None
+    return packed if packed.hex() == digits else None
+
+class CodeTable:
+    """Interned strings <-> dense integer codes. `values[code]` is the string."""
+    __slots__ = ("values", "codes")
+
+    def __init__(self, values=()):
+        self.values = []
+        self.codes = {}
+        for v in values:
+            self.code(v)
+
+    def code(self, value) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            if isinstance(value, str):
+                value = sys.intern(value)
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.values)
+
+class Node:
+    """Slotted view of one hypothesis of a CompactTree."""
+    __slots__ = ("tree", "index")
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def id(self):
+        return self.tree.ids.values[self.index]
+
+    @property
+    def parent_id(self):
+        p = self.tree.parent[self.index]
+        return self.tree.ids.values[p] if p >= 0 else self.tree.parent_ids.get(self.index)
+
+    @property
+    def status(self):
+        return self.tree.statuses.values[self.tree.status[self.index]]
+
+    @property
+    def statement(self):
+        return self.tree.statement[self.index]
+
+    @property
+    def metrics(self):
+        return self.tree.metrics[self.index] or []
+
+    @property
+    def position(self):
+        x, y = self.tree.pos_x[self.index], self.tree.pos_y[self.index]
+        return {} if math.isnan(x) else {"x": x, "y": y}
+
+    @property
+    def children(self):
+        ids = self.tree.ids.values
+        return [ids[c] for c in self.tree.child_indexes(self.index)]
+
+    @property
+    def updates(self):
+        t = self.tree
+        return [
+            {
+                "id": t.update_id_at(u),
+                "author": t.authors.values[t.update_author[u]],
+                "date": t.update_date[u],
+                "content": t.update_content[u],
+                "metrics": t.update_metrics_at(u),
+                "evidence_status": t.evidence.values[t.update_evidence[u]],
+            }
+            for u in range(t.update_start[self.index], t.update_start[self.index + 1])
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "project_id": self.tree.project_id,
+            "parent_id": self.parent_id,
+            "statement": self.statement,
+            "status": self.status,
+            "metrics": self.metrics,
+            "position": self.position,
+            "children": self.children,
+            "updates": self.updates,
+        }
+
+class CompactTree(Mapping):
+    __slots__ = (
+        "project_id", "ids", "parent", "parent_ids", "status", "statuses", "statement", "metrics",
+        "pos_x", "pos_y", "child_start", "child_index",
+        "update_start", "update_uuid", "update_other", "update_author", "update_date", "update_content",
+        "metric_start", "metric_name", "metric_value", "metric_other", "metric_names",
+        "update_evidence", "authors", "evidence",
+    )
+
+    def __init__(self, project_id=None):
+        self.project_id = sys.intern(project_id) if project_id else project_id
+        self.ids = CodeTable()
+        self.parent = array("i")  # parent index, -1 for the root (or a parent outside the version)
+        self.parent_ids = {}  # index -> parent id, for parents that aren't part of this version
+        self.status = array("B")
+        self.statuses = CodeTable(STATUSES)
+        self.statement = []
+        self.metrics = []  # metric targets, None when empty
+        self.pos_x = array("d")
+        self.pos_y = array("d")
+        self.child_start = array("i", [0])
+        self.child_index = array("i")
+        self.update_start = array("i", [0])
+        self.update_uuid = bytearray()  # 16 bytes per update id
+        self.update_other = {}  # update index -> id, for ids that aren't canonical UUIDs
+        self.update_author = array("I")
+        self.update_date = array("q")
+        self.update_content = []
+        self.metric_start = array("i", [0])  # per update, into metric_name / metric_value
+        self.metric_name = array("I")
+        self.metric_value = array("d")
+        self.metric_other = {}  # update index -> metrics dict, when not all values are floats
+        self.metric_names = CodeTable()
+        self.update_evidence = array("B")
+        self.authors = CodeTable()
+        self.evidence = CodeTable(EVIDENCE_STATUSES)
+
+    # --- BUILDING ---
+
+    def _add_hypothesis(self, h_id, statement, status, metrics, position):
+        self.ids.code(h_id)
+        self.status.append(self.statuses.code(status or "open"))
+        self.statement.append(statement)
+        self.metrics.append(metrics or None)
+        if position and "x" in position:
+            self.pos_x.append(position["x"])
+            self.pos_y.append(position.get("y", 0.0))
+        else:
+            self.pos_x.append(_NO_POSITION)
+            self.pos_y.append(_NO_POSITION)
+
+    def _add_update(self, u_id, author, date, content, metrics, evidence_status):
+        u = len(self.update_content)
+        packed = _pack_uuid(u_id)
+        if packed is None:
+            self.update_other[u] = u_id
+            packed = bytes(16)
+        self.update_uuid += packed
+        self.update_author.append(self.authors.code(author or ""))
+        self.update_date.append(int(date or 0))
+        self.update_content.append(content)
+        if metrics and all(type(v) is float for v in metrics.values()):
+            for name, value in metrics.items():
+                self.metric_name.append(self.metric_names.code(name))
+                self.metric_value.append(value)
+        elif metrics:
+            self.metric_other[u] = metrics
+        self.metric_start.append(len(self.metric_value))
+        self.update_evidence.append(self.evidence.code(evidence_status or "neutral"))
+
+    def _link(self, parent_ids, children):
+        """Parent array from parent ids, CSR children from per-node child id lists."""
+        codes = self.ids.codes
+        for i, p_id in enumerate(parent_ids):
+            p = codes.get(p_id, -1) if p_id else -1
+            self.parent.append(p)
+            if p < 0 and p_id:
+                self.parent_ids[i] = sys.intern(p_id)
+        for child_ids in children:
+            self.child_index.extend(codes[c] for c in child_ids if c in codes)
+            self.child_start.append(len(self.child_index))
+
+    @classmethod
+    def from_snapshot(cls, data: dict, project_id=None) -> "CompactTree":
+        """From a snapshot payload ({h_id: hypothesis dict with nested updates})."""
+        if project_id is None:
+            project_id = next((h.get("project_id") for h in data.values()), None)
+        tree = cls(project_id)
+        for h_id, h in data.items():
+            tree._add_hypothesis(h_id, h.get("statement", ""), h.get("status"), h.get("metrics"), h.get("position"))
+            for u in h.get("updates", ()):
+                tree._add_update(u["id"], u.get("author"), u.get("date"), u.get("content", ""),
+                                 u.get("metrics"), u.get("evidence_status"))
+            tree.update_start.append(len(tree.update_content))
+        tree._link([h.get("parent_id") for h in data.values()], [h.get("children", ()) for h in data.values()])
+        return tree
+
+    @classmethod
+    def from_rows(cls, project_id, hypotheses, updates) -> "CompactTree":
+        """
+        From SQL rows: `hypotheses` with (id, parent_id, statement, status, metrics,
+        position) in snapshot order, `updates` with (id, hypothesis_id, author, date,
+        content, metrics, evidence_status) in date order within each hypothesis.
+        Children are listed in hypothesis order, as capture_project_state does.
+        """
+        tree = cls(project_id)
+        parent_ids = []
+        for h in hypotheses:
+            tree._add_hypothesis(h.id, h.statement, h.status, h.metrics, h.position)
+            parent_ids.append(h.parent_id)
+
+        by_node = [[] for _ in parent_ids]
+        codes = tree.ids.codes
+        for u in updates:
+            i = codes.get(u.hypothesis_id)
+            if i is not None:
+                by_node[i].append(u)
+        for node_updates in by_node:
+            for u in node_updates:
+                tree._add_update(u.id, u.author, u.date, u.content, u.metrics, u.evidence_status)
+            tree.update_start.append(len(tree.update_content))
+
+        children = [[] for _ in parent_ids]
+        for h_id, p_id in zip(tree.ids.values, parent_ids):
+            p = codes.get(p_id) if p_id else None
+            if p is not None:
+                children[p].append(h_id)
+        tree._link(parent_ids, children)
+        return tree
+
+    @classmethod
+    def from_sql(cls, db, project_id) -> "CompactTree":
+        """The current state of a project, read with two column queries."""
+        from sqlalchemy.orm import aliased
+        from models_sql import Hypothesis, Update, project_pk
+        parent = aliased(Hypothesis)
+        pk = project_pk(project_id)
+        hypotheses = (
+            db.query(Hypothesis.id, parent.id.label("parent_id"), Hypothesis.statement, Hypothesis.status,
+                     Hypothesis.metrics, Hypothesis.position)
+            .outerjoin(parent, parent.pk == Hypothesis.parent_pk)
+            .filter(Hypothesis.project_pk == pk)
+            .order_by(Hypothesis.created_at, Hypothesis.pk)
+            .all()
+        )
+        updates = (
+            db.query(Update.id, Hypothesis.id.label("hypothesis_id"), Update.author, Update.date, Update.content,
+                     Update.metrics, Update.evidence_status)
+            .join(Hypothesis, Hypothesis.pk == Update.hypothesis_pk)
+            .filter(Hypothesis.project_pk == pk)
+            .order_by(Update.date, Update.id)
+        )
+        return cls.from_rows(project_id, hypotheses, updates)
+
+    # --- READING ---
+
+    def node(self, h_id):
+        i = self.ids.codes.get(h_id)
+        return Node(self, i) if i is not None else None
+
+    def child_indexes(self, i):
+        return self.child_index[self.child_start[i]:self.child_start[i + 1]]
+
+    def update_id_at(self, u):
+        other = self.update_other.get(u)
+        if other is not None:
+            return other
+        h = self.update_uuid[16 * u:16 * u + 16].hex()
+        return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+    def update_metrics_at(self, u):
+        other = self.metric_other.get(u)
+        if other is not None:
+            return other
+        names = self.metric_names.values
+        return {names[self.metric_name[m]]: self.metric_value[m] for m in range(self.metric_start[u], self.metric_start[u + 1])}
+
+    def hypothesis(self, h_id):
+        """The hypothesis as a models.Hypothesis dataclass (what data_manager returns), or None."""
+        from models import Hypothesis as H_Dataclass, Update as U_Dataclass
+        node = self.node(h_id)
+        if node is None:
+            return None
+        data = node.to_dict()
+        data["updates"] = [U_Dataclass(**u) for u in data["updates"]]
+        return H_Dataclass(**data)
+
+    def status_counts(self) -> dict:
+        counts = dict.fromkeys(self.statuses.values, 0)
+        for code in self.status:
+            counts[self.statuses.values[code]] += 1
+        return counts
+
+    def to_snapshot(self) -> dict:
+        return {h_id: Node(self, i).to_dict() for i, h_id in enumerate(self.ids.values)}
+
+    # Mapping protocol: tree[h_id] is the snapshot dict of that hypothesis
+    def __getitem__(self, h_id):
+        i = self.ids.codes.get(h_id)
+        if i is None:
+            raise KeyError(h_id)
+        return Node(self, i).to_dict()
+
+    def __contains__(self, h_id):
+        return h_id in self.ids.codes
+
+    def __iter__(self):
+        return iter(self.ids.values)
+
+    def __len__(self):
+        return len(self.ids)
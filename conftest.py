@@ -0,0 +1,27 @@
+import os
+import tempfile
+
+import pytest
+
+# Point the app at a throwaway database before any test module imports
+# database.py. Always overridden, so a DATABASE_URL exported in the shell (a
+# Postgres dev server, say) is never written to by the tests.
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test.db"
+os.environ.pop("DATABASE_READ_URLS", None)
+
+@pytest.fixture
+def make_project():
+    """
+    Factory for test projects: make_project(title, root=..., children=(...))
+    returns (project, root id, [child ids]) with the children in creation order.
+    """
+    import data_manager_sql as dm
+
+    def make(title="Test Project", root="Root claim", children=()):
+        project = dm.create_project(title, root)
+        root_id = project.north_star_hypothesis_id
+        for statement in children:
+            dm.add_subhypothesis(root_id, statement)
+        return project, root_id, list(dm.get_hypothesis(root_id).children) if children else []
+
+    return make
@@ -0,0 +1,101 @@
+from models_sql import Project, Hypothesis, Update
+from compact_tree import STATUSES
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session, aliased
+
+# Dashboard listing: one page of projects with their node count, status breakdown
+# and last evidence date, from a single grouped query. Pages are keyset-paginated
+# on (last activity, pk), so page 50 costs the same as page 1 and a project that
+# becomes active while someone pages doesn't shift the later pages.
+#
+# Last activity is projects.last_activity, the time of a project's latest
+# change-feed row (change_feed.record_change keeps it current). A page is one
+# range scan of the (last_activity, pk) index.
+
+DEFAULT_PAGE_SIZE = 20
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def encode_cursor(last_activity, pk) -> str:
+    return f"{last_activity or 0}:{pk}"
+
+def decode_cursor(cursor: str):
+    try:
+        last_activity, pk = cursor.split(":")
+        return int(last_activity), int(pk)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid dashboard cursor: {cursor!r}")
+
+def project_page(db: Session, cursor: str = None, status: str = None, title_prefix: str = None,
+                 page_size: int = DEFAULT_PAGE_SIZE) -> dict:
+    """
+    Returns {"projects": [...], "next_cursor": str or None}, most recently active first.
+    Pass `next_cursor` back as `cursor` for the following page.
+    """
+    page = select(Project.pk, Project.id, Project.title, Project.status, Project.north_star_hypothesis_id,
+                  Project.created_at, Project.last_activity)
+    if status:
+        page = page.where(Project.status == status)
+    if title_prefix:
+        page = page.where(Project.title.ilike(_escape_like(title_prefix) + "%", escape="\\"))
+    if cursor:
+        after_activity, after_pk = decode_cursor(cursor)
+        # The first condition alone is what lets the index seek straight to the page
+        page = page.where(Project.last_activity <= after_activity, or_(
+            Project.last_activity < after_activity,
+            and_(Project.last_activity == after_activity, Project.pk < after_pk),
+        ))
+    # One extra row tells whether there is a next page
+    page = page.order_by(Project.last_activity.desc(), Project.pk.desc()).limit(page_size + 1).subquery("page")
+
+    # Stats for the page only: one row per (project, status) present
+    node = aliased(Hypothesis)
+    last_update = (
+        select(func.max(Update.date))
+        .join(node, node.pk == Update.hypothesis_pk)
+        .where(node.project_pk == page.c.pk)
+        .correlate(page)
+        .scalar_subquery()
+    )
+    rows = db.execute(
+        select(page, Hypothesis.status.label("node_status"), func.count(Hypothesis.pk).label("nodes"),
+               last_update.label("last_update"))
+        .select_from(page)
+        .outerjoin(Hypothesis, Hypothesis.project_pk == page.c.pk)
+        .group_by(*page.c, Hypothesis.status)
+        .order_by(page.c.last_activity.desc(), page.c.pk.desc())
+    ).mappings().all()
+
+    projects = {}
+    for row in rows:
+        project = projects.get(row["pk"])
+        if project is None:
+            project = projects[row["pk"]] = {
+                "id": row["id"],
+                "title": row["title"],
+                "status": row["status"],
+                "north_star_hypothesis_id": row["north_star_hypothesis_id"],
+                "created_at": row["created_at"],
+                "last_activity": row["last_activity"],
+                "last_update": row["last_update"],
+                "node_count": 0,
+                "status_counts": dict.fromkeys(STATUSES, 0),
+                "_pk": row["pk"],
+            }
+        if row["nodes"]:
+            project["node_count"] += row["nodes"]
+            project["status_counts"][row["node_status"]] = project["status_counts"].get(row["node_status"], 0) + row["nodes"]
+
+    listing = list(projects.values())
+    next_cursor = None
+    if len(listing) > page_size:
+        listing = listing[:page_size]
+        next_cursor = encode_cursor(listing[-1]["last_activity"], listing[-1]["_pk"])
+    for project in listing:
+        del project["_pk"]
+    return {"projects": listing, "next_cursor": next_cursor}
+
+def project_statuses(db: Session) -> list:
+    """Distinct project statuses, for the dashboard filter."""
+    return [s for (s,) in db.execute(select(Project.status).distinct().order_by(Project.status)) if s]
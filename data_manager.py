@@ -15,9 +15,6 @@ def _ensure_dir(path):
     if not os.path.exists(path):
         os.makedirs(path)
 
-_ensure_dir(DATA_DIR)
-_ensure_dir(HISTORY_DIR)
-
 def _load_json(filepath):
     if not os.path.exists(filepath):
         return {}
@@ -25,6 +22,8 @@ def _load_json(filepath):
         return json.load(f)
 
 def _save_json(filepath, data):
+    # Directories are created on first write rather than at import
+    _ensure_dir(os.path.dirname(filepath))
     with open(filepath, 'w') as f:
         json.dump(data, f, indent=2)
 
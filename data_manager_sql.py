@@ -1,307 +1,870 @@
-from database import get_db, init_db
-from models_sql import Project, Hypothesis, Update, Snapshot
-from sqlalchemy.orm import Session
+from database import DATABASE_URL, SessionLocal, ensure_schema, track_queries, use_primary
+from models_sql import Project, Hypothesis, Update, Snapshot, MetricPoint, project_pk
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import case, func, insert, inspect, select
+import contextvars
+import copy
+from contextlib import contextmanager
+import functools
+import hashlib
+import inspect as pyinspect
+import change_feed
+import compact_tree
+import dashboard
+import edges
+import exporter
+import people
+import read_cache
+import search
+import shared_cache
+import snapshot_diff
+import snapshot_writer
+import status_rollup
+import startup
+import timeline
 import time
 import json
 
-# Ensure DB tables exist
-init_db()
+# pandas/numpy load on the first metrics call, not on import
+metrics_store = startup.LazyModule("metrics_store")
+
+# One session per outermost data-manager call; nested calls share it and it is
+# closed (returning its connection to the pool) when that call returns.
+# Sessions don't expire on commit, so returned objects stay readable once detached.
+_current_session = contextvars.ContextVar("dm_session", default=None)
+# Label of the outermost data-manager write in progress; snapshots it requests are tagged with it
+_current_action = contextvars.ContextVar("dm_action", default=None)
+# The open unit of work, if any (see unit_of_work)
+_current_unit = contextvars.ContextVar("dm_unit", default=None)
 
 def _get_session():
-    return next(get_db())
+    db = _current_session.get()
+    return db if db is not None else SessionLocal()
+
+def _writes(fn):
+    """Marks a mutation: its whole session, reads included, runs on the primary."""
+    fn._writes = True
+    return fn
+
+def _action_of(fn) -> str:
+    return fn.__name__.replace("_", " ").capitalize()
+
+@contextmanager
+def unit_of_work(action: str = None):
+    """
+    Runs every data-manager write in the block as one transaction: the changes,
+    their history (change feed) and aggregates are flushed as they go and
+    committed once at the end, or rolled back together if anything raises.
+    Cache invalidations and snapshot requests wait for the commit; each project
+    touched gets one snapshot, labelled with the actions of the block (or
+    `action`). Every write opens its own unit; scripts can wrap many writes in
+    one to batch them. Nested blocks join the outer one.
+
+        with dm.unit_of_work("Import results"):
+            for row in rows:
+                dm.add_update(row.h_id, row.author, row.content, row.metrics, "neutral")
+    """
+    if _current_unit.get() is not None:
+        yield _current_session.get()
+        return
+    ensure_schema()
+    db = SessionLocal(info={"primary": True})
+    unit = {"keys": set(), "tags": set(), "snapshots": {}}  # snapshots: project_id -> [action, ...]
+    tokens = [(_current_session, _current_session.set(db)), (_current_unit, _current_unit.set(unit))]
+    if action:
+        tokens.append((_current_action, _current_action.set(action)))
+    committed = False
+    try:
+        yield db
+        db.commit()
+        committed = True
+    finally:
+        if not committed:
+            db.rollback()
+        for var, token in reversed(tokens):
+            var.reset(token)
+        db.close()
+        # Reads inside the unit may have cached rows it wrote, so drop them even after a rollback
+        _cache.invalidate(*unit["keys"])
+        for tag in unit["tags"]:
+            _cache.invalidate_tag(tag)
+    if committed:
+        for project_id, actions in unit["snapshots"].items():
+            request_snapshot(project_id, snapshot_writer.action_label(actions))
+
+def _session_scope(fn):
+    writes = getattr(fn, "_writes", False)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if writes:
+            # The first write of a unit names the snapshots it requests, unless the unit has a name
+            action = _current_action.set(_action_of(fn)) if _current_action.get() is None else None
+            try:
+                with unit_of_work():
+                    return fn(*args, **kwargs)
+            finally:
+                if action is not None:
+                    _current_action.reset(action)
+        if _current_session.get() is not None:
+            return fn(*args, **kwargs)
+        ensure_schema()
+        db = SessionLocal()
+        token = _current_session.set(db)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_session.reset(token)
+            db.close()
+    return wrapper
+
+# Read-through cache for projects, hypotheses and snapshots. Writes invalidate
+# the entries they change after their commit, so readers never re-cache old rows.
+_cache = read_cache.get_cache()
+
+def _invalidate(*keys):
+    """Drops cache entries once the open unit of work ends (right away outside one)."""
+    unit = _current_unit.get()
+    if unit is None:
+        _cache.invalidate(*keys)
+    else:
+        unit["keys"].update(keys)
+
+def _invalidate_tag(tag):
+    unit = _current_unit.get()
+    if unit is None:
+        _cache.invalidate_tag(tag)
+    else:
+        unit["tags"].add(tag)
+
+def _invalidate_hypotheses(*h_ids):
+    _invalidate(*(key for h_id in h_ids if h_id for key in (("hypothesis", h_id), ("evidence_counts", h_id))))
+
+# Expensive per-project results (node maps, version hashes, reports) are also
+# shared between processes, keyed by database, project and change-feed revision;
+# see shared_cache.py.
+_shared = shared_cache.get_shared_cache()
+_shared_namespace = hashlib.blake2b(DATABASE_URL.encode(), digest_size=6).hexdigest()
+
+def _shared_at_revision(name, project_id, compute, revision=None):
+    if _current_unit.get() is not None:
+        # Revisions taken inside an uncommitted unit may be rolled back and reused
+        return compute()
+    if revision is None:
+        revision = change_feed.latest_revision(_get_session(), project_id)
+    return _shared.get_or_compute(shared_cache.make_key(_shared_namespace, name, project_id, revision), compute)
+
+def _cached(key, loader, tags=()):
+    # Fill from the primary: an entry read from a lagging replica would outlive the write's invalidation
+    def load():
+        with use_primary():
+            return loader()
+    return _cache.get_or_load(key, load, tags)
 
 # --- PROJECTS ---
 
+@_writes
 def create_project(title: str, north_star_statement: str):
     db: Session = _get_session()
     
     # 1. Create Project
     new_project = Project(title=title)
     db.add(new_project)
-    db.commit()
-    db.refresh(new_project)
+    db.flush()
+    change_feed.record_change(db, new_project.id, "project", "create", new_project.id, change_feed.project_payload(new_project))
     
     # 2. Create North Star Hypothesis
     ns_hypothesis = Hypothesis(
-        project_id=new_project.id,
+        project_pk=new_project.pk,
         statement=north_star_statement,
         position={"x": 0, "y": 0}
     )
     db.add(ns_hypothesis)
-    db.commit()
-    db.refresh(ns_hypothesis)
+    db.flush()
+    search.index_hypothesis(db, ns_hypothesis)
+    change_feed.record_change(db, new_project.id, "hypothesis", "create", ns_hypothesis.id, change_feed.hypothesis_payload(ns_hypothesis))
     
     # 3. Link North Star to Project
     new_project.north_star_hypothesis_id = ns_hypothesis.id
-    db.commit()
+    change_feed.record_change(db, new_project.id, "project", "update", new_project.id, change_feed.project_payload(new_project))
+    _invalidate(("projects",))
     
-    # 4. Initial Snapshot
-    save_snapshot(new_project.id)
+    # 4. Initial Snapshot, taken once the unit of work commits
+    request_snapshot(new_project.id)
     return new_project
 
 def get_projects():
     db = _get_session()
-    return db.query(Project).all()
+    return _cached(("projects",), lambda: db.query(Project).all())
+
+def get_dashboard_projects(cursor: str = None, status: str = None, title_prefix: str = None,
+                           page_size: int = dashboard.DEFAULT_PAGE_SIZE):
+    """One page of projects with node counts, status breakdown and last activity (see dashboard.py)."""
+    db = _get_session()
+    return dashboard.project_page(db, cursor=cursor, status=status, title_prefix=title_prefix, page_size=page_size)
+
+def get_project_statuses():
+    db = _get_session()
+    return dashboard.project_statuses(db)
 
+@_writes
 def save_project(project: Project):
     db = _get_session()
     # If detached, merge
-    db.merge(project)
-    db.commit()
+    merged = db.merge(project)
+    change_feed.record_change(db, merged.id, "project", "update", merged.id, change_feed.project_payload(merged))
+    db.flush()  # committed by the unit of work
+    _invalidate(("projects",))
 
 # --- HYPOTHESES ---
 
+def _hypothesis_record(h: Hypothesis) -> dict:
+    # Snapshot-shaped plain data: what get_hypothesis caches, so no caller can reach a live row
+    record = change_feed.hypothesis_payload(h)
+    record["updates"] = [change_feed.update_payload(u) for u in h.updates]
+    record["children"] = h.children
+    return record
+
+def _hypothesis_dataclass(data: dict):
+    from models import Hypothesis as H_Dataclass, Update as U_Dataclass
+    # Deep copy so a caller editing the result can't change the snapshot or cache entry it came from
+    data = copy.deepcopy(data)
+    data['updates'] = [U_Dataclass(**u) for u in data.get('updates', [])]
+    return H_Dataclass(**data)
+
 def get_hypothesis(h_id: str, snapshot_data=None):
+    """
+    A hypothesis as a models.Hypothesis dataclass (updates and children
+    included), read live or from `snapshot_data`; None if it doesn't exist.
+    Edit it and pass it to save_hypothesis, or use the targeted writes.
+    """
+    if isinstance(snapshot_data, compact_tree.CompactTree):
+        return snapshot_data.hypothesis(h_id)
     if snapshot_data:
         # Fallback to reading from dict if snapshot provided
-        from models import Hypothesis as H_Dataclass, Update as U_Dataclass
-        if h_id in snapshot_data:
-            data = snapshot_data[h_id]
-            # Convert dict updates to Dataclass updates
-            raw_updates = data.get('updates', [])
-            clean_updates = [U_Dataclass(**u) for u in raw_updates]
-            data['updates'] = clean_updates
-            return H_Dataclass(**data)
-        return None
+        return _hypothesis_dataclass(snapshot_data[h_id]) if h_id in snapshot_data else None
 
     db = _get_session()
-    return db.query(Hypothesis).filter(Hypothesis.id == h_id).first()
-
+    def load():
+        h = (
+            db.query(Hypothesis)
+            .options(selectinload(Hypothesis.updates), selectinload(Hypothesis.children_nodes))
+            .filter(Hypothesis.id == h_id)
+            .first()
+        )
+        return _hypothesis_record(h) if h else None
+    record = _cached(("hypothesis", h_id), load, tags=lambda r: [("project", r["project_id"])])
+    return _hypothesis_dataclass(record) if record else None
+
+def _save_hypothesis_row(db, h: Hypothesis, trigger_snapshot=True):
+    # Flushes edits made to row `h`, then rolls its status up and records it
+    old_parent_pks = [pk for pk in inspect(h).attrs.parent_pk.history.deleted if pk]
+    old_parents = [h_id for (h_id,) in db.query(Hypothesis.id).filter(Hypothesis.pk.in_(old_parent_pks))] if old_parent_pks else []
+    reshaped = old_parent_pks or inspect(h).attrs.status.history.deleted
+    db.flush()
+    rolled_up = status_rollup.propagate(db, [h.pk, *old_parent_pks]) if reshaped else {}
+    search.index_hypothesis(db, h)
+    change_feed.record_change(db, h.project_id, "hypothesis", "update", h.id, change_feed.hypothesis_payload(h))
+    change_feed.record_rollup(db, h.project_id, rolled_up)
+    db.flush()  # committed by the unit of work
+    _invalidate_hypotheses(h.id, h.parent_id, *old_parents, *rolled_up)
+
+    if trigger_snapshot:
+        request_snapshot(h.project_id)
+
+@_writes
 def save_hypothesis(h, trigger_snapshot=True):
+    """
+    Writes the editable fields of `h` (statement, status, metrics, position
+    and parent) to its row. Updates and children are not written from `h`:
+    they change through add_update, add_subhypothesis and the other writes.
+    """
     db = _get_session()
-    db.merge(h)
-    db.commit()
-    
-    if trigger_snapshot and h.project_id:
-        save_snapshot(h.project_id)
+    row = db.query(Hypothesis).filter(Hypothesis.id == h.id).first()
+    if not row: return
+    row.statement, row.status, row.metrics, row.position = h.statement, h.status, h.metrics, h.position
+    if h.parent_id != row.parent_id:
+        row.parent_pk = db.query(Hypothesis.pk).filter(Hypothesis.id == h.parent_id).scalar() if h.parent_id else None
+    _save_hypothesis_row(db, row, trigger_snapshot)
+
+@_writes
+def set_hypothesis_status(h_id: str, status: str):
+    """Sets the status of one hypothesis, leaving the rest of it as stored."""
+    db = _get_session()
+    row = db.query(Hypothesis).filter(Hypothesis.id == h_id).first()
+    if not row: return
+    row.status = status
+    _save_hypothesis_row(db, row)
 
+@_writes
 def add_subhypothesis(parent_id: str, statement: str):
     db = _get_session()
     parent = db.query(Hypothesis).filter(Hypothesis.id == parent_id).first()
     if not parent: return
     
     child = Hypothesis(
-        project_id=parent.project_id,
-        parent_id=parent.id,
+        project_pk=parent.project_pk,
+        parent=parent,
         statement=statement,
         position={"x": 0, "y": 0}
     )
     db.add(child)
-    db.commit()
+    db.flush()
+    rolled_up = status_rollup.propagate(db, [child.pk])
+    search.index_hypothesis(db, child)
+    change_feed.record_change(db, child.project_id, "hypothesis", "create", child.id, change_feed.hypothesis_payload(child))
+    change_feed.record_rollup(db, child.project_id, rolled_up)
+    db.flush()  # committed by the unit of work
+    _invalidate_hypotheses(parent.id, *rolled_up)
     
-    save_snapshot(parent.project_id)
+    request_snapshot(parent.project_id)
 
+@_writes
 def delete_hypothesis(h_id: str):
+    """Deletes a hypothesis with everything below it in the tree, and their updates and edges."""
     db = _get_session()
     h = db.query(Hypothesis).filter(Hypothesis.id == h_id).first()
     if not h: return
     
     pid = h.project_id
+    # The subtree by tree links; nodes that are also linked elsewhere as extra children go too
+    below = select(Hypothesis.pk, Hypothesis.id).where(Hypothesis.pk == h.pk).cte("below", recursive=True)
+    below = below.union_all(select(Hypothesis.pk, Hypothesis.id).join(below, Hypothesis.parent_pk == below.c.pk))
+    subtree = dict(db.execute(select(below.c.pk, below.c.id)).all())
     
-    # If root/north star, prevent? Or allow and break project?
-    # Logic: Delete h and all children (cascade handles children updates via ORM if strict, 
-    # but self-referential cascade is tricky, SQLAlchemy usually needs 'cascade="all, delete-orphan"' on relationship)
-    
-    db.delete(h)
-    db.commit()
+    search.remove_hypotheses(db, subtree.values())
+    people.forget_updates(db, select(Update.pk).where(Update.hypothesis_pk.in_(subtree)))
+    # One change: feed readers drop the whole subtree with it
+    change_feed.record_change(db, pid, "hypothesis", "delete", h.id, {"id": h.id, "parent_id": h.parent_id})
+    # Their edges go with them; hypotheses outside that lose an extra child get rolled up again
+    unlinked = edges.forget_hypotheses(db, list(subtree))
+    extra_parents = {source for source, target, kind in unlinked if kind == "subhypothesis" and source not in subtree}
+    parent_pk = h.parent_pk
+    db.query(MetricPoint).filter(MetricPoint.hypothesis_pk.in_(subtree)).delete(synchronize_session=False)
+    db.query(Update).filter(Update.hypothesis_pk.in_(subtree)).delete(synchronize_session=False)
+    db.query(Hypothesis).filter(Hypothesis.pk.in_(subtree)).update({Hypothesis.parent_pk: None}, synchronize_session=False)
+    db.query(Hypothesis).filter(Hypothesis.pk.in_(subtree)).delete(synchronize_session=False)
+    db.expunge(h)
+    rolled_up = status_rollup.propagate(db, [parent_pk, *extra_parents])
+    change_feed.record_rollup(db, pid, rolled_up)
+    db.flush()  # committed by the unit of work
+    _invalidate_hypotheses(*subtree.values(), h.parent_id, *rolled_up)
     
-    save_snapshot(pid)
+    request_snapshot(pid)
 
+@_writes
 def reverse_relationship(child_id: str):
+    """Swaps a hypothesis with its parent. Raises ValueError if that would close a cycle."""
     db = _get_session()
     child = db.query(Hypothesis).filter(Hypothesis.id == child_id).first()
-    if not child or not child.parent_id: return
+    if not child or not child.parent_pk: return
 
-    parent = db.query(Hypothesis).filter(Hypothesis.id == child.parent_id).first()
+    parent = db.query(Hypothesis).filter(Hypothesis.pk == child.parent_pk).first()
     if not parent: return
     
     grandparent_id = parent.parent_id
+    grandparent_pk = parent.parent_pk
     
     # 1. Parent becomes child of Child
-    parent.parent_id = child.id
+    parent.parent_pk = child.pk
     
     # 2. Child adopts Grandparent
-    child.parent_id = grandparent_id
+    child.parent_pk = grandparent_pk
+    db.flush()  # so the payloads below read the new parent ids
+    # Another path from the old parent down to the child (an extra parent edge) now closes a loop
+    if edges.creates_cycle(db, child.pk, parent.pk, "subhypothesis"):
+        raise ValueError("Reversing this relationship would create a cycle")
+    rolled_up = status_rollup.propagate(db, [parent.pk])
     
     # 3. Update North Star if needed
     if not grandparent_id:
-        proj = db.query(Project).filter(Project.id == parent.project_id).first()
+        proj = db.query(Project).filter(Project.pk == parent.project_pk).first()
         if proj and proj.north_star_hypothesis_id == parent.id:
             proj.north_star_hypothesis_id = child.id
             db.merge(proj)
+            change_feed.record_change(db, proj.id, "project", "update", proj.id, change_feed.project_payload(proj))
+
+    change_feed.record_change(db, parent.project_id, "hypothesis", "update", parent.id, change_feed.hypothesis_payload(parent))
+    change_feed.record_change(db, child.project_id, "hypothesis", "update", child.id, change_feed.hypothesis_payload(child))
+    change_feed.record_rollup(db, child.project_id, rolled_up)
+    db.flush()  # committed by the unit of work
+    _invalidate_hypotheses(child.id, parent.id, grandparent_id, *rolled_up)
+    if not grandparent_id:
+        _invalidate(("projects",))
+    request_snapshot(child.project_id)
 
-    db.commit()
-    save_snapshot(child.project_id)
+# --- CROSS-LINKS ---
+
+@_writes
+def link_hypotheses(source_id: str, target_id: str, kind: str = "supports"):
+    """
+    Adds an edge of `kind` (see edges.EDGE_KINDS) between two hypotheses of a
+    project and returns its id. Raises ValueError if it would close a cycle.
+    """
+    db = _get_session()
+    found = {h.id: h for h in db.query(Hypothesis).filter(Hypothesis.id.in_([source_id, target_id]))}
+    source, target = found.get(source_id), found.get(target_id)
+    if not source or not target: return
+    edge = edges.add_edge(db, source, target, kind)
+    # An extra parent counts its new child in its rolled-up status
+    rolled_up = status_rollup.propagate(db, [source.pk]) if kind == "subhypothesis" else {}
+    change_feed.record_change(db, source.project_id, "edge", "create", edge.id, change_feed.edge_payload(edge))
+    change_feed.record_rollup(db, source.project_id, rolled_up)
+    db.flush()  # committed by the unit of work
+    _invalidate_hypotheses(*rolled_up)
+    return edge.id
+
+@_writes
+def unlink_hypotheses(edge_id: str):
+    """Removes an edge. Tree links are removed by deleting or re-parenting the child."""
+    db = _get_session()
+    removed = edges.remove_edge(db, edge_id)
+    if not removed: return
+    p_pk, source_pk, target_pk, kind = removed
+    rolled_up = status_rollup.propagate(db, [source_pk]) if kind == "subhypothesis" else {}
+    project_id = db.query(Project.id).filter(Project.pk == p_pk).scalar()
+    change_feed.record_change(db, project_id, "edge", "delete", edge_id, {"id": edge_id})
+    change_feed.record_rollup(db, project_id, rolled_up)
+    db.flush()  # committed by the unit of work
+    _invalidate_hypotheses(*rolled_up)
+
+def get_project_edges(project_id: str):
+    """Tree links and edges of a project as one adjacency list (see edges.adjacency)."""
+    db = _get_session()
+    return edges.adjacency(db, project_id)
 
 # --- SCIENTIFIC LOG ---
 
+def get_updates(hypothesis_id: str, before: str = None, limit: int = timeline.DEFAULT_PAGE_SIZE):
+    """One page of a hypothesis' updates, newest first; pass `next_cursor` back as `before` for the next."""
+    db = _get_session()
+    return timeline.updates_page(db, hypothesis_id, before=before, limit=limit)
+
+def get_evidence_counts(hypothesis_id: str):
+    """Supporting, refuting and neutral update counts of a hypothesis, plus their total."""
+    db = _get_session()
+    return _cached(("evidence_counts", hypothesis_id), lambda: timeline.evidence_counts(db, hypothesis_id))
+
+@_writes
 def add_update(h_id: str, author: str, content: str, metrics: dict, evidence_status: str):
     db = _get_session()
+    h = db.query(Hypothesis).filter(Hypothesis.id == h_id).first()
+    if not h: return
     up = Update(
-        hypothesis_id=h_id,
+        hypothesis=h,
         author=author,
         content=content,
         metrics=metrics,
         evidence_status=evidence_status
     )
     db.add(up)
-    db.commit()
+    db.flush()
     
     # Update Status Logic
+    search.index_update(db, up, h.project_id)
+    metrics_store.record_update_metrics(db, up, h.project_pk)
+    people.record_update(db, up, h.project_pk)
+    change_feed.record_change(db, h.project_id, "update", "create", up.id, change_feed.update_payload(up))
+    if evidence_status == "supporting":
+        h.status = "proven"
+    elif evidence_status == "refuting":
+        h.status = "disproven"
+    elif evidence_status == "neutral" and h.status == "open":
+        h.status = "tested"
+    rolled_up = status_rollup.propagate(db, [h.pk])
+    change_feed.record_change(db, h.project_id, "hypothesis", "update", h.id, change_feed.hypothesis_payload(h))
+    change_feed.record_rollup(db, h.project_id, rolled_up)
+    db.flush()  # committed by the unit of work
+    _invalidate_hypotheses(h_id, *rolled_up)
+
+@_writes
+def set_metric_target(h_id: str, name: str, target: float, goal: str = "maximize"):
+    """Adds or replaces a metric target on a hypothesis, e.g. accuracy >= 0.9."""
+    db = _get_session()
     h = db.query(Hypothesis).filter(Hypothesis.id == h_id).first()
-    if h:
-        if evidence_status == "supporting":
-            h.status = "proven"
-        elif evidence_status == "refuting":
-            h.status = "disproven"
-        elif evidence_status == "neutral" and h.status == "open":
-            h.status = "tested"
-        db.commit()
+    if not h: return
 
-# --- SNAPSHOTS ---
+    # Older hypotheses may list bare metric names; a target replaces its name either way
+    targets = [m for m in (h.metrics or []) if (m.get("name") if isinstance(m, dict) else m) != name]
+    targets.append({"name": name, "target": target, "goal": goal})
+    h.metrics = targets
+    change_feed.record_change(db, h.project_id, "hypothesis", "update", h.id, change_feed.hypothesis_payload(h))
+    db.flush()  # committed by the unit of work
+    _invalidate_hypotheses(h.id)
+
+    request_snapshot(h.project_id)
 
-def save_snapshot(project_id: str):
+def get_status_summary(project_id: str):
+    """Counts of own and rolled-up statuses for a project, without walking the tree."""
     db = _get_session()
-    
-    # Dump all hypotheses for this project to JSON
-    hypotheses = db.query(Hypothesis).filter(Hypothesis.project_id == project_id).all()
-    
+    return status_rollup.status_summary(db, project_id)
+
+# --- METRICS ---
+
+def get_metric_series(h_id: str):
+    """Per-node metric history as a date-indexed DataFrame (one column per metric)."""
+    db = _get_session()
+    return metrics_store.metric_series(db, h_id)
+
+def evaluate_project_targets(project_id: str):
+    """Target attainment and trend for every (hypothesis, metric target) in a project."""
+    db = _get_session()
+    return metrics_store.evaluate_project(db, project_id)
+
+# --- SNAPSHOTS ---
+
+def capture_project_state(db: Session, project_id: str, derived: bool = False) -> dict:
+    """
+    Serializes all hypotheses (with their updates) of a project.
+    Reads everything in a single joined query so the result is one consistent state.
+    `derived` adds each node's derived_status, for live views; snapshots leave it out.
+    """
+    rows = (
+        db.query(Hypothesis, Update)
+        .outerjoin(Update, Update.hypothesis_pk == Hypothesis.pk)
+        .filter(Hypothesis.project_pk == project_pk(project_id))
+        # pk breaks creation-time ties in creation order, like the change feed sees them
+        .order_by(Hypothesis.created_at, Hypothesis.pk, Update.date, Update.id)
+        .all()
+    )
+
     dump = {}
-    for h in hypotheses:
+    for h, u in rows:
         # Manual serialize to avoid recursion limits or circular deps
-        h_dict = {
-            "id": h.id,
-            "project_id": h.project_id,
-            "parent_id": h.parent_id,
-            "statement": h.statement,
-            "status": h.status,
-            "metrics": h.metrics,
-            "position": h.position,
-            "children": [c.id for c in h.children_nodes],
-            "updates": [
-                {
-                    "id": u.id,
-                    "author": u.author,
-                    "date": u.date,
-                    "content": u.content,
-                    "evidence_status": u.evidence_status
-                } for u in h.updates
-            ]
-        }
-        dump[h.id] = h_dict
-        
-    snap = Snapshot(
-        project_id=project_id,
-        timestamp=int(time.time()),
-        data=dump
-    )
-    db.add(snap)
-    db.commit()
+        if h.id not in dump:
+            dump[h.id] = {
+                "id": h.id,
+                "project_id": h.project_id,
+                "parent_id": h.parent_id,
+                "statement": h.statement,
+                "status": h.status,
+                "metrics": h.metrics,
+                "position": h.position,
+                "children": [],
+                "updates": []
+            }
+            if derived:
+                dump[h.id]["derived_status"] = h.derived_status
+        if u is not None:
+            dump[h.id]["updates"].append({
+                "id": u.id,
+                "author": u.author,
+                "date": u.date,
+                "content": u.content,
+                "metrics": u.metrics,
+                "evidence_status": u.evidence_status
+            })
 
-def get_snapshots(project_id: str):
+    for h_id, h_dict in dump.items():
+        parent = dump.get(h_dict["parent_id"])
+        if parent is not None:
+            parent["children"].append(h_id)
+    return dump
+
+def save_snapshot(project_id: str, action: str = None):
+    """
+    Captures and stores a snapshot synchronously as the project's next version.
+    Returns its version id: microseconds since the epoch, unique and increasing per project.
+    """
     db = _get_session()
-    snaps = db.query(Snapshot).filter(Snapshot.project_id == project_id).order_by(Snapshot.timestamp.desc()).all()
-    return [s.timestamp for s in snaps]
+    # Read before the write transaction starts (inside a unit, from its own session),
+    # so other writers don't wait while the project is serialized
+    with use_primary():
+        pk = db.query(Project.pk).filter(Project.id == project_id).scalar()
+        if pk is None: return None
+        # Read first: a change committed during the capture then counts as after this version
+        revision = change_feed.latest_revision(db, project_id)
+        data = capture_project_state(db, project_id)
+    hashes = snapshot_diff.tree_hashes(data)
+    # The next version id is taken in the INSERT itself, so concurrent writers can't pick the same one
+    now = time.time_ns() // 1000
+    latest = select(func.coalesce(func.max(Snapshot.version), 0) + 1).where(Snapshot.project_pk == pk).scalar_subquery()
+    version = case((latest > now, latest), else_=now)
+    with unit_of_work() as writer:
+        version = writer.execute(
+            insert(Snapshot)
+            .values(project_pk=pk, version=version, timestamp=version // 1_000_000, action=action,
+                    data=data, hashes=hashes, revision=revision)
+            .returning(Snapshot.version)
+        ).scalar_one()
+        _invalidate(("snapshots", project_id))
+    return version
+
+def request_snapshot(project_id: str, action: str = None):
+    """
+    Schedules a snapshot on the background writer so edits return without
+    serializing the project. Requests in quick succession for the same project
+    become one version, labelled with all their actions (by default, the
+    data-manager write that asked).
+    """
+    action = action or _current_action.get()
+    unit = _current_unit.get()
+    if unit is not None:
+        # Requested once the unit commits, so the snapshot sees all of it
+        unit["snapshots"].setdefault(project_id, []).append(action)
+    elif snapshot_writer.SNAPSHOT_WRITER_MODE == "sync":
+        save_snapshot(project_id, action)
+    else:
+        snapshot_writer.get_writer(save_snapshot).request(project_id, action)
+
+def flush_snapshots(project_id: str = None, timeout: float = None) -> bool:
+    return snapshot_writer.get_writer(save_snapshot).flush(project_id, timeout)
+
+def get_snapshot_writer_stats() -> dict:
+    """Queue depth, in-flight count, coalesced requests and capture lag of the writer."""
+    return snapshot_writer.get_writer(save_snapshot).stats()
+
+def get_snapshot_history(project_id: str):
+    """A project's versions, newest first: [{"version", "taken_at" (epoch seconds, float), "action"}]."""
+    db = _get_session()
+    def load():
+        rows = (
+            db.query(Snapshot.version, Snapshot.action)
+            .filter(Snapshot.project_pk == project_pk(project_id))
+            .order_by(Snapshot.version.desc())
+            .all()
+        )
+        return [{"version": v, "taken_at": v / 1_000_000, "action": action or ""} for v, action in rows]
+    return _cached(("snapshots", project_id), load)
+
+def get_snapshots(project_id: str):
+    """Version ids of a project, newest first."""
+    return [entry["version"] for entry in get_snapshot_history(project_id)]
 
-def load_snapshot_hypotheses(project_id: str, timestamp: int):
+def load_snapshot_hypotheses(project_id: str, version: int):
+    db = _get_session()
+    def load():
+        snap = db.query(Snapshot).filter(Snapshot.project_pk == project_pk(project_id), Snapshot.version == version).first()
+        # Cached compactly (see compact_tree), so many versions fit; reads like the payload dict
+        return compact_tree.CompactTree.from_snapshot(snap.data, project_id) if snap else None
+    # Snapshot payloads never change, so they stay cached until evicted
+    return _cached(("snapshot", project_id, version), load)
+
+def get_snapshot_hashes(project_id: str, version: int):
+    """The hash table of a version (see snapshot_diff), read without its payload."""
     db = _get_session()
-    snap = db.query(Snapshot).filter(Snapshot.project_id == project_id, Snapshot.timestamp == timestamp).first()
-    if snap:
-        return snap.data
-    return None
+    def load():
+        row = db.query(Snapshot.hashes, Snapshot.id).filter(
+            Snapshot.project_pk == project_pk(project_id), Snapshot.version == version).first()
+        if row is None:
+            return None
+        if row.hashes is not None:
+            return row.hashes
+        # Snapshots from before schema version 6 (or archives) carry no hashes
+        data = db.query(Snapshot.data).filter(Snapshot.id == row.id).scalar()
+        return snapshot_diff.tree_hashes(data or {})
+    return _cached(("snapshot_hashes", project_id, version), load)
+
+def diff_versions(project_id: str, old_version: int, new_version: int = None):
+    """
+    Added, removed, changed and moved hypotheses from one version to another
+    (`new_version=None`: the current state). See snapshot_diff.diff.
+    """
+    old = get_snapshot_hashes(project_id, old_version)
+    if new_version is None:
+        new = _shared_at_revision("hashes", project_id,
+                                  lambda: snapshot_diff.tree_hashes(capture_project_state(_get_session(), project_id)))
+    else:
+        new = get_snapshot_hashes(project_id, new_version)
+    if old is None or new is None:
+        return None
+    return snapshot_diff.diff(old, new)
 
+@_writes
 def undo_last_action(project_id: str):
+    """
+    Restores the project's previous version. Returns False if there is none or,
+    when called as an actor (change_feed.acting_as), if going back would also
+    revert changes by someone else.
+    """
     db = _get_session()
-    snaps = db.query(Snapshot).filter(Snapshot.project_id == project_id).order_by(Snapshot.timestamp.desc()).limit(2).all()
+    # Undo must see every snapshot of edits that already returned. (Inside a unit
+    # that already wrote, those snapshots would queue behind this very transaction.)
+    if not db.in_transaction():
+        flush_snapshots(project_id)
+    pk = db.query(Project.pk).filter(Project.id == project_id).scalar()
+    snaps = db.query(Snapshot).filter(Snapshot.project_pk == pk).order_by(Snapshot.version.desc()).limit(2).all()
     
     if len(snaps) < 2: return False
+    # Going back a version reverts every change since it was taken; someone acting
+    # as an actor (see change_feed.acting_as) may only revert their own
+    actor = change_feed.current_actor()
+    if actor is not None and (snaps[1].revision is None or change_feed.others_since(db, pk, snaps[1].revision, actor)):
+        return False
     
     target_data = snaps[1].data
     
     # Brutal Restore: Delete all current hyps for project and recreate from JSON
     # This is heavy but "safe" for consistency.
-    db.query(Update).filter(Update.hypothesis.has(project_id=project_id)).delete(synchronize_session=False)
-    db.query(Hypothesis).filter(Hypothesis.project_id == project_id).delete(synchronize_session=False)
+    h_pks = db.query(Hypothesis.pk).filter(Hypothesis.project_pk == pk)
+    # Edges aren't versioned: keep those whose ends exist in the restored version
+    project_edges = edges.detach_project(db, pk)
+    db.query(MetricPoint).filter(MetricPoint.project_pk == pk).delete(synchronize_session=False)
+    people.clear_project(db, pk)
+    db.query(Update).filter(Update.hypothesis_pk.in_(h_pks.scalar_subquery())).delete(synchronize_session=False)
+    db.query(Hypothesis).filter(Hypothesis.project_pk == pk).update({Hypothesis.parent_pk: None}, synchronize_session=False)
+    db.query(Hypothesis).filter(Hypothesis.project_pk == pk).delete(synchronize_session=False)
     
+    restored = {}
     for h_id, h_data in target_data.items():
         # Recreate Hypothesis
         h = Hypothesis(
             id=h_id,
-            project_id=h_data['project_id'],
-            parent_id=h_data['parent_id'],
+            project_pk=pk,
             statement=h_data['statement'],
             status=h_data['status'],
             metrics=h_data.get('metrics', []),
             position=h_data.get('position', {})
         )
         db.add(h)
+        restored[h_id] = h
         
         # Recreate Updates
         for u_data in h_data.get('updates', []):
             u = Update(
                 id=u_data['id'],
-                hypothesis_id=h_id,
+                hypothesis=h,
                 author=u_data['author'],
                 date=u_data['date'],
                 content=u_data['content'],
+                metrics=u_data.get('metrics', {}),
                 evidence_status=u_data['evidence_status']
             )
             db.add(u)
+
+    # Link parents once every restored row exists
+    for h_id, h_data in target_data.items():
+        restored[h_id].parent = restored.get(h_data.get('parent_id'))
             
+    db.flush()
+    edges.restore_edges(db, pk, project_edges)
+    search.reindex_project(db, project_id)
+    metrics_store.rebuild_metric_points(db, project_id)
+    people.rebuild_author_rollups(db, project_id)
+    status_rollup.recompute_project(db, project_id)
+
+    # Clients can't patch their way to an older version, so tell them to reload
+    change_feed.record_change(db, project_id, "project", "restore", project_id,
+                              {"snapshot_timestamp": snaps[1].timestamp, "snapshot_version": snaps[1].version})
+
     # Delete the "bad" latest snapshot
     db.delete(snaps[0])
-    db.commit()
+    db.flush()  # committed by the unit of work
+    _invalidate_tag(("project", project_id))
+    _invalidate(*(("evidence_counts", h_id) for h_id in set(snaps[0].data) | set(target_data)))
+    _invalidate(("snapshots", project_id), ("snapshot", project_id, snaps[0].version),
+                      ("snapshot_hashes", project_id, snaps[0].version))
     return True
 
+# --- READ CACHE ---
+
+def get_read_cache_stats() -> dict:
+    """Hits, misses, evictions and size of the process-wide read cache."""
+    return _cache.stats()
+
+def clear_read_cache():
+    _cache.clear()
+
+def get_shared_cache_stats() -> dict:
+    """Hits, misses, single-flight waits and size of the cross-process cache."""
+    return _shared.stats()
+
+# --- CHANGE FEED ---
+
+def get_changes_since(project_id: str, cursor: int = 0, limit: int = 500):
+    """Changes of a project after revision `cursor`, as (changes, new_cursor)."""
+    db = _get_session()
+    return change_feed.changes_since(db, project_id, cursor, limit)
+
+def get_latest_revision(project_id: str) -> int:
+    db = _get_session()
+    return change_feed.latest_revision(db, project_id)
+
+def load_project_nodes(project_id: str):
+    """
+    Full project state for a client that will follow the change feed: returns
+    (nodes, cursor). The cursor is read first, so replaying from it is safe.
+    """
+    db = _get_session()
+    cursor = change_feed.latest_revision(db, project_id)
+    return _shared_at_revision("nodes", project_id, lambda: capture_project_state(db, project_id, derived=True), cursor), cursor
+
+# --- SEARCH ---
+
+def search_hypotheses(query: str, project_id: str = None, page: int = 0, page_size: int = 20):
+    """Ranked full-text hits over hypothesis statements and evidence, paginated."""
+    db = _get_session()
+    return search.search(db, query, project_id=project_id, page=page, page_size=page_size)
+
 # --- PEOPLE VIEW ---
 
 def get_all_authors():
     db = _get_session()
-    # Distinct authors
-    # This is a bit rough with comma-sep strings, might need optimized query or Python process
-    updates = db.query(Update).all()
-    authors = set()
-    for u in updates:
-        if u.author:
-             for a in u.author.replace(",", ";").split(";"):
-                 authors.add(a.strip())
-    return sorted(list(authors))
+    return people.list_authors(db)
+
+def get_author_summary(author_name: str):
+    """Update count, evidence mix, projects touched and weekly activity (see people.py)."""
+    db = _get_session()
+    return people.author_summary(db, author_name)
+
+def get_author_activity(author_name: str, cursor: str = None, page_size: int = people.DEFAULT_PAGE_SIZE):
+    """One page of an author's updates, newest first; pass `next_cursor` back for the next."""
+    db = _get_session()
+    return people.activity_page(db, author_name, cursor=cursor, page_size=page_size)
 
 def get_updates_by_author(author_name: str):
     db = _get_session()
-    updates = db.query(Update).all()
-    results = []
-    
-    for u in updates:
-        auths = [a.strip() for a in u.author.replace(",", ";").split(";")]
-        if author_name in auths:
-            results.append({
-                "project_title": u.hypothesis.project.title,
-                "hypothesis_statement": u.hypothesis.statement,
-                "date": u.date,
-                "content": u.content,
-                "evidence": u.evidence_status
-            })
-    return sorted(results, key=lambda x: x['date'], reverse=True)
+    return people.activity_page(db, author_name, page_size=None)["items"]
 
 
+# --- EXPORT ---
+
+def export_project(project_id: str, fmt: str = "markdown", table: str = "updates"):
+    """
+    Streams a whole project (all hypotheses, updates and metric points) as text
+    chunks in `fmt` ("markdown", "jsonl" or "csv" with `table`). The session stays
+    open while the caller consumes the generator and closes when it is exhausted.
+    """
+    ensure_schema()
+    with SessionLocal() as db:
+        yield from exporter.export(db, project_id, fmt, table)
+
 # --- REPORT GENERATION ---
 
 def generate_project_report(project_id: str) -> str:
     db = _get_session()
+    # Only the part that depends on the revision is shared; the timestamp is this request's
+    report = _shared_at_revision("report", project_id, lambda: _project_report(db, project_id))
+    if report is None: return "Project not found."
+    title, body = report
+    return f"""# Project Report: {title}
+Generated: {time.strftime('%Y-%m-%d %H:%M')}
+
+{body}"""
+
+def _project_report(db: Session, project_id: str):
+    """(title, report body), or None if the project doesn't exist."""
     project = db.query(Project).filter(Project.id == project_id).first()
-    if not project: return "Project not found."
+    if not project: return None
     
     # 1. Stats
-    all_hyps = db.query(Hypothesis).filter(Hypothesis.project_id == project_id).all()
+    all_hyps = db.query(Hypothesis).filter(Hypothesis.project_pk == project.pk).all()
     status_counts = {"open": 0, "proven": 0, "disproven": 0, "tested": 0}
+    derived_counts = dict.fromkeys(status_counts, 0)
+    by_id = {}
+    children_of = {}
     for h in all_hyps:
         if h.status in status_counts:
             status_counts[h.status] += 1
+        derived = h.derived_status or h.status
+        if derived in derived_counts:
+            derived_counts[derived] += 1
+        by_id[h.id] = h
+        children_of.setdefault(h.parent_id, []).append(h)
             
-    # 2. Build Tree Structure (Recursive)
+    # 2. Build Tree Structure (Recursive, from the rows loaded above)
     def build_tree_md(h_id, depth=0):
-        h = db.query(Hypothesis).filter(Hypothesis.id == h_id).first()
+        h = by_id.get(h_id)
         if not h: return ""
         
         indent = "  " * depth
@@ -310,38 +873,57 @@ def generate_project_report(project_id: str) -> str:
         elif h.status == "disproven": icon = "❌"
         elif h.status == "tested": icon = "⚠️"
         
-        line = f"{indent}- {icon} **{h.status.upper()}**: {h.statement}\n"
+        rolled_up = f" (rolls up to {h.derived_status})" if h.derived_status and h.derived_status != h.status else ""
+        line = f"{indent}- {icon} **{h.status.upper()}**{rolled_up}: {h.statement}\n"
         
         # Children
-        children = db.query(Hypothesis).filter(Hypothesis.parent_id == h_id).all()
-        for child in children:
+        for child in children_of.get(h_id, []):
             line += build_tree_md(child.id, depth + 1)
         return line
 
     tree_md = build_tree_md(project.north_star_hypothesis_id)
+
+    # Edges beside the tree: extra parents and typed links
+    links_md = ""
+    for link in edges.adjacency(db, project_id):
+        source, target = by_id.get(link["source"]), by_id.get(link["target"])
+        if link["kind"] == edges.TREE or not source or not target:
+            continue
+        if link["kind"] == "subhypothesis":
+            links_md += f"- {target.statement} is also a sub-hypothesis of {source.statement}\n"
+        else:
+            links_md += f"- {source.statement} **{link['kind'].replace('_', ' ')}** {target.statement}\n"
     
     # 3. Evidence Log
     evidence_md = ""
-    updates = db.query(Update).join(Hypothesis).filter(Hypothesis.project_id == project_id).order_by(Update.date.desc()).limit(50).all()
+    updates = db.query(Update).join(Hypothesis).filter(Hypothesis.project_pk == project.pk).order_by(Update.date.desc()).limit(50).all()
     
     for u in updates:
         date_str = time.strftime('%Y-%m-%d', time.localtime(u.date))
         evidence_md += f"- **{date_str}** ({u.author}): {u.content} *[{u.evidence_status}]*\n"
 
     # Assemble Report
-    report = f"""# Project Report: {project.title}
-Generated: {time.strftime('%Y-%m-%d %H:%M')}
-
-## Executive Summary
+    body = f"""## Executive Summary
 - **Total Hypotheses**: {len(all_hyps)}
 - **Proven**: {status_counts['proven']}
 - **Disproven**: {status_counts['disproven']}
 - **Open**: {status_counts['open']}
+- **Rolled up from sub-hypotheses**: {derived_counts['proven']} proven, {derived_counts['tested']} tested, {derived_counts['open']} still open
 
 ## Hypothesis Tree
 {tree_md}
+## Cross-links
+{links_md or "None."}
 
 ## Recent Evidence Log
 {evidence_md}
 """
-    return report
+    return project.title, body
+
+# Give each public function its session scope, and attribute its SQL to it in the query debug panel.
+# Generators outlive the call that creates them, so they open their own session instead;
+# unit_of_work opens the session its block runs in.
+for _name, _fn in list(globals().items()):
+    if callable(_fn) and not _name.startswith("_") and getattr(_fn, "__module__", None) == __name__ \
+            and _fn is not unit_of_work:
+        globals()[_name] = track_queries(_fn if pyinspect.isgeneratorfunction(_fn) else _session_scope(_fn))
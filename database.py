@@ -1,19 +1,237 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from models_sql import Base
+import contextvars
+import functools
+import itertools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+from models_sql import Base, SchemaVersion
+from search import ensure_search_index
 from dotenv import load_dotenv
+import startup
 
 load_dotenv()
 
 # Use SQLite for local dev if no URL provided, but warn user
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./research_app.db")
+# Optional read replicas, comma-separated; reads fall back to the primary when empty
+DATABASE_READ_URLS = [u.strip() for u in os.getenv("DATABASE_READ_URLS", "").split(",") if u.strip()]
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# --- SQLITE ---
+# SQLite file databases (local and small-team deployments) run in "concurrent"
+# mode by default: every connection gets WAL journaling, a busy timeout,
+# synchronous=NORMAL and memory-mapped reads. Reads use a pool of reader
+# connections on the same file, one per concurrent thread, which WAL lets run
+# alongside the writer and which see every committed write (no replica lag).
+# Writes go through a single writer connection: data-manager units of work
+# queue for it in arrival order, so writers in a process never fight over the
+# database lock, and its transactions start with BEGIN IMMEDIATE, so writers in
+# other processes wait out busy_timeout instead of failing. SQLITE_MODE=basic
+# keeps one plain pool for everything, as before.
+
+SQLITE_MODE = os.getenv("SQLITE_MODE", "concurrent")
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", str(max(4, 2 * (os.cpu_count() or 1)))))
+SQLITE_WRITE_TIMEOUT = float(os.getenv("SQLITE_WRITE_TIMEOUT", "60"))  # seconds to wait for the writer
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),  # durable in WAL except on power loss
+    "mmap_size": os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)),
+}
+
+def _is_sqlite_file(url) -> bool:
+    return url.startswith("sqlite") and ":memory:" not in url and not url.rstrip("/").endswith("sqlite:")
+
+def _configure_sqlite(engine, writer=False):
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, record):
+        if writer:
+            # SQLAlchemy emits BEGIN itself (below) instead of the driver's implicit one
+            dbapi_conn.isolation_level = None
+        cursor = dbapi_conn.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    if writer:
+        @event.listens_for(engine, "begin")
+        def _on_begin(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+    return engine
+
+def _make_engine(url, **kwargs):
+    return create_engine(url, connect_args={"check_same_thread": False} if "sqlite" in url else {}, **kwargs)
+
+if SQLITE_MODE == "concurrent" and _is_sqlite_file(DATABASE_URL) and not DATABASE_READ_URLS:
+    engine = _configure_sqlite(_make_engine(DATABASE_URL, pool_size=1, max_overflow=0, pool_timeout=SQLITE_WRITE_TIMEOUT),
+                               writer=True)
+    read_engines = [_configure_sqlite(_make_engine(DATABASE_URL, pool_size=SQLITE_READ_POOL_SIZE, max_overflow=-1))]
+    _reads_are_current = True  # readers share the writer's file, so they never lag
+else:
+    engine = _make_engine(DATABASE_URL)  # primary: all writes
+    read_engines = [_make_engine(url) for url in DATABASE_READ_URLS]
+    _reads_are_current = False
+
+# --- READ/WRITE ROUTING ---
+# Writes, flushes and SELECT ... FOR UPDATE go to the primary; other reads go to
+# a replica (one per session, round-robin). Once a rerun has written, every
+# later read in it goes to the primary too, so users always see their own edits.
+
+class Router:
+    """
+    `current=True` says the replicas never lag the primary (SQLite readers on
+    the same file), so reads only go to the primary inside a write transaction.
+    """
+
+    def __init__(self, primary, replicas=(), current=False):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.current = current
+        self._next = itertools.count()
+
+    def read_engine(self):
+        if not self.replicas:
+            return self.primary
+        return self.replicas[next(self._next) % len(self.replicas)]
+
+    @property
+    def engines(self):
+        return [self.primary] + self.replicas
+
+router = Router(engine, read_engines, current=_reads_are_current)
+
+_route_state = contextvars.ContextVar("route_state", default=None)
+_force_primary = contextvars.ContextVar("force_primary", default=False)
+
+@contextmanager
+def routing_scope():
+    """One rerun: after its first write, all reads in the block are pinned to the primary."""
+    state = {"wrote": False}
+    token = _route_state.set(state)
+    try:
+        yield state
+    finally:
+        _route_state.reset(token)
+
+@contextmanager
+def use_primary():
+    """Reads in the block go to the primary, e.g. to fill a cache that outlives replica lag."""
+    token = _force_primary.set(True)
+    try:
+        yield
+    finally:
+        _force_primary.reset(token)
+
+def _is_write(clause) -> bool:
+    if clause is None:
+        return False
+    if isinstance(clause, UpdateBase):
+        return True
+    if isinstance(clause, TextClause):
+        words = clause.text.split(None, 1)
+        return bool(words) and words[0].upper() not in ("SELECT", "WITH")
+    return getattr(clause, "_for_update_arg", None) is not None
+
+def _pin_to_primary(session):
+    session.info["primary"] = True
+    state = _route_state.get()
+    if state is not None:
+        state["wrote"] = True
+
+class RoutingSession(Session):
+    """Session that picks the primary or a replica per statement (see Router)."""
+
+    def __init__(self, router=None, **kwargs):
+        super().__init__(**kwargs)
+        self.router = router
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        router = self.router
+        if not router.replicas:
+            return router.primary
+        if self._flushing or _is_write(clause):
+            _pin_to_primary(self)
+            return router.primary
+        if self.info.get("primary"):
+            return router.primary
+        state = _route_state.get()
+        if not router.current and (_force_primary.get() or (state is not None and state["wrote"])):
+            return router.primary
+        # Stick to one replica so a session's reads see a single consistent state
+        if "read_engine" not in self.info:
+            self.info["read_engine"] = router.read_engine()
+        return self.info["read_engine"]
+
+SessionLocal = sessionmaker(class_=RoutingSession, router=router, autocommit=False, autoflush=False, expire_on_commit=False)
+
+# Bump when models_sql changes (and add the upgrade step to migrate.MIGRATIONS);
+# init_db (run by migrate.py at deploy) records it
+SCHEMA_VERSION = 11
 
 def init_db():
+    import migrate  # the upgrade steps live with the migration CLI
+    migrate.upgrade(engine)
     Base.metadata.create_all(bind=engine)
+    ensure_search_index(engine)
+    with SessionLocal() as db:
+        if db.get(SchemaVersion, SCHEMA_VERSION) is None:
+            db.add(SchemaVersion(version=SCHEMA_VERSION))
+            db.commit()
+
+def schema_is_current() -> bool:
+    """One cheap query instead of create_all's per-table inspection."""
+    try:
+        with engine.connect() as conn:
+            current = conn.execute(text("SELECT max(version) FROM schema_version")).scalar()
+    except Exception:
+        return False
+    return current is not None and current >= SCHEMA_VERSION
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+def ensure_schema():
+    """
+    Makes sure the schema exists, once per process and on first use rather than
+    at import. Deployments that run migrate.py can set SKIP_SCHEMA_CHECK=1.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if _schema_ready:
+            return
+        with startup.timed("schema check"):
+            if os.getenv("SKIP_SCHEMA_CHECK") != "1" and not schema_is_current():
+                init_db()
+        _schema_ready = True
+
+def warm_pool(connections: int = None):
+    """Checks the schema and opens pooled connections so the first request doesn't pay for them."""
+    connections = connections or int(os.getenv("DB_POOL_WARM", "2"))
+    with startup.timed("pool warm-up"):
+        ensure_schema()
+        # Never more than a pool holds (the SQLite writer has one connection)
+        conns = [e.connect() for e in router.engines for _ in range(min(connections, e.pool.size() or connections))]
+        for conn in conns:
+            conn.execute(text("SELECT 1"))
+            conn.close()
+
+_warmup_thread = None
+
+def start_pool_warmup():
+    """Runs warm_pool on a background thread, once per process."""
+    global _warmup_thread
+    with _schema_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=warm_pool, name="db-pool-warmup", daemon=True)
+            _warmup_thread.start()
 
 def get_db():
     db = SessionLocal()
@@ -21,3 +239,131 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# --- QUERY INSTRUMENTATION ---
+# Statements are attributed to whichever collector is active in the current
+# context (one Streamlit rerun, one test block). Threads start with an empty
+# context, so background work (e.g. the snapshot writer) is never counted.
+
+class QueryStats:
+    def __init__(self, label=""):
+        self.label = label
+        self.started = time.perf_counter()
+        self.elapsed_ms = 0.0
+        self.durations_ms = []
+        self.rows = 0
+        self.statements = []
+        self.by_function = {}
+
+    @property
+    def count(self):
+        return len(self.durations_ms)
+
+    @property
+    def total_ms(self):
+        return sum(self.durations_ms)
+
+    @property
+    def p95_ms(self):
+        if not self.durations_ms:
+            return 0.0
+        ordered = sorted(self.durations_ms)
+        return ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+
+    def _record(self, statement, duration_ms, rows, function):
+        self.durations_ms.append(duration_ms)
+        self.rows += max(rows, 0)
+        self.statements.append({
+            "sql": " ".join(statement.split())[:500],
+            "ms": round(duration_ms, 3),
+            "rows": rows,
+            "function": function,
+        })
+        f = self.by_function.setdefault(function or "(other)", {"count": 0, "ms": 0.0, "rows": 0})
+        f["count"] += 1
+        f["ms"] += duration_ms
+        f["rows"] += max(rows, 0)
+
+    def to_dict(self):
+        return {
+            "label": self.label,
+            "statements": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "p95_ms": round(self.p95_ms, 3),
+            "rows": self.rows,
+            "elapsed_ms": round(self.elapsed_ms, 3),
+            "by_function": {k: dict(v, ms=round(v["ms"], 3)) for k, v in self.by_function.items()},
+            "queries": self.statements,
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+_active_stats = contextvars.ContextVar("active_query_stats", default=None)
+_active_function = contextvars.ContextVar("active_query_function", default=None)
+
+@contextmanager
+def collect_queries(label=""):
+    """Collects statement count, timings and rows for everything run inside the block."""
+    stats = QueryStats(label)
+    token = _active_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        stats.elapsed_ms = (time.perf_counter() - stats.started) * 1000
+        _active_stats.reset(token)
+
+@contextmanager
+def assert_max_queries(limit, label=""):
+    """Test helper: fails if the block issues more than `limit` SQL statements."""
+    with collect_queries(label) as stats:
+        yield stats
+    if stats.count > limit:
+        listing = "\n".join(f"  [{q['function']}] {q['sql'][:160]}" for q in stats.statements)
+        raise AssertionError(f"{label or 'block'} issued {stats.count} queries (budget {limit}):\n{listing}")
+
+def track_queries(fn):
+    """Attributes SQL issued inside `fn` to its name in the active collector."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _active_function.set(fn.__name__)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _active_function.reset(token)
+    return wrapper
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active_stats.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _active_stats.get()
+    starts = conn.info.get("query_start")
+    if stats is None or not starts:
+        return
+    duration_ms = (time.perf_counter() - starts.pop()) * 1000
+    if statement == "BEGIN IMMEDIATE":
+        return  # transaction control (SQLite writer), not a query
+    # SELECT row counts are added once the ORM result is buffered (see below)
+    rows = cursor.rowcount if cursor.description is None else 0
+    stats._record(statement, duration_ms, rows, _active_function.get())
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _count_result_rows(orm_execute_state):
+    stats = _active_stats.get()
+    options = orm_execute_state.execution_options
+    if stats is None or not orm_execute_state.is_select or options.get("yield_per") or options.get("stream_results"):
+        return None
+    # Buffer the result to count rows; only while a collector is active
+    first = len(stats.statements)
+    frozen = orm_execute_state.invoke_statement().freeze()
+    n = len(frozen.data)
+    if len(stats.statements) > first:
+        q = stats.statements[first]
+        q["rows"] = n
+        stats.rows += n
+        stats.by_function[q["function"] or "(other)"]["rows"] += n
+    return frozen()
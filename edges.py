@@ -0,0 +1,143 @@
+from models_sql import Hypothesis, HypothesisEdge, project_pk
+from sqlalchemy import delete, exists, insert, literal, null, or_, select, union, union_all
+from sqlalchemy.orm import Session, aliased
+
+# Research graphs that aren't trees. Hypothesis.parent_pk stays the primary
+# hierarchy (it lays out the graph, goes into snapshots and is what undo
+# restores); `hypothesis_edges` holds what a tree can't: extra parents
+# ("subhypothesis" edges, so one result can count towards several hypotheses)
+# and typed links between any two nodes ("supports", "depends_on").
+#
+# Readers get the tree and the edges of a project as one adjacency list from a
+# single query. Edges of the acyclic kinds are refused when they would close a
+# cycle, which one recursive query answers: is the source reachable from the
+# target? Subhypothesis edges are checked together with the tree.
+
+EDGE_KINDS = ("subhypothesis", "supports", "depends_on")
+ACYCLIC_KINDS = ("subhypothesis", "depends_on")
+TREE = "tree"  # kind of the parent_pk links in adjacency lists
+
+def hierarchy(project_pk_value=None):
+    """(parent_pk, child_pk) of the tree and the subhypothesis edges, as a subquery."""
+    tree = select(Hypothesis.parent_pk.label("parent_pk"), Hypothesis.pk.label("child_pk")).where(Hypothesis.parent_pk.isnot(None))
+    extra = select(HypothesisEdge.source_pk, HypothesisEdge.target_pk).where(HypothesisEdge.kind == "subhypothesis")
+    if project_pk_value is not None:
+        tree = tree.where(Hypothesis.project_pk == project_pk_value)
+        extra = extra.where(HypothesisEdge.project_pk == project_pk_value)
+    # UNION, not UNION ALL: a child linked both ways counts once
+    return union(tree, extra).subquery("hierarchy")
+
+def _graph(kind):
+    if kind == "subhypothesis":
+        return hierarchy()
+    return (
+        select(HypothesisEdge.source_pk.label("parent_pk"), HypothesisEdge.target_pk.label("child_pk"))
+        .where(HypothesisEdge.kind == kind)
+        .subquery("links")
+    )
+
+def creates_cycle(db: Session, source_pk: int, target_pk: int, kind: str) -> bool:
+    """Whether a `kind` edge source -> target would close a cycle (one query)."""
+    if source_pk == target_pk:
+        return True
+    if kind not in ACYCLIC_KINDS:
+        return False
+    links = _graph(kind)
+    reach = select(literal(target_pk).label("pk")).cte("reach", recursive=True)
+    reach = reach.union(select(links.c.child_pk).join(reach, links.c.parent_pk == reach.c.pk))
+    return db.execute(select(exists().where(reach.c.pk == source_pk))).scalar()
+
+def add_edge(db: Session, source: Hypothesis, target: Hypothesis, kind: str) -> HypothesisEdge:
+    """
+    Links two hypotheses of the same project. Returns the existing edge if there
+    is one; raises ValueError for unknown kinds, cross-project links and cycles.
+    """
+    if kind not in EDGE_KINDS:
+        raise ValueError(f"Unknown edge kind {kind!r}; expected one of {', '.join(EDGE_KINDS)}")
+    if source.project_pk != target.project_pk:
+        raise ValueError("Edges link hypotheses of the same project")
+    if kind == "subhypothesis" and target.parent_pk == source.pk:
+        raise ValueError("Already a sub-hypothesis of it")
+    existing = db.query(HypothesisEdge).filter_by(source_pk=source.pk, target_pk=target.pk, kind=kind).first()
+    if existing:
+        return existing
+    if creates_cycle(db, source.pk, target.pk, kind):
+        raise ValueError(f"A {kind} edge from this hypothesis to that one would create a cycle")
+    edge = HypothesisEdge(project_pk=source.project_pk, source_pk=source.pk, target_pk=target.pk, kind=kind)
+    db.add(edge)
+    db.flush()
+    return edge
+
+def remove_edge(db: Session, edge_id: str):
+    """Deletes an edge; returns its (project_pk, source_pk, target_pk, kind), or None."""
+    return db.execute(
+        delete(HypothesisEdge)
+        .where(HypothesisEdge.id == edge_id)
+        .returning(HypothesisEdge.project_pk, HypothesisEdge.source_pk, HypothesisEdge.target_pk, HypothesisEdge.kind)
+    ).first()
+
+def forget_hypotheses(db: Session, h_pks) -> list:
+    """Deletes every edge from or to hypotheses about to be deleted; returns their (source_pk, target_pk, kind)."""
+    return db.execute(
+        delete(HypothesisEdge)
+        .where(or_(HypothesisEdge.source_pk.in_(h_pks), HypothesisEdge.target_pk.in_(h_pks)))
+        .returning(HypothesisEdge.source_pk, HypothesisEdge.target_pk, HypothesisEdge.kind)
+    ).all()
+
+# --- BULK ---
+
+def detach_project(db: Session, project_pk_value: int) -> list:
+    """
+    Deletes a project's edges before its hypotheses are bulk-replaced (undo) and
+    returns them by public ids, for restore_edges() once the rows are back.
+    """
+    source, target = aliased(Hypothesis), aliased(Hypothesis)
+    rows = db.execute(
+        select(HypothesisEdge.id, source.id, target.id, HypothesisEdge.kind, HypothesisEdge.created_at)
+        .join(source, source.pk == HypothesisEdge.source_pk)
+        .join(target, target.pk == HypothesisEdge.target_pk)
+        .where(HypothesisEdge.project_pk == project_pk_value)
+    ).all()
+    db.execute(delete(HypothesisEdge).where(HypothesisEdge.project_pk == project_pk_value))
+    return [{"id": e_id, "source_id": s, "target_id": t, "kind": kind, "created_at": at} for e_id, s, t, kind, at in rows]
+
+def restore_edges(db: Session, project_pk_value: int, edges: list) -> int:
+    """Re-inserts edges (dicts with public ids) whose ends both exist in the project. Returns how many."""
+    if not edges:
+        return 0
+    ids = {e["source_id"] for e in edges} | {e["target_id"] for e in edges}
+    pks = dict(db.execute(
+        select(Hypothesis.id, Hypothesis.pk).where(Hypothesis.project_pk == project_pk_value, Hypothesis.id.in_(ids))
+    ).all())
+    rows = [
+        {"id": e["id"], "project_pk": project_pk_value, "source_pk": pks[e["source_id"]],
+         "target_pk": pks[e["target_id"]], "kind": e["kind"], "created_at": e.get("created_at")}
+        for e in edges if e["source_id"] in pks and e["target_id"] in pks
+    ]
+    if rows:
+        db.execute(insert(HypothesisEdge.__table__), rows)
+    return len(rows)
+
+# --- READING ---
+
+def adjacency(db: Session, project_id: str) -> list:
+    """
+    Every link of a project, tree and edges, from one query: dicts with "id"
+    (None for tree links), "source", "target" (public ids) and "kind".
+    """
+    pk = project_pk(project_id)
+    child, parent = aliased(Hypothesis), aliased(Hypothesis)
+    tree = (
+        select(literal(TREE).label("kind"), null().label("id"), parent.id.label("source"), child.id.label("target"))
+        .join(parent, parent.pk == child.parent_pk)
+        .where(child.project_pk == pk)
+    )
+    source, target = aliased(Hypothesis), aliased(Hypothesis)
+    links = (
+        select(HypothesisEdge.kind, HypothesisEdge.id, source.id, target.id)
+        .join(source, source.pk == HypothesisEdge.source_pk)
+        .join(target, target.pk == HypothesisEdge.target_pk)
+        .where(HypothesisEdge.project_pk == pk)
+    )
+    rows = db.execute(union_all(tree, links)).all()
+    return [{"id": e_id, "source": s, "target": t, "kind": kind} for kind, e_id, s, t in rows]
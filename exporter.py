@@ -0,0 +1,203 @@
+"""
+Streaming full-project export: Markdown, JSON Lines and CSV.
+
+    python exporter.py PROJECT_ID --format markdown > project.md
+    python exporter.py PROJECT_ID --format jsonl --out project.jsonl
+    python exporter.py PROJECT_ID --format csv --table updates --out updates.csv
+
+Every exporter is a generator of text chunks. Updates and metric points are
+read with `yield_per` (a server-side cursor on Postgres), so memory stays flat
+however much evidence a project has; only the hypothesis tree is held in memory.
+"""
+import csv
+import io
+import json
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, aliased
+
+from models_sql import Project, Hypothesis, Update, MetricPoint
+
+BATCH_SIZE = 2000
+CHUNK_CHARS = 64 * 1024
+
+# format -> (file extension, mime type)
+FORMATS = {
+    "markdown": ("md", "text/markdown"),
+    "jsonl": ("jsonl", "application/x-ndjson"),
+    "csv": ("csv", "text/csv"),
+}
+CSV_TABLES = ("hypotheses", "updates", "metrics")
+
+STATUS_ICONS = {"proven": "✅", "disproven": "❌", "tested": "⚠️"}
+
+def _stream(db: Session, stmt):
+    return db.execute(stmt.execution_options(yield_per=BATCH_SIZE))
+
+def _chunks(pieces):
+    """Joins many small strings into ~CHUNK_CHARS chunks."""
+    buf, size = [], 0
+    for piece in pieces:
+        buf.append(piece)
+        size += len(piece)
+        if size >= CHUNK_CHARS:
+            yield "".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf)
+
+# Rows are joined on the integer keys and exported with public ids
+def _hypotheses(db: Session, project: Project):
+    parent = aliased(Hypothesis)
+    return db.execute(
+        select(Hypothesis.id, parent.id.label("parent_id"), Hypothesis.statement, Hypothesis.status,
+               Hypothesis.metrics, Hypothesis.position, Hypothesis.created_at)
+        .outerjoin(parent, parent.pk == Hypothesis.parent_pk)
+        .where(Hypothesis.project_pk == project.pk)
+        .order_by(Hypothesis.created_at, Hypothesis.pk)
+    ).all()
+
+def _updates(db: Session, project: Project):
+    return _stream(db,
+        select(Update.id, Hypothesis.id.label("hypothesis_id"), Update.author, Update.date, Update.content,
+               Update.metrics, Update.evidence_status)
+        .join(Hypothesis, Hypothesis.pk == Update.hypothesis_pk)
+        .where(Hypothesis.project_pk == project.pk)
+        .order_by(Hypothesis.created_at, Hypothesis.pk, Update.date, Update.id)
+    )
+
+def _metric_points(db: Session, project: Project):
+    return _stream(db,
+        select(Hypothesis.id.label("hypothesis_id"), Update.id.label("update_id"),
+               MetricPoint.name, MetricPoint.value, MetricPoint.date)
+        .join(Hypothesis, Hypothesis.pk == MetricPoint.hypothesis_pk)
+        .outerjoin(Update, Update.pk == MetricPoint.update_pk)
+        .where(MetricPoint.project_pk == project.pk)
+        .order_by(Hypothesis.id, MetricPoint.name, MetricPoint.date)
+    )
+
+def _tree_order(hypotheses, root_id):
+    """(hypothesis, depth) in depth-first order from the root, then any orphans."""
+    children = {}
+    for h in hypotheses:
+        children.setdefault(h.parent_id, []).append(h)
+    by_id = {h.id: h for h in hypotheses}
+    seen = set()
+    stack = [(by_id[root_id], 0)] if root_id in by_id else []
+    while stack:
+        h, depth = stack.pop()
+        if h.id in seen:
+            continue
+        seen.add(h.id)
+        yield h, depth
+        stack.extend((c, depth + 1) for c in reversed(children.get(h.id, [])))
+    for h in hypotheses:
+        if h.id not in seen:
+            yield h, 0
+
+# --- FORMATS ---
+
+def export_markdown(db: Session, project: Project):
+    hypotheses = _hypotheses(db, project)
+    statements = {h.id: h.statement for h in hypotheses}
+
+    def pieces():
+        yield f"# Project Export: {project.title}\nExported: {time.strftime('%Y-%m-%d %H:%M')}\n\n"
+        yield "## Hypothesis Tree\n"
+        for h, depth in _tree_order(hypotheses, project.north_star_hypothesis_id):
+            icon = STATUS_ICONS.get(h.status, "🟦")
+            yield f"{'  ' * depth}- {icon} **{(h.status or 'open').upper()}**: {h.statement}\n"
+
+        yield "\n## Evidence\n"
+        current = None
+        for u in _updates(db, project):
+            if u.hypothesis_id != current:
+                current = u.hypothesis_id
+                yield f"\n### {statements.get(current, current)}\n"
+            date_str = time.strftime('%Y-%m-%d', time.localtime(u.date)) if u.date else ""
+            metrics = ", ".join(f"{k}={v}" for k, v in (u.metrics or {}).items())
+            yield f"- **{date_str}** ({u.author}): {u.content} *[{u.evidence_status}]*" + (f" `{metrics}`" if metrics else "") + "\n"
+
+    return _chunks(pieces())
+
+def export_jsonl(db: Session, project: Project):
+    def line(kind, row, fields):
+        return json.dumps(dict({"type": kind}, **{f: getattr(row, f) for f in fields}), default=str) + "\n"
+
+    def pieces():
+        yield line("project", project, ("id", "title", "north_star_hypothesis_id", "status", "members", "created_at"))
+        for h in _hypotheses(db, project):
+            yield line("hypothesis", h, ("id", "parent_id", "statement", "status", "metrics", "position", "created_at"))
+        for u in _updates(db, project):
+            yield line("update", u, ("id", "hypothesis_id", "author", "date", "content", "metrics", "evidence_status"))
+        for m in _metric_points(db, project):
+            yield line("metric", m, ("hypothesis_id", "update_id", "name", "value", "date"))
+
+    return _chunks(pieces())
+
+def export_csv(db: Session, project: Project, table: str = "updates"):
+    if table == "hypotheses":
+        header = ["id", "parent_id", "statement", "status", "metrics", "position", "created_at"]
+        rows = ([h.id, h.parent_id, h.statement, h.status, json.dumps(h.metrics), json.dumps(h.position), h.created_at]
+                for h in _hypotheses(db, project))
+    elif table == "updates":
+        header = ["id", "hypothesis_id", "author", "date", "content", "metrics", "evidence_status"]
+        rows = ([u.id, u.hypothesis_id, u.author, u.date, u.content, json.dumps(u.metrics), u.evidence_status]
+                for u in _updates(db, project))
+    elif table == "metrics":
+        header = ["hypothesis_id", "update_id", "name", "value", "date"]
+        rows = (list(m) for m in _metric_points(db, project))
+    else:
+        raise ValueError(f"Unknown CSV table '{table}', expected one of {CSV_TABLES}")
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= CHUNK_CHARS:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+def export(db: Session, project_id: str, fmt: str = "markdown", table: str = "updates"):
+    """Generator of text chunks for one project in the given format."""
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if not project:
+        raise ValueError(f"Project {project_id} not found")
+    if fmt == "markdown":
+        yield from export_markdown(db, project)
+    elif fmt == "jsonl":
+        yield from export_jsonl(db, project)
+    elif fmt == "csv":
+        yield from export_csv(db, project, table)
+    else:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {sorted(FORMATS)}")
+
+def export_filename(title: str, fmt: str, table: str = None) -> str:
+    ext, _ = FORMATS[fmt]
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in title).strip("_") or "project"
+    suffix = f"_{table}" if fmt == "csv" and table else ""
+    return f"{safe}{suffix}_{int(time.time())}.{ext}"
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import data_manager_sql as dm
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("project_id")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="markdown")
+    parser.add_argument("--table", choices=CSV_TABLES, default="updates", help="which table to write as CSV")
+    parser.add_argument("--out", help="defaults to stdout")
+    args = parser.parse_args()
+
+    out = open(args.out, "w", encoding="utf-8", newline="") if args.out else sys.stdout
+    try:
+        for chunk in dm.export_project(args.project_id, args.format, args.table):
+            out.write(chunk)
+    finally:
+        if args.out:
+            out.close()
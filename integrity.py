@@ -0,0 +1,408 @@
+"""
+Consistency checker and bulk repair for project graphs.
+
+    python integrity.py                               # check DATABASE_URL; exit 1 if anything is wrong
+    python integrity.py --repair                      # fix what it finds, in one transaction
+    python integrity.py --project ID --json           # one project, machine-readable report
+    python integrity.py --backend json --data-dir data [--repair]
+
+Scheduled runs (cron, Cloud Scheduler, a Cloud Run job) only need the exit
+status, e.g. `*/30 * * * * python integrity.py --json >> integrity.log || notify`.
+
+Problems found, SQL backend:
+
+    dangling_north_star   the project's north_star_hypothesis_id names none of its hypotheses
+    north_star_not_root   the north star has a parent, so what is above it never renders
+    dangling_parent       parent_pk names no hypothesis, or one of another project
+    extra_root            a parentless hypothesis other than the north star (unreachable from it)
+    cycle                 hypotheses whose parent chain loops, e.g. after a bad reverse_relationship
+    edge_cycle            a subhypothesis edge (extra parent) that closes a loop through the hierarchy
+    dangling_edge         a hypothesis_edges row whose ends are gone or in another project
+    orphan_update         an update whose hypothesis is gone
+    unowned_hypothesis    a hypothesis whose project is gone (reported, never repaired)
+
+Each check is one set-based query: anti-joins for the dangling references, and
+one recursive CTE that walks every tree down from its roots; hypotheses it
+doesn't reach hang in or below a loop. Only when the counts disagree are those
+few rows fetched, and Python picks out the loops themselves. A second walk, down
+from the target of every subhypothesis edge, finds the loops that extra parents
+close. The JSON backend (data_manager.py) is checked in memory and also reports
+`children_mismatch`, a children list that disagrees with the parent_id of the
+hypotheses.
+
+Repair keeps every hypothesis. A project without a valid north star gets its
+oldest root (or a new one). Orphans, extra roots and one member of each loop are
+reattached under the north star. Dangling edges, edges that close a loop and
+orphan updates are deleted. Derived statuses are then recomputed, and a
+"restore" change-feed entry makes open views reload the project.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from sqlalchemy import and_, bindparam, case, delete, exists, func, or_, select, update
+from sqlalchemy.orm import Session
+
+import edges
+from models_sql import Hypothesis, HypothesisEdge, MetricPoint, Project, Update, generate_uuid
+
+SAMPLE_SIZE = 20  # ids listed per problem in the CLI output
+
+def find_cycles(parents: dict) -> list:
+    """Loops in a {node: parent} map, each as a list of nodes in parent order."""
+    state = {}  # node -> index of the walk that visited it
+    cycles = []
+    for walk, start in enumerate(parents):
+        node, path = start, []
+        while node in parents and node not in state:
+            state[node] = walk
+            path.append(node)
+            node = parents[node]
+        if node in parents and state.get(node) == walk:
+            # Came back to a node of this walk: the path from it is a loop
+            cycles.append(path[path.index(node):])
+    return cycles
+
+# --- SQL BACKEND ---
+
+def _scoped(q, column, pk):
+    return q if pk is None else q.where(column == pk)
+
+def check(conn, project_id: str = None) -> dict:
+    """{problem: [row, ...]} for the whole database or one project; rows are dicts of pks and ids."""
+    h, p = Hypothesis.__table__, Project.__table__
+    parent, ns = h.alias("parent"), h.alias("ns")
+    pk = None
+    if project_id is not None:
+        pk = conn.execute(select(p.c.pk).where(p.c.id == project_id)).scalar()
+        if pk is None:
+            raise ValueError(f"No project {project_id!r}")
+    found = {}
+
+    def rows(name, q):
+        found[name] = [dict(r._mapping) for r in conn.execute(q)]
+
+    rows("dangling_north_star", _scoped(
+        select(p.c.pk.label("project_pk"), p.c.id.label("project_id"), p.c.north_star_hypothesis_id)
+        .select_from(p.outerjoin(ns, and_(ns.c.id == p.c.north_star_hypothesis_id, ns.c.project_pk == p.c.pk)))
+        .where(ns.c.pk.is_(None)), p.c.pk, pk))
+    rows("north_star_not_root", _scoped(
+        select(h.c.pk, h.c.id, h.c.project_pk, h.c.parent_pk)
+        .join(p, and_(p.c.north_star_hypothesis_id == h.c.id, p.c.pk == h.c.project_pk))
+        .where(h.c.parent_pk.isnot(None)), h.c.project_pk, pk))
+    rows("dangling_parent", _scoped(
+        select(h.c.pk, h.c.id, h.c.project_pk, h.c.parent_pk)
+        .select_from(h.outerjoin(parent, parent.c.pk == h.c.parent_pk))
+        .where(h.c.parent_pk.isnot(None), or_(parent.c.pk.is_(None), parent.c.project_pk != h.c.project_pk)),
+        h.c.project_pk, pk))
+    rows("extra_root", _scoped(
+        select(h.c.pk, h.c.id, h.c.project_pk)
+        .join(p, p.c.pk == h.c.project_pk)
+        .where(h.c.parent_pk.is_(None),
+               or_(p.c.north_star_hypothesis_id.is_(None), p.c.north_star_hypothesis_id != h.c.id)),
+        h.c.project_pk, pk))
+
+    # Walk down from every root; what the walk doesn't reach hangs in or below a loop.
+    # Over the whole database every link counts, cross-project ones too: a loop
+    # never reaches a root whichever projects it spans. For one project the walk
+    # stays inside it, and parents elsewhere count as roots (they are reported above).
+    if pk is None:
+        roots = select(h.c.pk).where(or_(h.c.parent_pk.is_(None), ~exists().where(parent.c.pk == h.c.parent_pk)))
+        reach = roots.cte("reach", recursive=True)
+        reach = reach.union_all(select(h.c.pk).join(reach, h.c.parent_pk == reach.c.pk))
+    else:
+        roots = select(h.c.pk).where(h.c.project_pk == pk, or_(
+            h.c.parent_pk.is_(None),
+            ~exists().where(parent.c.pk == h.c.parent_pk, parent.c.project_pk == pk),
+        ))
+        reach = roots.cte("reach", recursive=True)
+        reach = reach.union_all(select(h.c.pk).join(reach, h.c.parent_pk == reach.c.pk).where(h.c.project_pk == pk))
+    reached, total = conn.execute(select(
+        select(func.count()).select_from(reach).scalar_subquery(),
+        _scoped(select(func.count()).select_from(h), h.c.project_pk, pk).scalar_subquery(),
+    )).one()
+    unreached = {}
+    if reached != total:  # the anti-join only runs on a damaged database
+        unreached = {r.pk: r for r in conn.execute(_scoped(
+            select(h.c.pk, h.c.id, h.c.project_pk, h.c.parent_pk).where(h.c.pk.not_in(select(reach.c.pk))),
+            h.c.project_pk, pk))}
+    found["cycle"] = [
+        {"pks": loop, "ids": [unreached[n].id for n in loop], "project_pk": unreached[loop[0]].project_pk}
+        for loop in find_cycles({n: r.parent_pk for n, r in unreached.items()})
+    ]
+
+    # Loops through extra parents: a subhypothesis edge whose target reaches its
+    # source down the whole hierarchy (tree links and edges). One walk for all
+    # edges at once; projects have few of them.
+    e, src, tgt = HypothesisEdge.__table__, h.alias("src"), h.alias("tgt")
+    links = edges.hierarchy(pk)
+    walk = _scoped(select(e.c.pk.label("edge_pk"), e.c.target_pk.label("node")).where(e.c.kind == "subhypothesis"),
+                   e.c.project_pk, pk).cte("walk", recursive=True)
+    walk = walk.union(select(walk.c.edge_pk, links.c.child_pk).join(walk, links.c.parent_pk == walk.c.node))
+    rows("edge_cycle", select(e.c.pk, e.c.id, e.c.project_pk, e.c.source_pk, e.c.target_pk)
+         .join(walk, and_(walk.c.edge_pk == e.c.pk, walk.c.node == e.c.source_pk)))
+
+    rows("dangling_edge", _scoped(
+        select(e.c.pk, e.c.id, e.c.project_pk)
+        .select_from(e.outerjoin(src, src.c.pk == e.c.source_pk).outerjoin(tgt, tgt.c.pk == e.c.target_pk))
+        .where(or_(src.c.pk.is_(None), tgt.c.pk.is_(None),
+                   src.c.project_pk != e.c.project_pk, tgt.c.project_pk != e.c.project_pk)),
+        e.c.project_pk, pk))
+    u = Update.__table__
+    if pk is None:  # an orphan update has no project to scope it by
+        rows("orphan_update", select(u.c.pk, u.c.id).where(~exists().where(h.c.pk == u.c.hypothesis_pk)))
+        rows("unowned_hypothesis", select(h.c.pk, h.c.id).where(~exists().where(p.c.pk == h.c.project_pk)))
+    else:
+        found["orphan_update"], found["unowned_hypothesis"] = [], []
+    return found
+
+def _north_stars(conn, project_pks) -> dict:
+    h, p = Hypothesis.__table__, Project.__table__
+    return dict(conn.execute(
+        select(p.c.pk, h.c.pk).join(h, and_(h.c.id == p.c.north_star_hypothesis_id, h.c.project_pk == p.c.pk))
+        .where(p.c.pk.in_(project_pks))
+    ).all())
+
+def _reattach(conn, moves):
+    """moves: [(hypothesis pk, new parent pk or None)]"""
+    h = Hypothesis.__table__
+    if moves:
+        conn.execute(update(h).where(h.c.pk == bindparam("h_pk")).values(parent_pk=bindparam("new_parent")),
+                     [{"h_pk": h_pk, "new_parent": parent_pk} for h_pk, parent_pk in moves])
+
+def repair(conn, project_id: str = None, log=print) -> dict:
+    """
+    Fixes what check() finds, in the caller's transaction. Returns the problems
+    found before the repair; check() again to confirm.
+    """
+    import change_feed
+    import people
+    import search
+    import status_rollup
+
+    h, p = Hypothesis.__table__, Project.__table__
+    before = found = check(conn, project_id)
+    touched, created, moved = set(), set(), set()  # project pks; hypothesis pks whose subtree changed
+
+    # 1. A north star per project: its oldest root, else its oldest hypothesis, else a new one
+    broken = [r["project_pk"] for r in before["dangling_north_star"]]
+    if broken:
+        candidate = (
+            select(h.c.id).where(h.c.project_pk == p.c.pk)
+            .order_by(case((h.c.parent_pk.is_(None), 0), else_=1), h.c.pk).limit(1)
+            .scalar_subquery()
+        )
+        conn.execute(update(p).where(p.c.pk.in_(broken)).values(north_star_hypothesis_id=candidate))
+        empty = conn.execute(select(p.c.pk, p.c.title).where(p.c.pk.in_(broken), p.c.north_star_hypothesis_id.is_(None))).all()
+        for project_pk, title in empty:
+            h_id = generate_uuid()
+            conn.execute(h.insert().values(id=h_id, project_pk=project_pk, statement=title or "North star",
+                                           status="open", metrics=[], position={"x": 0, "y": 0}))
+            conn.execute(update(p).where(p.c.pk == project_pk).values(north_star_hypothesis_id=h_id))
+            created.add(project_pk)
+        touched.update(broken)
+        log(f"Set the north star of {len(broken)} project(s)")
+        found = check(conn, project_id)
+
+    # 2. North stars become roots; orphans and extra roots go under their north star
+    stars = _north_stars(conn, {r["project_pk"] for kind in ("dangling_parent", "extra_root") for r in found[kind]})
+    moves = [(r["pk"], None, r["parent_pk"]) for r in found["north_star_not_root"]]
+    moves += [(r["pk"], stars[r["project_pk"]], r.get("parent_pk")) for kind in ("dangling_parent", "extra_root")
+              for r in found[kind] if r["project_pk"] in stars]
+    if moves:
+        _reattach(conn, [(h_pk, new) for h_pk, new, _ in moves])
+        moved.update(pk for move in moves for pk in move)
+        touched.update(r["project_pk"] for kind in ("north_star_not_root", "dangling_parent", "extra_root") for r in found[kind])
+        log(f"Reattached {len(moves)} hypotheses")
+
+    e = HypothesisEdge.__table__
+    if found["dangling_edge"]:
+        conn.execute(delete(e).where(e.c.pk.in_([r["pk"] for r in found["dangling_edge"]])))
+        touched.update(r["project_pk"] for r in found["dangling_edge"])
+        log(f"Deleted {len(found['dangling_edge'])} dangling edges")
+
+    # 3. Loops, now that every north star is a root: cut each at its oldest member.
+    # Reattaching under a root can't close a loop, so only known ones need a fresh look
+    if found["cycle"]:
+        if moves or broken:
+            found = check(conn, project_id)
+        stars = _north_stars(conn, {c["project_pk"] for c in found["cycle"]})
+        cuts = [(min(c["pks"]), stars.get(c["project_pk"])) for c in found["cycle"]]
+        _reattach(conn, cuts)
+        moved.update(pk for cut in cuts for pk in cut)
+        touched.update(c["project_pk"] for c in found["cycle"])
+        log(f"Broke {len(cuts)} parent loops")
+
+    # 4. Extra parents that close a loop lose that edge (the tree fixes above may have opened some)
+    if found["edge_cycle"]:
+        if moves or broken or found["cycle"]:
+            found = check(conn, project_id)
+        looping = found["edge_cycle"]
+        conn.execute(delete(e).where(e.c.pk.in_([r["pk"] for r in looping])))
+        moved.update(r["source_pk"] for r in looping)
+        touched.update(r["project_pk"] for r in looping)
+        log(f"Deleted {len(looping)} edges that closed a loop")
+
+    orphans = [r["pk"] for r in found["orphan_update"]]
+    touched.discard(None)
+    with Session(bind=conn) as db:
+        if orphans:
+            people.forget_updates(db, orphans)
+            db.execute(delete(MetricPoint).where(MetricPoint.update_pk.in_(orphans)))
+            db.execute(delete(Update).where(Update.pk.in_(orphans)))
+            log(f"Deleted {len(orphans)} orphan updates")
+        # Derived statuses of the moved nodes and of their old and new ancestors
+        status_rollup.propagate(db, moved - {None})
+        for p_pk, pid in db.execute(select(p.c.pk, p.c.id).where(p.c.pk.in_(touched))).all():
+            if p_pk in created:
+                search.reindex_project(db, pid)
+            # Views can't patch their way to the repaired graph, so tell them to reload
+            change_feed.record_change(db, pid, "project", "restore", pid, {"source": "integrity"})
+        db.flush()
+    return before
+
+# --- JSON BACKEND (data_manager.py) ---
+
+def check_json(projects: dict, hypotheses: dict, project_id: str = None) -> dict:
+    """Same problems as check(), over the loaded projects.json and hypotheses.json, plus children_mismatch."""
+    found = {name: [] for name in ("dangling_north_star", "north_star_not_root", "dangling_parent", "extra_root",
+                                   "cycle", "children_mismatch", "unowned_hypothesis")}
+    hyps = {h_id: h for h_id, h in hypotheses.items() if project_id is None or h.get("project_id") == project_id}
+    for pid, project in projects.items():
+        if project_id is not None and pid != project_id:
+            continue
+        star = hypotheses.get(project.get("north_star_hypothesis_id"))
+        if star is None or star.get("project_id") != pid:
+            found["dangling_north_star"].append({"project_id": pid, "north_star_hypothesis_id": project.get("north_star_hypothesis_id")})
+        elif star.get("parent_id"):
+            found["north_star_not_root"].append({"id": star["id"], "project_id": pid})
+
+    children = {}
+    for h_id, h in hyps.items():
+        pid, p_id = h.get("project_id"), h.get("parent_id")
+        if pid not in projects:
+            found["unowned_hypothesis"].append({"id": h_id})
+            continue
+        parent = hypotheses.get(p_id) if p_id else None
+        if p_id and (parent is None or parent.get("project_id") != pid):
+            found["dangling_parent"].append({"id": h_id, "project_id": pid, "parent_id": p_id})
+        elif not p_id and projects[pid].get("north_star_hypothesis_id") != h_id:
+            found["extra_root"].append({"id": h_id, "project_id": pid})
+        if parent is not None:
+            children.setdefault(p_id, []).append(h_id)
+    for h_id, h in hyps.items():
+        listed = h.get("children") or []
+        if sorted(listed) != sorted(children.get(h_id, [])):
+            found["children_mismatch"].append({"id": h_id, "children": listed, "expected": children.get(h_id, [])})
+
+    links = {h_id: h.get("parent_id") for h_id, h in hyps.items()
+             if h.get("parent_id") in hyps and hyps[h["parent_id"]].get("project_id") == h.get("project_id")}
+    found["cycle"] = [{"ids": loop, "project_id": hyps[loop[0]].get("project_id")} for loop in find_cycles(links)]
+    return found
+
+def repair_json(projects: dict, hypotheses: dict, project_id: str = None, log=print) -> dict:
+    """Fixes the loaded dicts in place (see repair()); children lists are rebuilt from parent_id. Returns the findings."""
+    before = check_json(projects, hypotheses, project_id)
+    for r in before["dangling_north_star"]:
+        pid = r["project_id"]
+        own = sorted((h for h in hypotheses.values() if h.get("project_id") == pid),
+                     key=lambda h: (bool(h.get("parent_id")), h.get("created_at") or 0))
+        if own:
+            projects[pid]["north_star_hypothesis_id"] = own[0]["id"]
+        else:
+            h_id = generate_uuid()
+            hypotheses[h_id] = {"id": h_id, "project_id": pid, "parent_id": None, "statement": projects[pid].get("title") or "North star",
+                                "status": "open", "metrics": [], "position": {"x": 0, "y": 0}, "updates": [], "children": []}
+            projects[pid]["north_star_hypothesis_id"] = h_id
+
+    found = check_json(projects, hypotheses, project_id)
+    for r in found["north_star_not_root"]:
+        hypotheses[r["id"]]["parent_id"] = None
+    for r in found["dangling_parent"] + found["extra_root"]:
+        hypotheses[r["id"]]["parent_id"] = projects[r["project_id"]]["north_star_hypothesis_id"]
+    for loop in check_json(projects, hypotheses, project_id)["cycle"]:
+        cut = min(loop["ids"])
+        hypotheses[cut]["parent_id"] = projects[loop["project_id"]]["north_star_hypothesis_id"]
+
+    # parent_id is the source of truth; keep the listed order where it was right
+    children = {}
+    for h_id, h in hypotheses.items():
+        if h.get("parent_id") in hypotheses:
+            children.setdefault(h["parent_id"], []).append(h_id)
+    for h_id, h in hypotheses.items():
+        if project_id is None or h.get("project_id") == project_id:
+            expected = children.get(h_id, [])
+            listed = [c for c in h.get("children") or [] if c in expected]
+            h["children"] = list(dict.fromkeys(listed)) + [c for c in expected if c not in listed]
+    fixed = sum(len(v) for k, v in before.items() if k != "unowned_hypothesis")
+    if fixed:
+        log(f"Repaired {fixed} problem(s)")
+    return before
+
+# --- CLI ---
+
+def summarize(found: dict) -> dict:
+    """{problem: {"count", "sample": [ids]}} for the problems present."""
+    summary = {}
+    for name, rows in found.items():
+        if rows:
+            ids = [r.get("id") or r.get("ids") or r.get("project_id") for r in rows[:SAMPLE_SIZE]]
+            summary[name] = {"count": len(rows), "sample": ids}
+    return summary
+
+def _problems(found: dict) -> int:
+    return sum(len(rows) for rows in found.values())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repair", action="store_true", help="fix what is found")
+    parser.add_argument("--project", help="only this project id")
+    parser.add_argument("--backend", choices=["sql", "json"], default="sql")
+    parser.add_argument("--data-dir", default="data", help="JSON backend directory")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    log = (lambda msg: print(msg, file=sys.stderr)) if args.json else print
+    if args.backend == "json":
+        from archive import _json_files, _load
+        projects_file, hypotheses_file, _ = _json_files(args.data_dir)
+        projects, hypotheses = _load(projects_file), _load(hypotheses_file)
+        if args.repair:
+            found = repair_json(projects, hypotheses, args.project, log=log)
+            for path, data in ((projects_file, projects), (hypotheses_file, hypotheses)):
+                with open(path, "w") as f:
+                    json.dump(data, f, indent=2)
+            after = check_json(projects, hypotheses, args.project)
+        else:
+            found = after = check_json(projects, hypotheses, args.project)
+        target = os.path.abspath(args.data_dir)
+    else:
+        import database
+        database.ensure_schema()
+        if args.repair:
+            with database.engine.begin() as conn:
+                found = repair(conn, args.project, log=log)
+                after = check(conn, args.project)
+        else:
+            with database.router.read_engine().connect() as conn:
+                found = after = check(conn, args.project)
+        target = database.DATABASE_URL.split("@")[-1]
+
+    report = {"target": target, "found": summarize(found), "elapsed_s": round(time.perf_counter() - started, 2)}
+    if args.repair:
+        report["remaining"] = summarize(after)
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print(f"{target}: {_problems(found)} problem(s) in {report['elapsed_s']}s")
+        for name, info in report["found"].items():
+            print(f"  {name:<20} {info['count']:>8}  e.g. {', '.join(map(str, info['sample'][:3]))}")
+        if args.repair:
+            print(f"After repair: {_problems(after)} problem(s)")
+    return 1 if _problems(after) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,346 @@
+"""
+Concurrent-user load harness for data_manager_sql.
+
+    python load_test.py --users 50 --duration 30
+    python load_test.py --users 50 --scenario mixed --processes
+    python load_test.py --database-url postgresql://user:pw@localhost/research --users 100
+    python load_test.py --sqlite-mode compare --users 32      # SQLite: basic vs concurrent mode
+
+Each simulated session loops over a weighted mix of what a real browser session
+does: Project View renders, add_update, add_subhypothesis, undo_last_action and
+People View queries. SQLite (a temp file) is the default stand-in for Postgres.
+Per scenario it reports throughput, latency percentiles per operation, lock
+waits, errors and lost updates (writes that returned successfully but are
+missing from the database at the end; those an undo reverted are counted
+separately). `--sqlite-mode compare` runs the same load against SQLite in
+basic and concurrent mode (see database.py), each in its own process on a
+fresh file, and prints them side by side.
+"""
+import argparse
+import collections
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+SCENARIOS = {
+    # operation -> weight
+    "read-heavy": {"render": 70, "people": 15, "add_update": 10, "add_subhypothesis": 5},
+    "mixed": {"render": 45, "people": 10, "add_update": 30, "add_subhypothesis": 12, "undo": 3},
+    "write-heavy": {"render": 20, "add_update": 55, "add_subhypothesis": 25},
+    "undo-storm": {"render": 30, "add_update": 40, "add_subhypothesis": 10, "undo": 20},
+}
+
+_PARENT_PID = os.getpid()
+
+LOCK_MARKERS = ("database is locked", "deadlock", "could not obtain lock", "lock timeout", "could not serialize")
+
+def _classify(exc):
+    msg = str(exc).lower()
+    if any(m in msg for m in LOCK_MARKERS):
+        return "lock"
+    if "queuepool limit" in msg:
+        # Connection pool exhausted, e.g. sessions holding connections until GC
+        return "pool_timeout"
+    return f"error:{type(exc).__name__}"
+
+# --- ONE SESSION ---
+
+def _render(dm, project_id, rng):
+    # What one Project View rerun reads
+    dm.get_projects()
+    nodes, cursor = dm.load_project_nodes(project_id)
+    dm.get_changes_since(project_id, cursor)
+    dm.get_snapshots(project_id)
+    dm.generate_project_report(project_id)
+    if nodes:
+        dm.get_hypothesis(rng.choice(list(nodes)))
+    return nodes
+
+def _project_tokens(project_id):
+    """Load-test tokens currently stored in one project, read from the primary."""
+    from database import SessionLocal
+    from models_sql import Hypothesis, Update, project_pk
+
+    with SessionLocal() as db:
+        in_project = Hypothesis.project_pk == project_pk(project_id)
+        return {
+            "updates": {c for (c,) in db.query(Update.content).join(Update.hypothesis)
+                        .filter(in_project, Update.content.like("lt-%"))},
+            "hypotheses": {s for (s,) in db.query(Hypothesis.statement)
+                           .filter(in_project, Hypothesis.statement.like("lt-%"))},
+        }
+
+def _people(dm, rng):
+    authors = dm.get_all_authors()
+    if authors:
+        dm.get_updates_by_author(rng.choice(authors))
+
+def run_session(session_idx, scenario, duration, think_ms, seed, project_ids):
+    """Runs one simulated user until `duration` elapses. Picklable for process pools."""
+    import data_manager_sql as dm
+    from database import router, routing_scope
+
+    if os.getpid() != _PARENT_PID:
+        # Forked worker: don't reuse the parent's pooled connections
+        for engine in router.engines:
+            engine.dispose(close=False)
+
+    rng = random.Random(seed * 1000 + session_idx)
+    ops, weights = zip(*SCENARIOS[scenario].items())
+    samples = []  # (op, latency_ms, outcome)
+    acked = {"updates": [], "hypotheses": []}
+    reverted = {"updates": set(), "hypotheses": set()}
+    undos = 0
+    known_nodes = {}
+    author = f"Load User {session_idx}"
+
+    deadline = time.time() + duration
+    n = 0
+    while time.time() < deadline:
+        op = rng.choices(ops, weights)[0]
+        project_id = rng.choice(project_ids)
+        n += 1
+        token = f"lt-{seed}-{session_idx}-{n}"
+        start = time.perf_counter()
+        try:
+            # One operation is one rerun: reads after its write go to the primary
+            with routing_scope():
+                if op == "render":
+                    known_nodes[project_id] = list(_render(dm, project_id, rng))
+                elif op == "people":
+                    _people(dm, rng)
+                else:
+                    if project_id not in known_nodes:
+                        known_nodes[project_id] = list(dm.load_project_nodes(project_id)[0])
+                    if not known_nodes[project_id]:
+                        continue
+                    target = rng.choice(known_nodes[project_id])
+                    if op == "add_update":
+                        dm.add_update(target, author, token, {"accuracy": rng.random()}, rng.choice(["supporting", "refuting", "neutral"]))
+                        acked["updates"].append((project_id, token))
+                    elif op == "add_subhypothesis":
+                        dm.add_subhypothesis(target, token)
+                        acked["hypotheses"].append((project_id, token))
+                    elif op == "undo":
+                        before = _project_tokens(project_id)
+                        if dm.undo_last_action(project_id):
+                            undos += 1
+                            # Writes this undo took back on purpose aren't lost
+                            after = _project_tokens(project_id)
+                            for kind in reverted:
+                                reverted[kind] |= before[kind] - after[kind]
+            outcome = "ok"
+        except Exception as e:
+            outcome = _classify(e)
+        samples.append((op, (time.perf_counter() - start) * 1000, outcome))
+        if think_ms:
+            time.sleep(rng.uniform(0, 2 * think_ms) / 1000)
+
+    return {"samples": samples, "acked": acked, "reverted": reverted, "undos": undos}
+
+# --- SCENARIO ---
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def _sample_pg_lock_waits(engine, stop, out):
+    # Postgres only: count backends waiting on heavyweight locks, sampled every 100 ms
+    from sqlalchemy import text
+    while not stop.is_set():
+        try:
+            with engine.connect() as conn:
+                waiting = conn.execute(text(
+                    "SELECT count(*) FROM pg_stat_activity WHERE wait_event_type = 'Lock' AND datname = current_database()"
+                )).scalar()
+            out["samples"] += 1
+            out["waiting_total"] += waiting
+            out["max_waiting"] = max(out["max_waiting"], waiting)
+        except Exception:
+            pass
+        stop.wait(0.1)
+
+def find_lost(project_ids, acked, reverted):
+    """
+    Acknowledged writes that are no longer in the database. Those an undo
+    took back are counted apart, as "reverted_*", rather than as lost.
+    """
+    from database import SessionLocal
+    from models_sql import Hypothesis, Update
+
+    tokens_u = {t for _, t in acked["updates"]}
+    tokens_h = {t for _, t in acked["hypotheses"]}
+    with SessionLocal() as db:
+        present_u = {c for (c,) in db.query(Update.content).filter(Update.content.like("lt-%"))}
+        present_h = {s for (s,) in db.query(Hypothesis.statement).filter(Hypothesis.statement.like("lt-%"))}
+    missing_u, missing_h = tokens_u - present_u, tokens_h - present_h
+    return {
+        "updates": len(missing_u - reverted["updates"]),
+        "hypotheses": len(missing_h - reverted["hypotheses"]),
+        "reverted_updates": len(missing_u & reverted["updates"]),
+        "reverted_hypotheses": len(missing_h & reverted["hypotheses"]),
+    }
+
+def run_scenario(scenario, users, duration, think_ms, seed, project_ids, use_processes):
+    import data_manager_sql as dm
+    from database import engine
+
+    lock_stats = {"samples": 0, "waiting_total": 0, "max_waiting": 0}
+    stop = threading.Event()
+    monitor = None
+    if engine.dialect.name == "postgresql":
+        monitor = threading.Thread(target=_sample_pg_lock_waits, args=(engine, stop, lock_stats), daemon=True)
+        monitor.start()
+
+    pool_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    started = time.time()
+    with pool_cls(max_workers=users) as pool:
+        futures = [pool.submit(run_session, i, scenario, duration, think_ms, seed, project_ids) for i in range(users)]
+        results = [f.result() for f in futures]
+    wall = time.time() - started
+    stop.set()
+    # Release connections still held by unreferenced sessions before verifying
+    gc.collect()
+    dm.flush_snapshots(timeout=60)
+
+    samples = [s for r in results for s in r["samples"]]
+    acked = {"updates": [a for r in results for a in r["acked"]["updates"]],
+             "hypotheses": [a for r in results for a in r["acked"]["hypotheses"]]}
+    reverted = {kind: set().union(*(r["reverted"][kind] for r in results)) for kind in ("updates", "hypotheses")}
+    undos = sum(r["undos"] for r in results)
+
+    per_op = collections.defaultdict(list)
+    outcomes = collections.Counter()
+    for op, ms, outcome in samples:
+        outcomes[outcome] += 1
+        if outcome == "ok":
+            per_op[op].append(ms)
+
+    report = {
+        "scenario": scenario,
+        "users": users,
+        "duration_s": round(wall, 2),
+        "operations": len(samples),
+        "throughput_ops_s": round(outcomes["ok"] / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            op: {
+                "count": len(v),
+                "p50": round(percentile(v, 0.50), 2),
+                "p95": round(percentile(v, 0.95), 2),
+                "p99": round(percentile(v, 0.99), 2),
+                "max": round(max(v), 2),
+            } for op, v in sorted(per_op.items())
+        },
+        "lock_errors": outcomes["lock"],
+        "pool_timeouts": outcomes["pool_timeout"],
+        "errors": {k: v for k, v in outcomes.items() if k.startswith("error:")},
+        "undos": undos,
+        "lost": find_lost(project_ids, acked, reverted),
+        "acked_writes": {"updates": len(acked["updates"]), "hypotheses": len(acked["hypotheses"])},
+    }
+    if lock_stats["samples"]:
+        report["pg_lock_waits"] = {
+            "avg_waiting": round(lock_stats["waiting_total"] / lock_stats["samples"], 2),
+            "max_waiting": lock_stats["max_waiting"],
+        }
+    return report
+
+def seed_projects(count, nodes, updates, seed):
+    import benchmark
+    import data_manager_sql as dm
+
+    ids = []
+    for i in range(count):
+        dataset = benchmark.generate_project(seed=seed + i, nodes=nodes, fanout=4, depth=6, updates=updates, authors=10)
+        benchmark.load_into_sql(dataset)
+        dm.save_snapshot(dataset["project"]["id"])
+        ids.append(dataset["project"]["id"])
+    return ids
+
+def compare_sqlite_modes(argv, out):
+    """Runs this harness once per SQLite mode, in a child process each, and prints throughput side by side."""
+    results = {}
+    for mode in ("basic", "concurrent"):
+        mode_out = f"{os.path.splitext(out)[0]}.{mode}.json"
+        print(f"=== SQLITE_MODE={mode} ===", flush=True)
+        subprocess.run([sys.executable, os.path.abspath(__file__), *argv, "--sqlite-mode", mode, "--out", mode_out], check=True)
+        with open(mode_out) as f:
+            results[mode] = {r["scenario"]: r for r in json.load(f)["reports"]}
+
+    print(f"\n{'scenario':<14}{'mode':<12}{'ops/s':>10}{'render p95':>12}{'write p95':>11}{'lock errors':>13}")
+    for scenario in results["basic"]:
+        for mode, reports in results.items():
+            r = reports[scenario]
+            lat = r["latency_ms"]
+            write_p95 = max((lat[op]["p95"] for op in ("add_update", "add_subhypothesis") if op in lat), default=0.0)
+            print(f"{scenario:<14}{mode:<12}{r['throughput_ops_s']:>10}{lat.get('render', {}).get('p95', 0.0):>12}"
+                  f"{write_p95:>11}{r['lock_errors']:>13}")
+    with open(out, "w") as f:
+        json.dump({"sqlite_modes": results}, f, indent=2)
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per scenario")
+    parser.add_argument("--think-ms", type=float, default=50.0, help="mean pause between a user's operations")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS) + ["all"], default="all")
+    parser.add_argument("--projects", type=int, default=3)
+    parser.add_argument("--nodes", type=int, default=200, help="hypotheses per seeded project")
+    parser.add_argument("--updates", type=int, default=2000, help="updates per seeded project")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", action="store_true", help="one OS process per user instead of threads")
+    parser.add_argument("--database-url", help="defaults to a fresh SQLite file")
+    parser.add_argument("--read-database-urls", help="comma-separated read replicas of --database-url")
+    parser.add_argument("--sqlite-mode", choices=["basic", "concurrent", "compare"],
+                        help="SQLite engine setup (see database.py); 'compare' runs both")
+    parser.add_argument("--out", default="load_results.json")
+    args = parser.parse_args(argv)
+
+    if args.sqlite_mode == "compare":
+        if args.database_url:
+            parser.error("--sqlite-mode compare uses fresh SQLite files; drop --database-url")
+        argv = list(sys.argv[1:] if argv is None else argv)
+        rest = [a for i, a in enumerate(argv)
+                if a not in ("--sqlite-mode", "compare", "--out") and (i == 0 or argv[i - 1] not in ("--sqlite-mode", "--out"))
+                and not a.startswith(("--sqlite-mode=", "--out="))]
+        return compare_sqlite_modes(rest, args.out)
+    if args.sqlite_mode:
+        os.environ["SQLITE_MODE"] = args.sqlite_mode
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='research_load_'), 'load.db')}"
+    if args.read_database_urls:
+        os.environ["DATABASE_READ_URLS"] = args.read_database_urls
+
+    project_ids = seed_projects(args.projects, args.nodes, args.updates, args.seed)
+    scenarios = sorted(SCENARIOS) if args.scenario == "all" else [args.scenario]
+
+    reports = []
+    for scenario in scenarios:
+        print(f"Running '{scenario}' with {args.users} users for {args.duration:.0f}s...")
+        report = run_scenario(scenario, args.users, args.duration, args.think_ms, args.seed, project_ids, args.processes)
+        reports.append(report)
+        print(f"  {report['throughput_ops_s']} ops/s, lock errors {report['lock_errors']}, "
+              f"pool timeouts {report['pool_timeouts']}, "
+              f"errors {sum(report['errors'].values())}, lost {report['lost']}")
+        for op, lat in report["latency_ms"].items():
+            print(f"  {op:<18} n={lat['count']:<6} p50={lat['p50']:>8} p95={lat['p95']:>8} p99={lat['p99']:>8} ms")
+
+    with open(args.out, "w") as f:
+        json.dump({"database": os.environ["DATABASE_URL"].split("@")[-1], "reports": reports}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+from models_sql import Hypothesis, Update, MetricPoint, hypothesis_pk, project_pk
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+import numpy as np
+import pandas as pd
+
+# Metric time series live in `metric_points` (one row per update and metric name),
+# so analysis never has to deserialize Update.metrics. Targets still come from
+# Hypothesis.metrics, e.g. [{"name": "accuracy", "target": 0.9}], optionally with
+# "goal": "minimize" for metrics where lower is better.
+
+SECONDS_PER_DAY = 86400.0
+REBUILD_BATCH_SIZE = 5000
+
+POINT_COLUMNS = ["hypothesis_id", "update_id", "name", "value", "date"]
+EVALUATION_COLUMNS = [
+    "hypothesis_id", "statement", "name", "target", "goal", "latest", "best",
+    "points", "first_date", "last_date", "slope_per_day", "attained",
+]
+
+def parse_metrics(metrics) -> dict:
+    """Keeps only entries whose value is numeric; returns {name: float}."""
+    clean = {}
+    for name, value in (metrics or {}).items():
+        name = str(name).strip()
+        if not name or isinstance(value, bool):
+            continue
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            continue
+        if np.isfinite(value):
+            clean[name] = value
+    return clean
+
+def record_update_metrics(db: Session, update: Update, project_pk: int):
+    """Writes the metric points of one (flushed) update. Call inside the update's transaction."""
+    for name, value in parse_metrics(update.metrics).items():
+        db.add(MetricPoint(
+            project_pk=project_pk,
+            hypothesis_pk=update.hypothesis_pk,
+            update_pk=update.pk,
+            name=name,
+            value=value,
+            date=update.date,
+        ))
+
+def _insert_points(db: Session, updates) -> int:
+    """Core-inserts the points of (update pk, hypothesis pk, metrics, date, project pk) rows in batches."""
+    rows, written = [], 0
+    for update_pk, h_pk, metrics, date, p_pk in updates.yield_per(REBUILD_BATCH_SIZE):
+        for name, value in parse_metrics(metrics).items():
+            rows.append({
+                "project_pk": p_pk, "hypothesis_pk": h_pk, "update_pk": update_pk,
+                "name": name, "value": value, "date": date,
+            })
+        if len(rows) >= REBUILD_BATCH_SIZE:
+            db.execute(insert(MetricPoint.__table__), rows)
+            written += len(rows)
+            rows = []
+    if rows:
+        db.execute(insert(MetricPoint.__table__), rows)
+        written += len(rows)
+    return written
+
+def _update_rows(db: Session):
+    # Plain columns and Core inserts: no ORM objects for what can be hundreds of thousands of rows
+    return (
+        db.query(Update.pk, Update.hypothesis_pk, Update.metrics, Update.date, Hypothesis.project_pk)
+        .join(Hypothesis, Update.hypothesis_pk == Hypothesis.pk)
+    )
+
+def rebuild_metric_points(db: Session, project_id: str = None):
+    """Re-derives metric_points from Update.metrics (after a bulk restore, or by hand)."""
+    points = db.query(MetricPoint)
+    updates = _update_rows(db)
+    if project_id:
+        pk = project_pk(project_id)
+        points = points.filter(MetricPoint.project_pk == pk)
+        updates = updates.filter(Hypothesis.project_pk == pk)
+    points.delete(synchronize_session=False)
+    _insert_points(db, updates)
+
+def backfill_metric_points(db: Session) -> int:
+    """
+    Adds the points of updates that have none yet, e.g. ones logged before
+    metric_points existed. Run by migrate.py; returns the number of points written.
+    """
+    has_points = db.query(MetricPoint.id).filter(MetricPoint.update_pk == Update.pk).exists()
+    return _insert_points(db, _update_rows(db).filter(Update.metrics.isnot(None), ~has_points))
+
+# --- LOADING ---
+
+def load_points(db: Session, project_id: str = None, hypothesis_id: str = None) -> pd.DataFrame:
+    # Joined on the integer keys; frames carry the public ids
+    q = (
+        db.query(Hypothesis.id, Update.id, MetricPoint.name, MetricPoint.value, MetricPoint.date)
+        .select_from(MetricPoint)
+        .join(Hypothesis, Hypothesis.pk == MetricPoint.hypothesis_pk)
+        .outerjoin(Update, Update.pk == MetricPoint.update_pk)
+    )
+    if project_id:
+        q = q.filter(MetricPoint.project_pk == project_pk(project_id))
+    if hypothesis_id:
+        q = q.filter(MetricPoint.hypothesis_pk == hypothesis_pk(hypothesis_id))
+    return pd.DataFrame(q.all(), columns=POINT_COLUMNS)
+
+def load_targets(db: Session, project_id: str) -> pd.DataFrame:
+    rows = []
+    q = db.query(Hypothesis.id, Hypothesis.statement, Hypothesis.metrics).filter(Hypothesis.project_pk == project_pk(project_id))
+    for h_id, statement, metrics in q:
+        for m in metrics or []:
+            if not isinstance(m, dict) or "name" not in m:
+                continue
+            try:
+                target = float(m.get("target"))
+            except (TypeError, ValueError):
+                continue
+            goal = "minimize" if m.get("goal") == "minimize" else "maximize"
+            rows.append((h_id, statement, str(m["name"]), target, goal))
+    return pd.DataFrame(rows, columns=["hypothesis_id", "statement", "name", "target", "goal"])
+
+# --- EVALUATION ---
+
+def summarize_points(points: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per (hypothesis, metric) aggregates in one grouped pass: latest/best value,
+    point count, date range and least-squares slope (units per day).
+    """
+    cols = ["hypothesis_id", "name", "latest", "max", "min", "points", "first_date", "last_date", "slope_per_day"]
+    if points.empty:
+        return pd.DataFrame(columns=cols)
+
+    df = points.sort_values(["hypothesis_id", "name", "date"], kind="stable")
+    keys = ["hypothesis_id", "name"]
+    g = df.groupby(keys, sort=False)
+
+    # Slope = cov(t, v) / var(t), with both moments computed via group transforms
+    t = (df["date"].astype(float) / SECONDS_PER_DAY).to_numpy()
+    v = df["value"].astype(float).to_numpy()
+    dt = t - g["date"].transform("mean").to_numpy() / SECONDS_PER_DAY
+    dv = v - g["value"].transform("mean").to_numpy()
+    moments = pd.DataFrame({"hypothesis_id": df["hypothesis_id"], "name": df["name"], "sxy": dt * dv, "sxx": dt * dt})
+    sums = moments.groupby(keys, sort=False)[["sxy", "sxx"]].sum()
+
+    summary = g.agg(
+        latest=("value", "last"),
+        max=("value", "max"),
+        min=("value", "min"),
+        points=("value", "size"),
+        first_date=("date", "min"),
+        last_date=("date", "max"),
+    )
+    sxx = sums["sxx"].to_numpy()
+    summary["slope_per_day"] = np.divide(sums["sxy"].to_numpy(), sxx, out=np.zeros_like(sxx), where=sxx > 0)
+    return summary.reset_index()[cols]
+
+def evaluate_targets(points: pd.DataFrame, targets: pd.DataFrame) -> pd.DataFrame:
+    """Joins per-metric summaries onto targets and flags attainment, vectorized."""
+    if targets.empty:
+        return pd.DataFrame(columns=EVALUATION_COLUMNS)
+
+    summary = summarize_points(points)
+    df = targets.merge(summary, on=["hypothesis_id", "name"], how="left")
+    minimize = (df["goal"] == "minimize").to_numpy()
+    latest = df["latest"].astype(float).to_numpy()
+    target = df["target"].astype(float).to_numpy()
+
+    df["best"] = np.where(minimize, df["min"].astype(float), df["max"].astype(float))
+    df["attained"] = np.where(minimize, latest <= target, latest >= target) & ~np.isnan(latest)
+    df["points"] = df["points"].fillna(0).astype(int)
+    return df[EVALUATION_COLUMNS]
+
+def evaluate_project(db: Session, project_id: str) -> pd.DataFrame:
+    return evaluate_targets(load_points(db, project_id=project_id), load_targets(db, project_id))
+
+def metric_series(db: Session, hypothesis_id: str) -> pd.DataFrame:
+    """Date-indexed frame with one column per metric, ready for st.line_chart."""
+    points = load_points(db, hypothesis_id=hypothesis_id)
+    if points.empty:
+        return pd.DataFrame()
+    points["date"] = pd.to_datetime(points["date"], unit="s")
+    return points.pivot_table(index="date", columns="name", values="value", aggfunc="last").sort_index()
+
+if __name__ == "__main__":
+    from database import SessionLocal, init_db
+    init_db()
+    with SessionLocal() as db:
+        rebuild_metric_points(db)
+        db.commit()
+        print("Rebuilt metric_points:", db.query(MetricPoint).count())
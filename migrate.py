@@ -0,0 +1,371 @@
+"""
+Schema migration step, run once per deployment instead of on every cold start.
+
+    python migrate.py            # upgrade an older schema, create missing tables/indexes, record SCHEMA_VERSION
+    python migrate.py --check    # exit 1 if the database is behind this build
+
+Instances still run one cheap version check on first use (database.ensure_schema)
+and fall back to migrating the schema themselves, so local runs need no extra step.
+
+Version 2 moves every table from UUID primary/foreign keys to integer surrogate
+keys (see models_sql). The upgrade is online: rows are copied into `<table>_v2`
+staging tables in small batches, each its own transaction, while the running app
+keeps reading and writing the old tables. One short final transaction copies
+what changed meanwhile, drops the old tables and renames the staging ones.
+"""
+import argparse
+import sys
+import time
+
+from sqlalchemy import MetaData, Table, insert, inspect, text
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import AddConstraint, CreateTable, ForeignKeyConstraint
+
+from models_sql import Base, SchemaVersion
+
+STAGING_SUFFIX = "_v2"
+MIGRATION_BATCH_SIZE = 5000
+SNAPSHOT_BATCH_SIZE = 50
+
+# Old table -> INSERT ... SELECT of one batch, walking the old `id` in order.
+# Tables are copied parents first, so the joins find the new surrogate keys.
+V1_COPY = {
+    "projects": """
+        INSERT INTO projects_v2 (id, title, north_star_hypothesis_id, status, members, layout_mode, created_at)
+        SELECT o.id, o.title, o.north_star_hypothesis_id, o.status, o.members, o.layout_mode, o.created_at
+        FROM projects o {where} ORDER BY o.id {limit}""",
+    "hypotheses": """
+        INSERT INTO hypotheses_v2 (id, project_pk, statement, status, metrics, position, created_at)
+        SELECT o.id, p.pk, o.statement, o.status, o.metrics, o.position, o.created_at
+        FROM hypotheses o LEFT JOIN projects_v2 p ON p.id = o.project_id {where} ORDER BY o.id {limit}""",
+    "updates": """
+        INSERT INTO updates_v2 (id, hypothesis_pk, author, date, content, metrics, evidence_status)
+        SELECT o.id, h.pk, o.author, o.date, o.content, o.metrics, o.evidence_status
+        FROM updates o LEFT JOIN hypotheses_v2 h ON h.id = o.hypothesis_id {where} ORDER BY o.id {limit}""",
+    "metric_points": """
+        INSERT INTO metric_points_v2 (id, project_pk, hypothesis_pk, update_pk, name, value, date)
+        SELECT o.id, p.pk, h.pk, u.pk, o.name, o.value, o.date
+        FROM metric_points o
+        LEFT JOIN projects_v2 p ON p.id = o.project_id
+        LEFT JOIN hypotheses_v2 h ON h.id = o.hypothesis_id
+        LEFT JOIN updates_v2 u ON u.id = o.update_id {where} ORDER BY o.id {limit}""",
+    "snapshots": """
+        INSERT INTO snapshots_v2 (id, project_pk, version, timestamp, data)
+        SELECT o.id, p.pk, o.timestamp * 1000000 + o.id % 1000000, o.timestamp, o.data
+        FROM snapshots o LEFT JOIN projects_v2 p ON p.id = o.project_id {where} ORDER BY o.id {limit}""",
+    "changes": """
+        INSERT INTO changes_v2 (id, project_pk, revision, entity, entity_id, operation, payload, created_at)
+        SELECT o.id, p.pk, o.revision, o.entity, o.entity_id, o.operation, o.payload, o.created_at
+        FROM changes o JOIN projects_v2 p ON p.id = o.project_id {where} ORDER BY o.id {limit}""",
+}
+
+# Columns the app edits in place; every other table is insert/delete only
+V1_MUTABLE = {
+    "projects": ("title", "north_star_hypothesis_id", "status", "members", "layout_mode"),
+    "hypotheses": ("statement", "status", "metrics", "position"),
+}
+
+SET_PARENT_PKS = """
+    UPDATE hypotheses_v2 SET parent_pk = (
+        SELECT p.pk FROM hypotheses o JOIN hypotheses_v2 p ON p.id = o.parent_id WHERE o.id = hypotheses_v2.id
+    ) {where}"""
+
+# Rows added or re-parented since their parent_pk was set (new rows have none yet)
+STALE_PARENT_PKS = """
+    WHERE pk IN (
+        SELECT n.pk FROM hypotheses_v2 n JOIN hypotheses o ON o.id = n.id
+        LEFT JOIN hypotheses_v2 p ON p.pk = n.parent_pk
+        WHERE p.id {distinct} o.parent_id)"""
+
+def schema_version_of(conn):
+    """1 for databases with UUID keys, None for an empty database, else the stamped version."""
+    insp = inspect(conn)
+    if not insp.has_table("projects"):
+        return None
+    if "pk" not in {c["name"] for c in insp.get_columns("projects")}:
+        return 1
+    if insp.has_table("schema_version"):
+        return conn.execute(text("SELECT max(version) FROM schema_version")).scalar()
+    return None
+
+def _staging_tables(conn):
+    """Staging copies of the v2 tables: columns and primary keys only, indexes come after the swap."""
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        table.to_metadata(metadata)  # foreign keys of the copies point at the final names
+    staging = []
+    for name in V1_COPY:
+        columns = [c._copy() for c in Base.metadata.tables[name].columns]
+        for c in columns:
+            c.index = None
+        staging.append(Table(name + STAGING_SUFFIX, metadata, *columns))
+    existing = set(inspect(conn).get_table_names())
+    # SQLite takes references to tables that don't exist yet; Postgres gets its foreign keys after the swap
+    fks = None if conn.dialect.name == "sqlite" else []
+    for table in staging:
+        if table.name not in existing:
+            conn.execute(CreateTable(table, include_foreign_key_constraints=fks))
+
+def _v1_tables(conn):
+    """Old tables present. The first releases had no metric_points or changes; those come out empty."""
+    insp = inspect(conn)
+    return [name for name in V1_COPY if insp.has_table(name)]
+
+def _copy_batches(engine, name, batch_size, log):
+    with engine.connect() as conn:
+        if name not in _v1_tables(conn):
+            return
+    sql = V1_COPY[name]
+    if name == "snapshots":
+        batch_size = min(batch_size, SNAPSHOT_BATCH_SIZE)
+    staging = name + STAGING_SUFFIX
+    copied = 0
+    while True:
+        with engine.begin() as conn:
+            last = conn.execute(text(f"SELECT max(id) FROM {staging}")).scalar()
+            where = "" if last is None else "WHERE o.id > :last"
+            n = conn.execute(text(sql.format(where=where, limit="LIMIT :n")), {"last": last, "n": batch_size}).rowcount
+        copied += n
+        if n < batch_size:
+            break
+    log(f"  {name}: {copied} rows copied")
+
+def _set_parent_pks(engine, batch_size):
+    with engine.begin() as conn:
+        top = conn.execute(text("SELECT max(pk) FROM hypotheses_v2")).scalar() or 0
+    for lo in range(0, top, batch_size):
+        with engine.begin() as conn:
+            conn.execute(text(SET_PARENT_PKS.format(where="WHERE pk > :lo AND pk <= :hi")), {"lo": lo, "hi": lo + batch_size})
+
+def _catch_up(conn):
+    """
+    Copies what the app changed during the backfill. Runs inside the swap
+    transaction, so it writes only the rows that differ from the old tables.
+    """
+    # Null-safe inequality; JSON columns are compared as text, which Postgres' json type needs
+    distinct = "IS NOT" if conn.dialect.name == "sqlite" else "IS DISTINCT FROM"
+    for name in _v1_tables(conn):
+        sql, staging = V1_COPY[name], name + STAGING_SUFFIX
+        conn.execute(text(f"DELETE FROM {staging} WHERE NOT EXISTS (SELECT 1 FROM {name} o WHERE o.id = {staging}.id)"))
+        missing = f"WHERE NOT EXISTS (SELECT 1 FROM {staging} n WHERE n.id = o.id)"
+        conn.execute(text(sql.format(where=missing, limit="")))
+        for column in V1_MUTABLE.get(name, ()):
+            conn.execute(text(f"""
+                UPDATE {staging} SET {column} = (SELECT o.{column} FROM {name} o WHERE o.id = {staging}.id)
+                WHERE EXISTS (SELECT 1 FROM {name} o WHERE o.id = {staging}.id
+                              AND CAST(o.{column} AS TEXT) {distinct} CAST({staging}.{column} AS TEXT))"""))
+    conn.execute(text(SET_PARENT_PKS.format(where=STALE_PARENT_PKS.format(distinct=distinct))))
+
+def _swap(conn):
+    for name in reversed(_v1_tables(conn)):
+        conn.execute(text(f"DROP TABLE {name}"))
+    for name in V1_COPY:
+        conn.execute(text(f"ALTER TABLE {name}{STAGING_SUFFIX} RENAME TO {name}"))
+    for name in V1_COPY:
+        table = Base.metadata.tables[name]
+        for index in table.indexes:
+            index.create(conn)
+        for constraint in table.constraints:
+            if constraint.name and not isinstance(constraint, ForeignKeyConstraint) and constraint is not table.primary_key:
+                if conn.dialect.name == "sqlite":
+                    cols = ", ".join(c.name for c in constraint.columns)
+                    conn.execute(text(f"CREATE UNIQUE INDEX {constraint.name} ON {name} ({cols})"))
+                else:
+                    conn.execute(AddConstraint(constraint))
+        if conn.dialect.name == "postgresql":
+            for fk in table.foreign_key_constraints:
+                conn.execute(AddConstraint(fk))
+            if name in ("metric_points", "snapshots", "changes"):
+                # Ids were copied explicitly; move the sequence past them
+                conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), coalesce(max(id), 0) + 1, false) FROM {name}"))
+
+def _stamp(conn, version):
+    """Records an upgrade step in the transaction that completes it, so it never runs twice."""
+    SchemaVersion.__table__.create(conn, checkfirst=True)
+    conn.execute(insert(SchemaVersion.__table__).values(version=version, applied_at=int(time.time())))
+
+def migrate_v1_to_v2(engine, batch_size=MIGRATION_BATCH_SIZE, log=print):
+    """UUID keys -> integer surrogate keys, copying online (see module docstring)."""
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        _staging_tables(conn)
+    log("Backfilling integer-keyed tables:")
+    for name in V1_COPY:
+        _copy_batches(engine, name, batch_size, log)
+        if name == "hypotheses":
+            _set_parent_pks(engine, batch_size)
+    with engine.begin() as conn:
+        _catch_up(conn)
+        _swap(conn)
+        _stamp(conn, 2)
+    log(f"Swapped to schema version 2 in {time.perf_counter() - started:.1f}s")
+
+def backfill_author_rollups(engine, log=print):
+    """Adds update_authors/author_rollups (see people.py) and derives them from existing updates."""
+    import people
+    from models_sql import AuthorRollup, UpdateAuthor
+
+    started = time.perf_counter()
+    # One transaction, so updates written meanwhile are either in the backfill or wait for it
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn, tables=[UpdateAuthor.__table__, AuthorRollup.__table__])
+        with Session(bind=conn) as db:
+            people.rebuild_author_rollups(db)
+            db.flush()
+        _stamp(conn, 3)
+    log(f"Backfilled author rollups in {time.perf_counter() - started:.1f}s")
+
+def add_derived_status(engine, log=print):
+    """Adds hypotheses.derived_status (see status_rollup.py) and computes it for every project."""
+    import status_rollup
+    from models_sql import HypothesisEdge, Project
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        # Databases upgraded from version 1 got the column with the v2 tables
+        if "derived_status" not in {c["name"] for c in inspect(conn).get_columns("hypotheses")}:
+            conn.execute(text("ALTER TABLE hypotheses ADD COLUMN derived_status VARCHAR"))
+        # The rollup reads extra parents from hypothesis_edges (version 5), empty until then
+        Base.metadata.create_all(conn, tables=[HypothesisEdge.__table__])
+        with Session(bind=conn) as db:
+            for (project_id,) in db.query(Project.id):
+                status_rollup.recompute_project(db, project_id)
+            db.flush()
+        _stamp(conn, 4)
+    log(f"Rolled up hypothesis statuses in {time.perf_counter() - started:.1f}s")
+
+def add_hypothesis_edges(engine, log=print):
+    """Adds hypothesis_edges (see edges.py). Existing graphs are trees, so it starts empty."""
+    from models_sql import HypothesisEdge
+
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn, tables=[HypothesisEdge.__table__])
+        _stamp(conn, 5)
+    log("Added the hypothesis_edges table")
+
+def add_snapshot_hashes(engine, log=print):
+    """
+    Adds snapshots.hashes (see snapshot_diff.py). Existing snapshots keep NULL
+    and get their hashes computed from the payload when first diffed.
+    """
+    with engine.begin() as conn:
+        if "hashes" not in {c["name"] for c in inspect(conn).get_columns("snapshots")}:
+            conn.execute(text("ALTER TABLE snapshots ADD COLUMN hashes JSON"))
+        _stamp(conn, 6)
+    log("Added snapshots.hashes")
+
+BACKFILL_SNAPSHOT_VERSIONS = """
+    UPDATE snapshots SET version = timestamp * 1000000 + (
+        SELECT COUNT(*) FROM snapshots s
+        WHERE s.project_pk = snapshots.project_pk AND s.timestamp = snapshots.timestamp AND s.id < snapshots.id
+    ) WHERE version IS NULL"""
+
+def add_snapshot_versions(engine, log=print):
+    """
+    Adds snapshots.version and snapshots.action. Existing snapshots get a
+    version from their second plus their order within it, so versions taken in
+    the same second stay apart.
+    """
+    with engine.begin() as conn:
+        columns = {c["name"] for c in inspect(conn).get_columns("snapshots")}
+        if "version" not in columns:
+            conn.execute(text("ALTER TABLE snapshots ADD COLUMN version BIGINT"))
+        if "action" not in columns:
+            conn.execute(text("ALTER TABLE snapshots ADD COLUMN action VARCHAR"))
+        conn.execute(text(BACKFILL_SNAPSHOT_VERSIONS))
+        if "uq_snapshots_project_version" not in {i["name"] for i in inspect(conn).get_indexes("snapshots")} | {
+                c["name"] for c in inspect(conn).get_unique_constraints("snapshots")}:
+            conn.execute(text("CREATE UNIQUE INDEX uq_snapshots_project_version ON snapshots (project_pk, version)"))
+        _stamp(conn, 7)
+    log("Added snapshots.version")
+
+def add_timeline_index(engine, log=print):
+    """Adds the (hypothesis_pk, date, pk) index on updates that the evidence timeline pages through."""
+    from models_sql import Update
+
+    with engine.begin() as conn:
+        for index in Update.__table__.indexes:
+            if index.name == "ix_updates_hypothesis_date":
+                index.create(conn, checkfirst=True)
+        _stamp(conn, 8)
+    log("Added the evidence timeline index")
+
+def backfill_metric_points(engine, log=print):
+    """Copies the metrics of updates logged before metric_points existed (see metrics_store.py)."""
+    import metrics_store
+    from models_sql import MetricPoint
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn, tables=[MetricPoint.__table__])
+        with Session(bind=conn) as db:
+            written = metrics_store.backfill_metric_points(db)
+            db.flush()
+        _stamp(conn, 9)
+    log(f"Backfilled {written} metric points in {time.perf_counter() - started:.1f}s")
+
+BACKFILL_LAST_ACTIVITY = """
+    UPDATE projects SET last_activity = coalesce(
+        (SELECT max(c.created_at) FROM changes c WHERE c.project_pk = projects.pk), created_at, 0
+    ) WHERE last_activity IS NULL"""
+
+def add_project_last_activity(engine, log=print):
+    """Adds projects.last_activity and its index (see dashboard.py), filled from the change feed."""
+    from models_sql import Project
+
+    with engine.begin() as conn:
+        if "last_activity" not in {c["name"] for c in inspect(conn).get_columns("projects")}:
+            conn.execute(text("ALTER TABLE projects ADD COLUMN last_activity INTEGER"))
+        conn.execute(text(BACKFILL_LAST_ACTIVITY))
+        for index in Project.__table__.indexes:
+            index.create(conn, checkfirst=True)
+        _stamp(conn, 10)
+    log("Added projects.last_activity")
+
+def add_change_actors(engine, log=print):
+    """
+    Adds changes.actor and snapshots.revision (see change_feed.acting_as). Older
+    rows keep NULL, so an actor can't undo past a version taken before this.
+    """
+    with engine.begin() as conn:
+        if "actor" not in {c["name"] for c in inspect(conn).get_columns("changes")}:
+            conn.execute(text("ALTER TABLE changes ADD COLUMN actor VARCHAR"))
+        if "revision" not in {c["name"] for c in inspect(conn).get_columns("snapshots")}:
+            conn.execute(text("ALTER TABLE snapshots ADD COLUMN revision INTEGER"))
+        _stamp(conn, 11)
+    log("Added changes.actor and snapshots.revision")
+
+# version reached -> upgrade step from the version before it
+MIGRATIONS = {2: migrate_v1_to_v2, 3: backfill_author_rollups, 4: add_derived_status, 5: add_hypothesis_edges,
+              6: add_snapshot_hashes, 7: add_snapshot_versions, 8: add_timeline_index, 9: backfill_metric_points,
+              10: add_project_last_activity, 11: add_change_actors}
+
+def upgrade(engine, log=print):
+    """Runs the upgrade steps an existing database needs. New databases need none."""
+    with engine.connect() as conn:
+        current = schema_version_of(conn)
+    if current is None:
+        return
+    for version in sorted(MIGRATIONS):
+        if current < version:
+            MIGRATIONS[version](engine, log=log)
+
+def main(argv=None):
+    from database import DATABASE_URL, SCHEMA_VERSION, init_db, schema_is_current
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="only report whether the schema is current")
+    args = parser.parse_args(argv)
+
+    target = DATABASE_URL.split("@")[-1]
+    if args.check:
+        current = schema_is_current()
+        print(f"{target}: schema {'is current' if current else 'is behind'} (version {SCHEMA_VERSION})")
+        return 0 if current else 1
+
+    init_db()
+    print(f"{target}: migrated to schema version {SCHEMA_VERSION}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
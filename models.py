@@ -34,6 +34,7 @@ class Hypothesis:
     updates: List[Update] = field(default_factory=list)
     children: List[str] = field(default_factory=list)
     position: Dict[str, float] = field(default_factory=dict) # x, y coordinates
+    derived_status: Optional[str] = None # rolled up from the children (SQL backend live views)
     
     def to_dict(self):
         return asdict(self)
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, JSON, Float, Text, create_engine
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy import BigInteger, Column, String, Integer, ForeignKey, JSON, Float, Text, Index, UniqueConstraint, create_engine, insert, select
+from sqlalchemy.orm import aliased, column_property, declarative_base, relationship
 from sqlalchemy.sql import func
 import uuid
 import time
@@ -12,36 +12,51 @@ def generate_uuid():
 def current_time_millis():
     return int(time.time())
 
+# Keys: every table has an integer surrogate `pk`, and all foreign keys and joins
+# use it. The UUID `id` stays as the unique public identifier (URLs, cytoscape
+# element ids, snapshots, the change feed). The public ids of related rows
+# (`project_id`, `parent_id`, `hypothesis_id`, ...) are read-only column
+# properties for reading; writes set the `*_pk` columns or the relationships.
+
 class Project(Base):
     __tablename__ = 'projects'
     
-    id = Column(String, primary_key=True, default=generate_uuid)
+    pk = Column(Integer, primary_key=True, autoincrement=True)
+    id = Column(String, unique=True, nullable=False, default=generate_uuid)
     title = Column(String, nullable=False)
     north_star_hypothesis_id = Column(String, nullable=True) # Can't be FK yet as circular dep potential
     status = Column(String, default="active")
     members = Column(JSON, default=list) # List of strings
     layout_mode = Column(String, default="breadthfirst")
     created_at = Column(Integer, default=current_time_millis)
+    last_activity = Column(Integer, default=current_time_millis) # time of the latest change-feed row, see dashboard.py
 
     # Relationships
     hypotheses = relationship("Hypothesis", back_populates="project", cascade="all, delete-orphan")
     snapshots = relationship("Snapshot", back_populates="project", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Dashboard listing, most recently active first (keyset paginated)
+        Index('ix_projects_last_activity', 'last_activity', 'pk'),
+    )
+
 class Hypothesis(Base):
     __tablename__ = 'hypotheses'
 
-    id = Column(String, primary_key=True, default=generate_uuid)
-    project_id = Column(String, ForeignKey('projects.id'))
-    parent_id = Column(String, ForeignKey('hypotheses.id'), nullable=True)
+    pk = Column(Integer, primary_key=True, autoincrement=True)
+    id = Column(String, unique=True, nullable=False, default=generate_uuid)
+    project_pk = Column(Integer, ForeignKey('projects.pk'), index=True)
+    parent_pk = Column(Integer, ForeignKey('hypotheses.pk'), nullable=True, index=True)
     statement = Column(Text, nullable=False)
     status = Column(String, default="open")
+    derived_status = Column(String, nullable=True) # rolled up from the children, see status_rollup.py
     metrics = Column(JSON, default=list)
     position = Column(JSON, default=dict) # {x: float, y: float}
     created_at = Column(Integer, default=current_time_millis)
 
     # Relationships
     project = relationship("Project", back_populates="hypotheses")
-    parent = relationship("Hypothesis", remote_side=[id], backref="children_nodes")
+    parent = relationship("Hypothesis", remote_side=[pk], backref="children_nodes")
     updates = relationship("Update", back_populates="hypothesis", cascade="all, delete-orphan")
 
     # Helper to mimic the old 'children' list property
@@ -49,28 +64,174 @@ class Hypothesis(Base):
     def children(self):
         return [c.id for c in self.children_nodes]
 
+class HypothesisEdge(Base):
+    __tablename__ = 'hypothesis_edges'
+
+    # Typed links and extra parents beside the parent_pk tree; see edges.py
+    pk = Column(Integer, primary_key=True, autoincrement=True)
+    id = Column(String, unique=True, nullable=False, default=generate_uuid)
+    project_pk = Column(Integer, ForeignKey('projects.pk'), nullable=False)
+    source_pk = Column(Integer, ForeignKey('hypotheses.pk'), nullable=False)
+    target_pk = Column(Integer, ForeignKey('hypotheses.pk'), nullable=False)
+    kind = Column(String, nullable=False) # subhypothesis, supports, depends_on
+    created_at = Column(Integer, default=current_time_millis)
+
+    __table_args__ = (
+        UniqueConstraint('source_pk', 'target_pk', 'kind', name='uq_hypothesis_edges'),
+        Index('ix_hypothesis_edges_target', 'target_pk', 'kind'),
+        Index('ix_hypothesis_edges_project', 'project_pk'),
+    )
+
 class Update(Base):
     __tablename__ = 'updates'
     
-    id = Column(String, primary_key=True, default=generate_uuid)
-    hypothesis_id = Column(String, ForeignKey('hypotheses.id'))
+    pk = Column(Integer, primary_key=True, autoincrement=True)
+    id = Column(String, unique=True, nullable=False, default=generate_uuid)
+    hypothesis_pk = Column(Integer, ForeignKey('hypotheses.pk'), index=True)
     author = Column(String, default="")
     date = Column(Integer, default=current_time_millis)
     content = Column(Text, default="")
     metrics = Column(JSON, default=dict)
     evidence_status = Column(String, default="neutral")
 
+    __table_args__ = (
+        # Evidence timeline of a hypothesis, newest first (see timeline.py)
+        Index('ix_updates_hypothesis_date', 'hypothesis_pk', 'date', 'pk'),
+    )
+
     # Relationships
     hypothesis = relationship("Hypothesis", back_populates="updates")
+    metric_points = relationship("MetricPoint", back_populates="update", cascade="all, delete-orphan")
+
+class MetricPoint(Base):
+    __tablename__ = 'metric_points'
+
+    # One row per (update, metric name), normalized out of Update.metrics
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    project_pk = Column(Integer, ForeignKey('projects.pk'))
+    hypothesis_pk = Column(Integer, ForeignKey('hypotheses.pk'))
+    update_pk = Column(Integer, ForeignKey('updates.pk'))
+    name = Column(String, nullable=False)
+    value = Column(Float, nullable=False)
+    date = Column(Integer, default=current_time_millis)
+
+    __table_args__ = (
+        Index('ix_metric_points_project_name_date', 'project_pk', 'name', 'date'),
+        Index('ix_metric_points_hypothesis_name_date', 'hypothesis_pk', 'name', 'date'),
+        Index('ix_metric_points_update', 'update_pk'),
+    )
+
+    # Relationships
+    update = relationship("Update", back_populates="metric_points")
+
+class UpdateAuthor(Base):
+    __tablename__ = 'update_authors'
+
+    # One row per (update, author), split out of Update.author ("Ada, Bob"); see people.py
+    update_pk = Column(Integer, ForeignKey('updates.pk'), primary_key=True)
+    author = Column(String, primary_key=True)
+    project_pk = Column(Integer, ForeignKey('projects.pk'))
+    date = Column(Integer, default=current_time_millis)
+
+    __table_args__ = (
+        Index('ix_update_authors_author_date', 'author', 'date', 'update_pk'),
+        Index('ix_update_authors_project', 'project_pk'),
+    )
+
+class AuthorRollup(Base):
+    __tablename__ = 'author_rollups'
+
+    # Per (author, project, week) activity counts, kept current by every write to updates
+    author = Column(String, primary_key=True)
+    project_pk = Column(Integer, ForeignKey('projects.pk'), primary_key=True)
+    week = Column(Integer, primary_key=True) # Monday 00:00 UTC, epoch seconds
+    updates = Column(Integer, nullable=False, default=0)
+    supporting = Column(Integer, nullable=False, default=0)
+    refuting = Column(Integer, nullable=False, default=0)
+    neutral = Column(Integer, nullable=False, default=0)
+    last_date = Column(Integer)
+
+    __table_args__ = (
+        Index('ix_author_rollups_project', 'project_pk'),
+    )
 
 class Snapshot(Base):
     __tablename__ = 'snapshots'
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    project_id = Column(String, ForeignKey('projects.id'))
-    timestamp = Column(Integer)
+    project_pk = Column(Integer, ForeignKey('projects.pk'))
+    # Version id: microseconds since the epoch, unique and increasing per project
+    version = Column(BigInteger, nullable=False)
+    timestamp = Column(Integer) # Whole seconds of `version`, kept for older readers and archives
+    action = Column(String, nullable=True) # The edits this version records, e.g. "Add update ×2"
     data = Column(JSON) # Full project state dump
+    hashes = Column(JSON, nullable=True) # Per-node content and Merkle hashes, see snapshot_diff.py
+    revision = Column(Integer, nullable=True) # Change-feed revision read before the capture; later ones may be in it too
+
+    __table_args__ = (
+        UniqueConstraint('project_pk', 'version', name='uq_snapshots_project_version'),
+        Index('ix_snapshots_project_timestamp', 'project_pk', 'timestamp'),
+    )
     
     # Relationships
     project = relationship("Project", back_populates="snapshots")
 
+class Change(Base):
+    __tablename__ = 'changes'
+
+    # Append-only feed of mutations; `revision` is the per-project cursor clients poll with
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    project_pk = Column(Integer, ForeignKey('projects.pk'), nullable=False)
+    revision = Column(Integer, nullable=False)
+    entity = Column(String, nullable=False) # project, hypothesis, update, edge
+    entity_id = Column(String)
+    operation = Column(String, nullable=False) # create, update, delete, restore
+    payload = Column(JSON, default=dict)
+    created_at = Column(Integer, default=current_time_millis)
+    actor = Column(String, nullable=True) # Who made it (a browser session), see change_feed.acting_as
+
+    __table_args__ = (
+        UniqueConstraint('project_pk', 'revision', name='uq_changes_project_revision'),
+    )
+
+class SchemaVersion(Base):
+    __tablename__ = 'schema_version'
+
+    # One row per applied schema version; see database.SCHEMA_VERSION and migrate.py
+    version = Column(Integer, primary_key=True)
+    applied_at = Column(Integer, default=current_time_millis)
+
+# --- PUBLIC IDS OF RELATED ROWS ---
+# Correlated lookups by primary key, loaded with the row (and usable in SELECTs).
+# Filter with the `*_pk` columns and project_pk()/hypothesis_pk() instead.
+# Only a hypothesis' parent can change, so only parent_id is reloaded after a flush.
+
+def _public_id(model, fk_column, mutable=False):
+    target = aliased(model)
+    subquery = select(target.id).where(target.pk == fk_column).correlate_except(target).scalar_subquery()
+    return column_property(subquery, expire_on_flush=mutable)
+
+Hypothesis.project_id = _public_id(Project, Hypothesis.project_pk)
+Hypothesis.parent_id = _public_id(Hypothesis, Hypothesis.parent_pk, mutable=True)
+HypothesisEdge.source_id = _public_id(Hypothesis, HypothesisEdge.source_pk)
+HypothesisEdge.target_id = _public_id(Hypothesis, HypothesisEdge.target_pk)
+Update.hypothesis_id = _public_id(Hypothesis, Update.hypothesis_pk)
+MetricPoint.project_id = _public_id(Project, MetricPoint.project_pk)
+MetricPoint.hypothesis_id = _public_id(Hypothesis, MetricPoint.hypothesis_pk)
+MetricPoint.update_id = _public_id(Update, MetricPoint.update_pk)
+Snapshot.project_id = _public_id(Project, Snapshot.project_pk)
+Change.project_id = _public_id(Project, Change.project_pk)
+
+def project_pk(project_id):
+    """Surrogate key of a public project id, as a scalar subquery for filters and inserts."""
+    return select(Project.pk).where(Project.id == project_id).scalar_subquery()
+
+def hypothesis_pk(h_id):
+    return select(Hypothesis.pk).where(Hypothesis.id == h_id).scalar_subquery()
+
+def insert_returning_pks(conn, model, rows) -> dict:
+    """Core batch insert of `rows`; returns {public id: pk} for the inserted rows."""
+    if not rows:
+        return {}
+    table = model.__table__
+    return dict(conn.execute(insert(table).returning(table.c.id, table.c.pk), rows).all())
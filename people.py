@@ -0,0 +1,213 @@
+from models_sql import Project, Hypothesis, Update, UpdateAuthor, AuthorRollup, project_pk
+from sqlalchemy import and_, case, delete, func, insert, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+# Per-author activity for the People View. Update.author holds free text such as
+# "Ada, Bob"; every update is split into one `update_authors` row per name, which
+# is what the activity feed pages through (index on (author, date)). Summary stats
+# come from `author_rollups`: counts per (author, project, week), bumped by each
+# new update with one upsert and recomputed cell by cell when updates go away, so
+# an author's summary is a few dozen rows however much they wrote.
+
+SECONDS_PER_WEEK = 7 * 86400
+EPOCH_MONDAY = 4 * 86400  # 1970-01-05; weeks start on Monday 00:00 UTC
+EVIDENCE_STATUSES = ("supporting", "refuting", "neutral")
+DEFAULT_PAGE_SIZE = 20
+REBUILD_BATCH_SIZE = 5000
+
+def split_authors(author) -> list:
+    """'Ada, Bob; Ada' -> ['Ada', 'Bob']"""
+    names = []
+    for name in (author or "").replace(",", ";").split(";"):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+def week_of(date: int) -> int:
+    return date - (date - EPOCH_MONDAY) % SECONDS_PER_WEEK
+
+def _week(column):
+    return column - (column - EPOCH_MONDAY) % SECONDS_PER_WEEK
+
+def _upsert(db: Session):
+    # INSERT ... ON CONFLICT DO UPDATE, which both backends support
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(AuthorRollup.__table__)
+
+# --- MAINTENANCE ---
+
+def record_update(db: Session, update: Update, project_pk: int):
+    """Adds a (flushed) update to its authors' feed and rollups. Call inside the update's transaction."""
+    names = split_authors(update.author)
+    if not names:
+        return
+    db.execute(insert(UpdateAuthor.__table__), [
+        {"update_pk": update.pk, "author": name, "project_pk": project_pk, "date": update.date} for name in names
+    ])
+    evidence = update.evidence_status
+    stmt = _upsert(db).values([
+        dict({status: int(evidence == status) for status in EVIDENCE_STATUSES},
+             author=name, project_pk=project_pk, week=week_of(update.date), updates=1, last_date=update.date)
+        for name in names
+    ])
+    new = stmt.excluded
+    t = AuthorRollup.__table__.c
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[t.author, t.project_pk, t.week],
+        set_=dict(
+            {status: t[status] + new[status] for status in EVIDENCE_STATUSES},
+            updates=t.updates + new.updates,
+            last_date=case((new.last_date > func.coalesce(t.last_date, 0), new.last_date), else_=t.last_date),
+        ),
+    ))
+
+def _rollup_select():
+    evidence = Update.evidence_status
+    week = _week(UpdateAuthor.date)
+    return (
+        select(
+            UpdateAuthor.author, UpdateAuthor.project_pk, week, func.count(),
+            *[func.sum(case((evidence == status, 1), else_=0)) for status in EVIDENCE_STATUSES],
+            func.max(UpdateAuthor.date),
+        )
+        .join(Update, Update.pk == UpdateAuthor.update_pk)
+        .group_by(UpdateAuthor.author, UpdateAuthor.project_pk, week)
+    )
+
+_ROLLUP_COLUMNS = ["author", "project_pk", "week", "updates", *EVIDENCE_STATUSES, "last_date"]
+
+def refresh_cells(db: Session, cells):
+    """Recomputes the given (author, project pk, week) rollup rows from update_authors."""
+    cells = [tuple(c) for c in cells]
+    if not cells:
+        return
+    db.execute(delete(AuthorRollup).where(tuple_(AuthorRollup.author, AuthorRollup.project_pk, AuthorRollup.week).in_(cells)))
+    source = _rollup_select().where(
+        UpdateAuthor.author.in_({author for author, _, _ in cells}),
+        tuple_(UpdateAuthor.author, UpdateAuthor.project_pk, _week(UpdateAuthor.date)).in_(cells),
+    )
+    db.execute(insert(AuthorRollup.__table__).from_select(_ROLLUP_COLUMNS, source))
+
+def forget_updates(db: Session, update_pks):
+    """
+    Drops the feed rows of updates that are about to be deleted (`update_pks` is a
+    select of Update.pk) and recomputes the rollup cells they counted in.
+    """
+    deleted = db.execute(
+        delete(UpdateAuthor)
+        .where(UpdateAuthor.update_pk.in_(update_pks))
+        .returning(UpdateAuthor.author, UpdateAuthor.project_pk, UpdateAuthor.date)
+    ).all()
+    refresh_cells(db, {(author, p_pk, week_of(date)) for author, p_pk, date in deleted})
+
+def clear_project(db: Session, project_pk: int):
+    """Deletes a project's feed rows and rollups, e.g. before its updates are bulk-deleted."""
+    db.execute(delete(AuthorRollup).where(AuthorRollup.project_pk == project_pk))
+    db.execute(delete(UpdateAuthor).where(UpdateAuthor.project_pk == project_pk))
+
+def rebuild_author_rollups(db: Session, project_id: str = None):
+    """Re-derives update_authors and author_rollups from Update.author (backfill, or after a bulk restore)."""
+    updates = (
+        db.query(Update.pk, Update.author, Update.date, Hypothesis.project_pk)
+        .join(Hypothesis, Update.hypothesis_pk == Hypothesis.pk)
+    )
+    rollups = _rollup_select()
+    if project_id:
+        pk = project_pk(project_id)
+        db.execute(delete(AuthorRollup).where(AuthorRollup.project_pk == pk))
+        db.execute(delete(UpdateAuthor).where(UpdateAuthor.project_pk == pk))
+        updates = updates.filter(Hypothesis.project_pk == pk)
+        rollups = rollups.where(UpdateAuthor.project_pk == pk)
+    else:
+        db.execute(delete(AuthorRollup))
+        db.execute(delete(UpdateAuthor))
+
+    rows = []
+    for u_pk, author, date, p_pk in updates.yield_per(REBUILD_BATCH_SIZE):
+        rows.extend({"update_pk": u_pk, "author": name, "project_pk": p_pk, "date": date} for name in split_authors(author))
+        if len(rows) >= REBUILD_BATCH_SIZE:
+            db.execute(insert(UpdateAuthor.__table__), rows)
+            rows = []
+    if rows:
+        db.execute(insert(UpdateAuthor.__table__), rows)
+    db.execute(insert(AuthorRollup.__table__).from_select(_ROLLUP_COLUMNS, rollups))
+
+# --- READING ---
+
+def list_authors(db: Session) -> list:
+    return [a for (a,) in db.execute(select(AuthorRollup.author).distinct().order_by(AuthorRollup.author))]
+
+def author_summary(db: Session, author: str):
+    """
+    Totals, evidence mix, projects touched and updates per week for one author,
+    from their rollup rows. None if they have no updates.
+    """
+    rows = db.execute(
+        select(AuthorRollup, Project.id, Project.title)
+        .join(Project, Project.pk == AuthorRollup.project_pk)
+        .where(AuthorRollup.author == author)
+    ).all()
+    if not rows:
+        return None
+
+    evidence = dict.fromkeys(EVIDENCE_STATUSES, 0)
+    projects, weekly = {}, {}
+    for rollup, p_id, title in rows:
+        for status in EVIDENCE_STATUSES:
+            evidence[status] += getattr(rollup, status)
+        project = projects.setdefault(p_id, {"id": p_id, "title": title, "updates": 0, "last_date": None})
+        project["updates"] += rollup.updates
+        project["last_date"] = max(project["last_date"] or 0, rollup.last_date or 0)
+        weekly[rollup.week] = weekly.get(rollup.week, 0) + rollup.updates
+    return {
+        "author": author,
+        "updates": sum(weekly.values()),
+        "evidence": evidence,
+        "projects": sorted(projects.values(), key=lambda p: p["last_date"], reverse=True),
+        "weekly": [{"week": week, "updates": n} for week, n in sorted(weekly.items())],
+        "last_date": max(p["last_date"] for p in projects.values()),
+    }
+
+def activity_page(db: Session, author: str, cursor: str = None, page_size: int = DEFAULT_PAGE_SIZE) -> dict:
+    """
+    One page of an author's updates, newest first: {"items": [...], "next_cursor": str or None}.
+    `page_size=None` returns everything.
+    """
+    q = (
+        select(UpdateAuthor.date, UpdateAuthor.update_pk, Update.id, Update.content, Update.evidence_status,
+               Hypothesis.id, Hypothesis.statement, Project.id, Project.title)
+        .join(Update, Update.pk == UpdateAuthor.update_pk)
+        .join(Hypothesis, Hypothesis.pk == Update.hypothesis_pk)
+        .join(Project, Project.pk == UpdateAuthor.project_pk)
+        .where(UpdateAuthor.author == author)
+        .order_by(UpdateAuthor.date.desc(), UpdateAuthor.update_pk.desc())
+    )
+    if cursor:
+        try:
+            date, u_pk = (int(part) for part in cursor.split(":"))
+        except ValueError:
+            raise ValueError(f"Invalid activity cursor: {cursor!r}")
+        q = q.where(or_(UpdateAuthor.date < date, and_(UpdateAuthor.date == date, UpdateAuthor.update_pk < u_pk)))
+    if page_size is not None:
+        q = q.limit(page_size + 1)
+    rows = db.execute(q).all()
+
+    next_cursor = None
+    if page_size is not None and len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = f"{rows[-1][0]}:{rows[-1][1]}"
+    items = [{
+        "update_id": u_id,
+        "project_id": p_id,
+        "project_title": title,
+        "hypothesis_id": h_id,
+        "hypothesis_statement": statement,
+        "date": date,
+        "content": content,
+        "evidence": evidence,
+    } for date, _, u_id, content, evidence, h_id, statement, p_id, title in rows]
+    return {"items": items, "next_cursor": next_cursor}
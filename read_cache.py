@@ -0,0 +1,169 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+# Process-wide read-through cache for data_manager_sql reads. Bounded by entry
+# count and by (approximate) bytes, evicting least recently used entries first.
+# Immutable values (snapshot payloads) are never invalidated by writes; mutable
+# ones (projects, hypotheses, snapshot lists) are dropped by the data-manager
+# write that changes them, after its commit.
+#
+# The cache is per process: writes made by another process or instance are not
+# seen until the entry is evicted. Set READ_CACHE=off where several instances
+# write to the same database.
+
+READ_CACHE_ENABLED = os.getenv("READ_CACHE", "on").lower() not in ("off", "0", "false")
+READ_CACHE_MAX_ENTRIES = int(os.getenv("READ_CACHE_MAX_ENTRIES", "5000"))
+READ_CACHE_MAX_BYTES = int(os.getenv("READ_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+
+def approx_size(value, _seen=None) -> int:
+    """Rough deep size in bytes. Follows containers and ORM instance attributes."""
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+
+    size = sys.getsizeof(value)
+    if isinstance(value, (str, bytes, int, float, bool)) or value is None:
+        return size
+    if isinstance(value, dict):
+        return size + sum(approx_size(k, _seen) + approx_size(v, _seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(approx_size(v, _seen) for v in value)
+    if hasattr(value, "__slots__") and not hasattr(value, "__dict__"):
+        # Slotted records (compact_tree): arrays report their buffer size themselves
+        slots = {name for cls in type(value).__mro__ for name in getattr(cls, "__slots__", ())}
+        return size + sum(approx_size(getattr(value, name, None), _seen) for name in slots)
+    if hasattr(value, "__dict__"):
+        # ORM instances: loaded column values and relationships, not the instance state
+        return size + sum(approx_size(v, _seen) for k, v in vars(value).items() if not k.startswith("_sa_"))
+    return size
+
+class ReadCache:
+    """
+    LRU cache keyed by tuples such as ("hypothesis", h_id). Entries can carry
+    tags (e.g. ("project", project_id)) so a write that touches an unknown set of
+    rows can drop everything under a tag at once.
+
+    A load that races with an invalidation is returned to its caller but not
+    stored, so a reader can never put back a value a concurrent write just replaced.
+    """
+
+    def __init__(self, max_entries=READ_CACHE_MAX_ENTRIES, max_bytes=READ_CACHE_MAX_BYTES, enabled=READ_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._entries = OrderedDict()  # key -> (value, size, tags)
+        self._tags = {}  # tag -> set of keys
+        self._bytes = 0
+        self._generation = 0  # bumped by every invalidation
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "uncacheable": 0}
+        self._by_namespace = {}
+
+    def _count(self, key, field):
+        ns = self._by_namespace.setdefault(key[0], {"hits": 0, "misses": 0})
+        ns[field] += 1
+        self._stats[field] += 1
+
+    def get_or_load(self, key, loader, tags=()):
+        """
+        Returns the cached value for `key`, or calls `loader()` and caches its result.
+        `tags` may be a callable that derives the tags from the loaded value.
+        """
+        if not self.enabled:
+            return loader()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._count(key, "hits")
+                return entry[0]
+            self._count(key, "misses")
+            generation = self._generation
+
+        value = loader()
+        if value is None:
+            # Missing rows may be created at any moment; don't remember the miss
+            return value
+
+        if callable(tags):
+            tags = tags(value)
+        size = approx_size(value)
+        with self._lock:
+            if generation != self._generation or key in self._entries:
+                return value
+            if size > self.max_bytes:
+                self._stats["uncacheable"] += 1
+                return value
+            self._entries[key] = (value, size, tuple(tags))
+            self._bytes += size
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            self._evict()
+        return value
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            self._drop(key)
+            self._stats["evictions"] += 1
+
+    def _drop(self, key):
+        value, size, tags = self._entries.pop(key)
+        self._bytes -= size
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, *keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if key in self._entries:
+                    self._drop(key)
+                    self._stats["invalidations"] += 1
+
+    def invalidate_tag(self, tag):
+        with self._lock:
+            self._generation += 1
+            for key in list(self._tags.get(tag, ())):
+                self._drop(key)
+                self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return dict(
+                self._stats,
+                enabled=self.enabled,
+                hit_rate=round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_entries=self.max_entries,
+                max_bytes=self.max_bytes,
+                by_namespace={k: dict(v) for k, v in self._by_namespace.items()},
+            )
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> ReadCache:
+    """Process-wide cache (one per Streamlit server process)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ReadCache()
+        return _cache
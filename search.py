@@ -0,0 +1,176 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+import re
+
+# Full-text index over Hypothesis.statement and Update.content.
+# SQLite uses an FTS5 virtual table, Postgres a tsvector column with a GIN index.
+# Rows are written by data_manager_sql in the same transaction as the mutation.
+# Index rows carry public (UUID) ids, which is what search results link to.
+
+SEARCH_TABLE = "search_index"
+
+_SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        body,
+        kind UNINDEXED,
+        entity_id UNINDEXED,
+        project_id UNINDEXED,
+        hypothesis_id UNINDEXED,
+        tokenize = 'porter unicode61'
+    )""",
+]
+
+_POSTGRES_DDL = [
+    f"""CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} (
+        entity_id VARCHAR PRIMARY KEY,
+        kind VARCHAR NOT NULL,
+        project_id VARCHAR,
+        hypothesis_id VARCHAR,
+        body TEXT,
+        tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', coalesce(body, ''))) STORED
+    )""",
+    f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_tsv ON {SEARCH_TABLE} USING GIN (tsv)",
+    f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_hypothesis ON {SEARCH_TABLE} (hypothesis_id)",
+    f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_project ON {SEARCH_TABLE} (project_id)",
+]
+
+def _dialect(bind):
+    return bind.dialect.name
+
+def ensure_search_index(engine):
+    """Creates the search index if missing and backfills it from existing rows."""
+    dialect = _dialect(engine)
+    if dialect == "sqlite":
+        ddl = _SQLITE_DDL
+    elif dialect == "postgresql":
+        ddl = _POSTGRES_DDL
+    else:
+        return False
+
+    with engine.begin() as conn:
+        for stmt in ddl:
+            conn.execute(text(stmt))
+        empty = conn.execute(text(f"SELECT 1 FROM {SEARCH_TABLE} LIMIT 1")).first() is None
+
+    if empty:
+        with Session(bind=engine) as db:
+            rebuild_search_index(db)
+            db.commit()
+    return True
+
+# --- INDEX MAINTENANCE ---
+
+def _delete_entity(db: Session, entity_id: str):
+    db.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE entity_id = :eid"), {"eid": entity_id})
+
+def _insert(db: Session, kind, entity_id, project_id, hypothesis_id, body):
+    db.execute(
+        text(f"INSERT INTO {SEARCH_TABLE} (body, kind, entity_id, project_id, hypothesis_id) "
+             "VALUES (:body, :kind, :eid, :pid, :hid)"),
+        {"body": body or "", "kind": kind, "eid": entity_id, "pid": project_id, "hid": hypothesis_id},
+    )
+
+def index_hypothesis(db: Session, h):
+    """Upserts the index row for a hypothesis statement. Call before commit."""
+    _delete_entity(db, h.id)
+    _insert(db, "hypothesis", h.id, h.project_id, h.id, h.statement)
+
+def index_update(db: Session, u, project_id: str):
+    """Upserts the index row for an update's content. Call before commit."""
+    _delete_entity(db, u.id)
+    _insert(db, "update", u.id, project_id, u.hypothesis.id, u.content)
+
+def remove_hypotheses(db: Session, hypothesis_ids):
+    """Drops index rows for the given hypotheses and all of their updates."""
+    ids = list(hypothesis_ids)
+    if not ids:
+        return
+    params = {f"h{i}": hid for i, hid in enumerate(ids)}
+    placeholders = ", ".join(f":{k}" for k in params)
+    db.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE hypothesis_id IN ({placeholders})"), params)
+
+def reindex_project(db: Session, project_id: str):
+    """Rebuilds all index rows of one project (used after bulk restores)."""
+    db.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE project_id = :pid"), {"pid": project_id})
+    _copy_from_tables(db, "WHERE p.id = :pid", {"pid": project_id})
+
+def rebuild_search_index(db: Session):
+    db.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    _copy_from_tables(db, "", {})
+
+def _copy_from_tables(db: Session, where: str, params: dict):
+    # Set-based copy so a rebuild doesn't go through the ORM row by row
+    db.execute(text(
+        f"INSERT INTO {SEARCH_TABLE} (body, kind, entity_id, project_id, hypothesis_id) "
+        f"SELECT coalesce(h.statement, ''), 'hypothesis', h.id, p.id, h.id "
+        f"FROM hypotheses h JOIN projects p ON p.pk = h.project_pk {where}"
+    ), params)
+    db.execute(text(
+        f"INSERT INTO {SEARCH_TABLE} (body, kind, entity_id, project_id, hypothesis_id) "
+        f"SELECT coalesce(u.content, ''), 'update', u.id, p.id, h.id "
+        f"FROM updates u JOIN hypotheses h ON h.pk = u.hypothesis_pk JOIN projects p ON p.pk = h.project_pk {where}"
+    ), params)
+
+# --- QUERY ---
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def _fts5_query(query: str):
+    # Quote every term so user input can't hit FTS5 syntax; prefix-match the last one
+    terms = _TOKEN_RE.findall(query)
+    if not terms:
+        return None
+    quoted = ['"' + t.replace('"', '""') + '"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+def search(db: Session, query: str, project_id: str = None, page: int = 0, page_size: int = 20):
+    """
+    Returns ranked hits for `query` as {"total": int, "hits": [...]}.
+    Each hit carries the project and hypothesis it belongs to so the UI can open the node.
+    """
+    query = (query or "").strip()
+    if not query:
+        return {"total": 0, "hits": []}
+
+    dialect = _dialect(db.get_bind())
+    params = {"limit": page_size, "offset": page * page_size}
+    project_filter = ""
+    if project_id:
+        project_filter = " AND s.project_id = :pid"
+        params["pid"] = project_id
+
+    if dialect == "sqlite":
+        match = _fts5_query(query)
+        if not match:
+            return {"total": 0, "hits": []}
+        params["q"] = match
+        base = f"FROM {SEARCH_TABLE} s WHERE {SEARCH_TABLE} MATCH :q{project_filter}"
+        rank = f"bm25({SEARCH_TABLE})"
+        snippet = f"snippet({SEARCH_TABLE}, 0, '**', '**', '…', 16)"
+        order = "rank ASC"
+    elif dialect == "postgresql":
+        params["q"] = query
+        base = f"FROM {SEARCH_TABLE} s WHERE s.tsv @@ websearch_to_tsquery('english', :q){project_filter}"
+        rank = "ts_rank_cd(s.tsv, websearch_to_tsquery('english', :q))"
+        snippet = ("ts_headline('english', s.body, websearch_to_tsquery('english', :q), "
+                   "'StartSel=**, StopSel=**, MaxWords=16, MinWords=6')")
+        order = "rank DESC"
+    else:
+        return {"total": 0, "hits": []}
+
+    total = db.execute(text(f"SELECT count(*) {base}"), params).scalar() or 0
+    if not total:
+        return {"total": 0, "hits": []}
+
+    rows = db.execute(text(
+        f"SELECT m.kind, m.entity_id, m.project_id, m.hypothesis_id, m.snippet, m.rank, "
+        f"p.title AS project_title, h.statement AS hypothesis_statement "
+        f"FROM (SELECT s.kind, s.entity_id, s.project_id, s.hypothesis_id, "
+        f"{snippet} AS snippet, {rank} AS rank {base} ORDER BY {order} LIMIT :limit OFFSET :offset) m "
+        f"LEFT JOIN projects p ON p.id = m.project_id "
+        f"LEFT JOIN hypotheses h ON h.id = m.hypothesis_id "
+        f"ORDER BY m.{order}"
+    ), params).mappings().all()
+
+    return {"total": total, "hits": [dict(r) for r in rows]}
@@ -68,19 +68,32 @@ echo "👤 Creating Database User and DB..."
 gcloud sql databases create $DB_NAME --instance=$DB_INSTANCE_NAME --project=$PROJECT_ID || echo "DB exists"
 gcloud sql users create $DB_USER --instance=$DB_INSTANCE_NAME --password=$DB_PASS --project=$PROJECT_ID || echo "User exists"
 
-# 7. Deploy to Cloud Run
-echo "🚀 Deploying to Cloud Run..."
 INSTANCE_CONNECTION_NAME="$PROJECT_ID:$REGION:$DB_INSTANCE_NAME"
 
 # Construct SQL Alchemy Connection String for Unix Socket
 DB_URL="postgresql+psycopg2://$DB_USER:$DB_PASS@/$DB_NAME?host=/cloudsql/$INSTANCE_CONNECTION_NAME"
 
+# 7. Migrate the schema once per deployment (instances only check the version on cold start)
+echo "🧱 Running schema migrations..."
+gcloud run jobs deploy $APP_NAME-migrate \
+    --image=$REGION-docker.pkg.dev/$PROJECT_ID/$REPO_NAME/$APP_NAME \
+    --region=$REGION \
+    --set-cloudsql-instances=$INSTANCE_CONNECTION_NAME \
+    --set-env-vars="DATABASE_URL=$DB_URL" \
+    --command=python \
+    --args=migrate.py \
+    --project=$PROJECT_ID
+gcloud run jobs execute $APP_NAME-migrate --region=$REGION --wait --project=$PROJECT_ID
+
+# 8. Deploy to Cloud Run (it may run several instances, so no per-process read cache)
+echo "🚀 Deploying to Cloud Run..."
 gcloud run deploy $APP_NAME \
     --image=$REGION-docker.pkg.dev/$PROJECT_ID/$REPO_NAME/$APP_NAME \
     --region=$REGION \
     --allow-unauthenticated \
     --add-cloudsql-instances=$INSTANCE_CONNECTION_NAME \
-    --set-env-vars="DATABASE_URL=$DB_URL" \
+    --set-env-vars="DATABASE_URL=$DB_URL,READ_CACHE=off" \
+    --cpu-boost \
     --project=$PROJECT_ID \
     --port=8080
 
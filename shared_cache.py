@@ -0,0 +1,263 @@
+import contextlib
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+# Cache shared by every process on a host (Streamlit workers, several app
+# instances behind one disk) for results that are expensive to compute: whole
+# project node maps, version hashes, reports. read_cache.py stays the per-process
+# first level for rows; this is the second level for derived results.
+#
+# Keys carry the project's change-feed revision (make_key("report", project_id,
+# revision)), so any write, from any process, moves readers to a new key and a
+# stale value is never served; TTLs and the size bound only reclaim space.
+# get_or_compute() is single-flight: on a miss one process computes while the
+# others wait for its result instead of computing the same thing again.
+#
+# SHARED_CACHE picks the backend: "sqlite" (a file in the temp dir), a path
+# ("sqlite:/var/cache/research.db"), or "off". A networked backend implements
+# the five primitives of SharedCache. Values are pickled, so point it only at
+# storage this app alone writes to.
+
+SHARED_CACHE = os.getenv("SHARED_CACHE", "sqlite")
+SHARED_CACHE_TTL = int(os.getenv("SHARED_CACHE_TTL", "3600"))
+SHARED_CACHE_MAX_BYTES = int(os.getenv("SHARED_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+SHARED_CACHE_LOCK_TIMEOUT = float(os.getenv("SHARED_CACHE_LOCK_TIMEOUT", "30"))
+SHARED_CACHE_TOUCH_INTERVAL = float(os.getenv("SHARED_CACHE_TOUCH_INTERVAL", "5"))
+
+def make_key(*parts) -> str:
+    return ":".join(str(p) for p in parts)
+
+class SharedCache:
+    """
+    Backend interface: get/set/delete plus a lock per key with an expiry, which
+    is all get_or_compute needs. Backends count their own hits and misses.
+    """
+
+    def __init__(self):
+        self._stats = {"hits": 0, "misses": 0, "computes": 0, "waits": 0, "lock_timeouts": 0}
+        self._stats_lock = threading.Lock()
+
+    def get(self, key):
+        """(True, value) on a hit, (False, None) on a miss or an expired entry."""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl: float = None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def try_lock(self, key, ttl: float) -> bool:
+        """Takes the compute lock of `key` for at most `ttl` seconds, unless another holder has it."""
+        raise NotImplementedError
+
+    def unlock(self, key):
+        raise NotImplementedError
+
+    def _count(self, field):
+        with self._stats_lock:
+            self._stats[field] += 1
+
+    def get_or_compute(self, key, compute, ttl: float = None, lock_timeout: float = SHARED_CACHE_LOCK_TIMEOUT):
+        """The cached value of `key`, or `compute()`'s result, computed by one process at a time."""
+        hit, value = self.get(key)
+        if hit:
+            return value
+        deadline = time.monotonic() + lock_timeout
+        delay = 0.01
+        while not self.try_lock(key, lock_timeout):
+            # Another process is computing it; wait for its result
+            self._count("waits")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+            hit, value = self.get(key)
+            if hit:
+                return value
+            if time.monotonic() > deadline:
+                # The holder died or is stuck; its lock expires on its own
+                self._count("lock_timeouts")
+                return compute()
+        try:
+            hit, value = self.get(key)  # filled while we were taking the lock
+            if hit:
+                return value
+            self._count("computes")
+            value = compute()
+            self.set(key, value, ttl)
+            return value
+        finally:
+            self.unlock(key)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats, backend=type(self).__name__)
+
+class NullCache(SharedCache):
+    """SHARED_CACHE=off: every call computes."""
+
+    def get(self, key):
+        self._count("misses")
+        return False, None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def try_lock(self, key, ttl):
+        return True
+
+    def unlock(self, key):
+        pass
+
+class SQLiteCache(SharedCache):
+    """
+    One SQLite file in WAL mode, shared by the processes that open it. Entries
+    expire after their TTL; past `max_bytes` the least recently read go first.
+    Hits note their read time in memory and write it back in one transaction
+    every `touch_interval` seconds (or before an eviction), so reads don't take
+    SQLite's write lock.
+    A process that forks workers must not hold a connection to the file when it
+    forks: the children would inherit SQLite's lock state for it and stop
+    excluding each other.
+    """
+
+    def __init__(self, path: str, max_bytes: int = SHARED_CACHE_MAX_BYTES, default_ttl: float = SHARED_CACHE_TTL,
+                 touch_interval: float = SHARED_CACHE_TOUCH_INTERVAL):
+        super().__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.touch_interval = touch_interval
+        self._touched = {}  # key -> last read time not yet written
+        self._touched_lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        self.owner = uuid.uuid4().hex  # lock holder id of this process
+        self._local = threading.local()
+        # Closed right away, so creating the schema before forking leaves nothing open
+        with contextlib.closing(sqlite3.connect(path, timeout=30, isolation_level=None)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL,
+                            size INTEGER NOT NULL, expires_at REAL NOT NULL, used_at REAL NOT NULL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_used_at ON entries (used_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS locks (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)")
+
+    def _connect(self):
+        # One connection per thread; autocommit, with explicit transactions where needed
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or row[1] <= now:
+            self._count("misses")
+            return False, None
+        self._touch(conn, key, now)
+        self._count("hits")
+        return True, pickle.loads(row[0])
+
+    def _touch(self, conn, key, now):
+        with self._touched_lock:
+            self._touched[key] = now
+            due = time.monotonic() - self._flushed_at >= self.touch_interval
+        if due:
+            self._flush_touches(conn)
+
+    def _flush_touches(self, conn):
+        with self._touched_lock:
+            touched, self._touched = self._touched, {}
+            self._flushed_at = time.monotonic()
+        if not touched:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("UPDATE entries SET used_at = MAX(used_at, ?) WHERE key = ?",
+                             [(used_at, key) for key, used_at in touched.items()])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def set(self, key, value, ttl=None):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                     (key, blob, len(blob), now + (ttl or self.default_ttl), now))
+        self._trim(conn, now)
+
+    def _trim(self, conn, now):
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        self._flush_touches(conn)  # so this process's recent reads count
+        excess = total - self.max_bytes
+        freed, victims = 0, []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY used_at"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def try_lock(self, key, ttl):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM locks WHERE key = ? AND expires_at <= ?", (key, now))
+            taken = conn.execute("INSERT OR IGNORE INTO locks VALUES (?, ?, ?)", (key, self.owner, now + ttl)).rowcount == 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return taken
+
+    def unlock(self, key):
+        self._connect().execute("DELETE FROM locks WHERE key = ? AND owner = ?", (key, self.owner))
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM entries")
+        conn.execute("DELETE FROM locks")
+
+    def stats(self) -> dict:
+        entries, size = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return dict(super().stats(), path=self.path, entries=entries, bytes=size, max_bytes=self.max_bytes)
+
+def make_cache(setting: str = SHARED_CACHE) -> SharedCache:
+    setting = (setting or "off").strip()
+    if setting.lower() in ("off", "0", "false", "none"):
+        return NullCache()
+    if setting == "sqlite":
+        return SQLiteCache(os.path.join(tempfile.gettempdir(), "research-app-cache.sqlite"))
+    if setting.startswith("sqlite:"):
+        return SQLiteCache(setting[len("sqlite:"):])
+    raise ValueError(f"Unknown SHARED_CACHE backend {setting!r}; use 'sqlite', 'sqlite:<path>' or 'off'")
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_shared_cache() -> SharedCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = make_cache()
+        return _cache
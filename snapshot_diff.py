@@ -0,0 +1,115 @@
+import hashlib
+import json
+
+# Structural diff between project versions. Each snapshot stores, next to its
+# payload, a hash table (Snapshot.hashes):
+#
+#     {"root": subtree hash of the whole version, "roots": [root ids],
+#      "nodes": {h_id: [parent_id, content hash, subtree hash, [child ids]]}}
+#
+# The content hash covers what a user edits on one hypothesis (statement,
+# status, metric targets, evidence), not its canvas position or derived status.
+# The subtree hash is a Merkle hash over the node's id, content hash and its
+# children's subtree hashes, so two versions agree on a subtree hash exactly
+# when the subtree is the same. diff() walks both tables from the roots and only
+# descends where subtree hashes differ: identical subtrees are skipped whole,
+# and the work grows with the changes, not with the project.
+
+DIGEST_SIZE = 8  # bytes; 64-bit hashes are plenty to tell versions of one project apart
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode(), digest_size=DIGEST_SIZE).hexdigest()
+
+def content_hash(node) -> str:
+    """Hash of a hypothesis' own content (a snapshot-shaped dict)."""
+    updates = [
+        [u.get("id"), u.get("author"), u.get("date"), u.get("content"), u.get("metrics"), u.get("evidence_status")]
+        for u in node.get("updates") or ()
+    ]
+    content = [node.get("statement"), node.get("status"), node.get("metrics") or [], updates]
+    return _digest(json.dumps(content, sort_keys=True, separators=(",", ":"), default=str))
+
+def tree_hashes(nodes) -> dict:
+    """The hash table of a version, from {h_id: snapshot-shaped dict} (a payload, a CompactTree or a live node map)."""
+    parent = {}
+    children = {}
+    content = {}
+    for h_id in nodes:
+        node = nodes[h_id]
+        parent[h_id] = node.get("parent_id")
+        content[h_id] = content_hash(node)
+    for h_id, p_id in parent.items():
+        if p_id in parent:
+            children.setdefault(p_id, []).append(h_id)
+    roots = [h_id for h_id, p_id in parent.items() if p_id not in parent]
+
+    subtree = {}
+    def visit(root):
+        # Iterative post-order; `on_path` guards against parent cycles in corrupt data
+        stack, on_path = [(root, False)], set()
+        while stack:
+            h_id, expanded = stack.pop()
+            if h_id in subtree:
+                continue
+            if not expanded:
+                on_path.add(h_id)
+                stack.append((h_id, True))
+                stack.extend((c, False) for c in children.get(h_id, ()) if c not in subtree and c not in on_path)
+                continue
+            kids = sorted(subtree[c] for c in children.get(h_id, ()) if c in subtree)
+            subtree[h_id] = _digest(h_id + content[h_id] + "".join(kids))
+    for h_id in roots:
+        visit(h_id)
+    for h_id in parent:
+        if h_id not in subtree:  # on a parent cycle, unreachable from any root
+            roots.append(h_id)
+            visit(h_id)
+
+    return {
+        "root": _digest("".join(sorted(subtree[r] for r in roots))),
+        "roots": roots,
+        "nodes": {h_id: [parent[h_id], content[h_id], subtree[h_id], children.get(h_id, [])] for h_id in parent},
+    }
+
+def diff(old: dict, new: dict) -> dict:
+    """
+    Differences from version `old` to `new` (hash tables from tree_hashes):
+    {"added", "removed", "changed", "moved": [h_id, ...]}. "changed" means the
+    node's own content differs; "moved" that its parent did.
+    """
+    result = {"added": [], "removed": [], "changed": [], "moved": []}
+    if old["root"] == new["root"]:
+        return result
+    old_nodes, new_nodes = old["nodes"], new["nodes"]
+    seen = set()
+    # Pairs of sibling lists, one per version, that still need comparing
+    stack = [(old["roots"], new["roots"])]
+    while stack:
+        old_kids, new_kids = stack.pop()
+        old_set = set(old_kids)
+        for h_id in new_kids:
+            if h_id in seen:
+                continue
+            seen.add(h_id)
+            n, o = new_nodes[h_id], old_nodes.get(h_id)
+            if o is None:
+                result["added"].append(h_id)
+                stack.append(((), n[3]))
+                continue
+            if h_id not in old_set or o[0] != n[0]:
+                result["moved"].append(h_id)
+            if o[2] == n[2]:
+                continue  # same subtree
+            if o[1] != n[1]:
+                result["changed"].append(h_id)
+            stack.append((o[3], n[3]))
+        new_set = set(new_kids)
+        for h_id in old_kids:
+            if h_id in new_set or h_id in seen:
+                continue
+            if h_id not in new_nodes:
+                # Its descendants are gone too, unless they moved (found from their new parent)
+                seen.add(h_id)
+                result["removed"].append(h_id)
+                stack.append((old_nodes[h_id][3], ()))
+    return result
@@ -0,0 +1,180 @@
+import atexit
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# "async" (default) captures snapshots on a background thread; "sync" keeps the
+# old inline behaviour, which is handy for scripts that read history right away.
+SNAPSHOT_WRITER_MODE = os.getenv("SNAPSHOT_WRITER", "async")
+# Requests for a project are grouped until it has been quiet this long (seconds),
+# but never held back longer than the max delay from the first of them.
+SNAPSHOT_DEBOUNCE_S = float(os.getenv("SNAPSHOT_DEBOUNCE_S", "1.0"))
+SNAPSHOT_MAX_DELAY_S = float(os.getenv("SNAPSHOT_MAX_DELAY_S", "5.0"))
+
+def action_label(actions) -> str:
+    """['Save hypothesis', 'Save hypothesis', 'Add update'] -> 'Save hypothesis ×2, Add update'"""
+    counts = {}
+    for action in actions:
+        if action:
+            counts[action] = counts.get(action, 0) + 1
+    return ", ".join(f"{a} ×{n}" if n > 1 else a for a, n in counts.items())
+
+class SnapshotWriter:
+    """
+    Background writer for project snapshots.
+
+    Mutations call `request(project_id, action)` after their commit and return
+    immediately. Requests for a project are debounced: the snapshot is taken once
+    the project has had no new request for `debounce` seconds (or `max_delay`
+    after the first one), so a burst of edits becomes one version labelled with
+    all of its actions. A single worker thread captures it with
+    `capture(project_id, label)`. The worker takes the project off the pending
+    set *before* capturing, so anything committed later schedules another
+    snapshot and no state is missed. `flush()` makes pending snapshots due at once.
+    A burst may mix edits from several sessions; data_manager_sql.undo_last_action
+    won't let one session revert another's (see change_feed.acting_as).
+    """
+
+    def __init__(self, capture, name="snapshot-writer", debounce=SNAPSHOT_DEBOUNCE_S, max_delay=SNAPSHOT_MAX_DELAY_S):
+        self._capture = capture
+        self._name = name
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._pending = {}  # project_id -> {"since": first request, "due": capture time, "actions": [...]}
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._stopping = False
+        self._thread = None
+        self._stats = {
+            "requested": 0,
+            "coalesced": 0,
+            "written": 0,
+            "errors": 0,
+            "last_lag_s": 0.0,
+            "max_lag_s": 0.0,
+            "last_write_s": 0.0,
+        }
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+            self._thread.start()
+
+    def request(self, project_id: str, action: str = None):
+        if not project_id:
+            return
+        now = time.time()
+        with self._lock:
+            self._stats["requested"] += 1
+            entry = self._pending.get(project_id)
+            if entry is None:
+                entry = self._pending[project_id] = {"since": now, "due": now + self.debounce, "actions": []}
+            else:
+                self._stats["coalesced"] += 1
+                entry["due"] = max(entry["due"], min(now + self.debounce, entry["since"] + self.max_delay))
+            entry["actions"].append(action)
+            self._ensure_started()
+            self._changed.notify_all()
+
+    def _next(self):
+        """Waits (lock held) for the next due project; None once stopping with nothing left."""
+        while True:
+            if not self._pending:
+                if self._stopping:
+                    return None
+                self._changed.wait()
+                continue
+            project_id, entry = min(self._pending.items(), key=lambda item: item[1]["due"])
+            wait = entry["due"] - time.time()
+            if wait <= 0:
+                del self._pending[project_id]
+                self._in_flight.add(project_id)
+                return project_id, entry
+            self._changed.wait(wait)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                due = self._next()
+            if due is None:
+                break
+            project_id, entry = due
+
+            started = time.time()
+            try:
+                self._capture(project_id, action_label(entry["actions"]))
+                ok = True
+            except Exception:
+                ok = False
+                logger.exception("Snapshot capture failed for project %s", project_id)
+
+            finished = time.time()
+            with self._lock:
+                self._in_flight.discard(project_id)
+                if ok:
+                    lag = finished - entry["since"]
+                    self._stats["written"] += 1
+                    self._stats["last_lag_s"] = lag
+                    self._stats["max_lag_s"] = max(self._stats["max_lag_s"], lag)
+                    self._stats["last_write_s"] = finished - started
+                else:
+                    self._stats["errors"] += 1
+                self._changed.notify_all()
+
+    def _busy(self, project_id=None):
+        if project_id is None:
+            return bool(self._pending or self._in_flight)
+        return project_id in self._pending or project_id in self._in_flight
+
+    def flush(self, project_id: str = None, timeout: float = None) -> bool:
+        """Writes pending snapshots (of one project, or all) now and blocks until they are written."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            for pid, entry in self._pending.items():
+                if project_id is None or pid == project_id:
+                    entry["due"] = 0
+            self._changed.notify_all()
+            while self._busy(project_id):
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+        return True
+
+    def shutdown(self, timeout: float = 30.0):
+        """Writes what is pending and stops the worker. Registered with atexit."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self.flush(timeout=timeout)
+        with self._lock:
+            self._stopping = True
+            self._changed.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            oldest = min(entry["since"] for entry in self._pending.values()) if self._pending else None
+            return dict(
+                self._stats,
+                queue_depth=len(self._pending),
+                in_flight=len(self._in_flight),
+                oldest_pending_s=(now - oldest) if oldest else 0.0,
+            )
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer(capture) -> SnapshotWriter:
+    """Process-wide writer (one per Streamlit server process)."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = SnapshotWriter(capture)
+            atexit.register(_writer.shutdown)
+        return _writer
@@ -0,0 +1,139 @@
+"""
+Cold-start instrumentation and lazy imports.
+
+    python startup.py                  # import-time breakdown of app.py
+    python startup.py --module data_manager_sql --top 20
+    python startup.py --render         # plus a timed first render (needs streamlit)
+
+Milestones are milliseconds since this module was first imported, which app.py
+does before anything else. Durations (schema check, pool warm-up) are recorded
+by the code that runs them, possibly on a background thread.
+"""
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+
+_STARTED = time.perf_counter()
+_milestones = {}
+_durations = {}
+_lock = threading.Lock()
+
+def mark(milestone: str):
+    """Records the first time `milestone` is reached in this process."""
+    with _lock:
+        _milestones.setdefault(milestone, round((time.perf_counter() - _STARTED) * 1000, 1))
+
+@contextmanager
+def timed(phase: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _durations[phase] = round((time.perf_counter() - started) * 1000, 1)
+
+def report() -> dict:
+    with _lock:
+        return {"milestones_ms": dict(_milestones), "durations_ms": dict(_durations)}
+
+class LazyModule:
+    """
+    Stands in for a module that is imported on first attribute access, so heavy
+    dependencies (pandas, numpy, custom components) stay off the cold-start path.
+    import_module is thread-safe and cheap once the module is in sys.modules.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self._name), attr)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}>"
+
+# --- REPORT ---
+
+def import_times(module: str):
+    """Runs `python -X importtime -c 'import <module>'` and returns (name, self_us, cumulative_us) rows."""
+    import subprocess
+    import sys
+
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    if proc.returncode != 0 and not rows:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"import {module} failed")
+    return rows
+
+def summarize_import_times(rows, top=15):
+    """Self time per top-level package, plus the slowest modules by cumulative time."""
+    by_package = {}
+    for name, self_us, _ in rows:
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+    return {
+        "total_ms": round(sum(self_us for _, self_us, _ in rows) / 1000, 1),
+        "packages_ms": {k: round(v / 1000, 1) for k, v in sorted(by_package.items(), key=lambda kv: -kv[1])[:top]},
+        "slowest_modules_ms": {n: round(c / 1000, 1) for n, _, c in sorted(rows, key=lambda r: -r[2])[:top]},
+    }
+
+def time_first_render(script="app.py", timeout=120):
+    """Runs the script once through Streamlit's test harness and returns its timings."""
+    from streamlit.testing.v1 import AppTest
+
+    started = time.perf_counter()
+    at = AppTest.from_file(script, default_timeout=timeout)
+    at.run()
+    return {
+        "first_render_ms": round((time.perf_counter() - started) * 1000, 1),
+        "exceptions": [str(e.value) for e in at.exception],
+        **report(),
+    }
+
+def main(argv=None):
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--render", action="store_true", help="also time a first render of app.py")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    result = {"imports": summarize_import_times(import_times(args.module), args.top)}
+    if args.render:
+        result["render"] = time_first_render()
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
+
+    imports = result["imports"]
+    print(f"import {args.module}: {imports['total_ms']} ms")
+    print("\nSelf time by package:")
+    for name, ms in imports["packages_ms"].items():
+        print(f"  {name:<40} {ms:>8.1f} ms")
+    print("\nSlowest modules (cumulative):")
+    for name, ms in imports["slowest_modules_ms"].items():
+        print(f"  {name:<40} {ms:>8.1f} ms")
+    if "render" in result:
+        render = result["render"]
+        print(f"\nFirst render: {render['first_render_ms']} ms")
+        for name, ms in render["milestones_ms"].items():
+            print(f"  reached {name:<32} {ms:>8.1f} ms")
+        for name, ms in render["durations_ms"].items():
+            print(f"  {name:<40} {ms:>8.1f} ms")
+        for e in render["exceptions"]:
+            print(f"  exception: {e}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
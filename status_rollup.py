@@ -0,0 +1,188 @@
+from models_sql import Hypothesis, project_pk
+import edges
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.orm.attributes import set_committed_value
+import json
+import os
+
+# Derived ("rolled up") status: what a hypothesis' sub-hypotheses say about it.
+# A hypothesis with evidence of its own keeps its status; an open one takes the
+# result of the first rule its children match, judged by the children's derived
+# statuses, so a result proven three levels down reaches the root. The value is
+# stored in Hypothesis.derived_status (NULL: same as the status) and kept current
+# by every write that changes a status or the graph shape: only the paths from
+# the changed nodes to the roots are recomputed, in three statements whatever the
+# depth. Extra parents (subhypothesis edges, see edges.py) count like the tree one.
+#
+# Rules are (quantifier, child status, result), quantifier "any" or "all"; set
+# STATUS_ROLLUP_RULES to a JSON list of such triples to change them.
+
+DEFAULT_RULES = [
+    ("all", "proven", "proven"),      # every sub-hypothesis holds
+    ("any", "proven", "tested"),      # some evidence below
+    ("any", "disproven", "tested"),
+    ("any", "tested", "tested"),
+]
+
+def _load_rules():
+    raw = os.getenv("STATUS_ROLLUP_RULES")
+    if not raw:
+        return list(DEFAULT_RULES)
+    rules = [tuple(rule) for rule in json.loads(raw)]
+    for quantifier, _, _ in rules:
+        if quantifier not in ("any", "all"):
+            raise ValueError(f"STATUS_ROLLUP_RULES: unknown quantifier {quantifier!r}")
+    return rules
+
+ROLLUP_RULES = _load_rules()
+
+def derive(status: str, child_counts: dict, rules=None) -> str:
+    """Derived status of a node from its own status and {child derived status: count}."""
+    if status != "open":
+        return status
+    total = sum(child_counts.values())
+    for quantifier, child_status, result in (ROLLUP_RULES if rules is None else rules):
+        n = child_counts.get(child_status, 0)
+        if (quantifier == "any" and n) or (quantifier == "all" and total and n == total):
+            return result
+    return status
+
+def _effective(status, derived):
+    return derived if derived is not None else status
+
+_set_derived = (
+    Hypothesis.__table__.update()
+    .where(Hypothesis.pk == bindparam("node_pk"))
+    .values(derived_status=bindparam("new_status"))
+)
+
+def _store(db: Session, changed: dict):
+    if not changed:
+        return
+    db.execute(_set_derived, [{"node_pk": pk, "new_status": status} for pk, status in changed.items()])
+    # Loaded instances of this session see the new values too
+    for obj in list(db.identity_map.values()):
+        if isinstance(obj, Hypothesis) and obj.pk in changed:
+            set_committed_value(obj, "derived_status", changed[obj.pk])
+
+def _children_first(parents: dict) -> list:
+    """Orders nodes ({pk: [parent pks]}) so each comes after all of its children among them."""
+    pending = {pk: 0 for pk in parents}
+    for pk, ps in parents.items():
+        for p in ps:
+            if p in pending:
+                pending[p] += 1
+    ready = [pk for pk, n in pending.items() if n == 0]
+    order = []
+    while ready:
+        pk = ready.pop()
+        order.append(pk)
+        for p in parents[pk]:
+            if p in pending:
+                pending[p] -= 1
+                if pending[p] == 0:
+                    ready.append(p)
+    # Nodes on a (corrupt) cycle never get ready; derive them last rather than not at all
+    seen = set(order)
+    return order + [pk for pk in parents if pk not in seen]
+
+def propagate(db: Session, h_pks) -> dict:
+    """
+    Recomputes the derived status of the given hypotheses (by pk) and of all their
+    ancestors, after their status, children or parents changed. Call inside the
+    write's transaction. Returns {public id: new derived status} of those that changed.
+    """
+    h_pks = [pk for pk in h_pks if pk]
+    if not h_pks:
+        return {}
+    db.flush()
+    # Ancestors through the tree and extra parents, one row per (node, parent)
+    links = edges.hierarchy()
+    path = (
+        select(Hypothesis.pk.label("pk"), links.c.parent_pk)
+        .outerjoin(links, links.c.child_pk == Hypothesis.pk)
+        .where(Hypothesis.pk.in_(h_pks))
+        .cte("path", recursive=True)
+    )
+    up, up_links = aliased(Hypothesis), edges.hierarchy()
+    path = path.union(
+        select(up.pk, up_links.c.parent_pk)
+        .join(path, up.pk == path.c.parent_pk)
+        .outerjoin(up_links, up_links.c.child_pk == up.pk)
+    )
+    nodes, parents = {}, {}
+    for pk, parent, h_id, status, derived in db.execute(
+        select(path.c.pk, path.c.parent_pk, Hypothesis.id, Hypothesis.status, Hypothesis.derived_status)
+        .join(Hypothesis, Hypothesis.pk == path.c.pk)
+    ):
+        nodes[pk] = (h_id, status, derived)
+        parents.setdefault(pk, [])
+        if parent is not None:
+            parents[pk].append(parent)
+    counts = {pk: {} for pk in nodes}
+    child_status = func.coalesce(Hypothesis.derived_status, Hypothesis.status)
+    links = edges.hierarchy()
+    for parent, status, n in db.execute(
+        select(links.c.parent_pk, child_status, func.count())
+        .join(Hypothesis, Hypothesis.pk == links.c.child_pk)
+        .where(links.c.parent_pk.in_(list(nodes)))
+        .group_by(links.c.parent_pk, child_status)
+    ):
+        counts[parent][status] = n
+
+    changed = {}
+    for pk in _children_first(parents):
+        h_id, status, derived = nodes[pk]
+        new = derive(status, counts[pk])
+        old = _effective(status, derived)
+        if new == old:
+            continue
+        changed[pk] = new
+        for parent in parents[pk]:
+            if parent in counts:
+                counts[parent][old] = counts[parent].get(old, 0) - 1
+                counts[parent][new] = counts[parent].get(new, 0) + 1
+    _store(db, changed)
+    return {nodes[pk][0]: status for pk, status in changed.items()}
+
+def recompute_project(db: Session, project_id: str) -> dict:
+    """Bulk mode: recomputes every derived status of a project from its statuses. Returns {id: new derived status}."""
+    pk = project_pk(project_id)
+    rows = db.execute(
+        select(Hypothesis.pk, Hypothesis.id, Hypothesis.status, Hypothesis.derived_status)
+        .where(Hypothesis.project_pk == pk)
+    ).all()
+    nodes = {h_pk: (h_id, status, derived) for h_pk, h_id, status, derived in rows}
+    parents = {h_pk: [] for h_pk in nodes}
+    children = {}
+    links = edges.hierarchy(pk)
+    for parent, child in db.execute(select(links.c.parent_pk, links.c.child_pk)):
+        if parent in nodes and child in nodes:
+            parents[child].append(parent)
+            children.setdefault(parent, []).append(child)
+
+    result = {}
+    for h_pk in _children_first(parents):
+        counts = {}
+        for c in children.get(h_pk, ()):
+            if c in result:
+                counts[result[c]] = counts.get(result[c], 0) + 1
+        result[h_pk] = derive(nodes[h_pk][1], counts)
+
+    changed = {h_pk: status for h_pk, status in result.items() if status != _effective(nodes[h_pk][1], nodes[h_pk][2])}
+    _store(db, changed)
+    return {nodes[h_pk][0]: status for h_pk, status in changed.items()}
+
+def status_summary(db: Session, project_id: str) -> dict:
+    """{"status": {status: n}, "derived": {status: n}} for a project, from one grouped query."""
+    derived = func.coalesce(Hypothesis.derived_status, Hypothesis.status)
+    summary = {"status": {}, "derived": {}}
+    for status, rolled_up, n in db.execute(
+        select(Hypothesis.status, derived, func.count())
+        .where(Hypothesis.project_pk == project_pk(project_id))
+        .group_by(Hypothesis.status, derived)
+    ):
+        summary["status"][status] = summary["status"].get(status, 0) + n
+        summary["derived"][rolled_up] = summary["derived"].get(rolled_up, 0) + n
+    return summary
@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+
+import pytest
+
+pytest.importorskip("msgpack")
+
+import archive
+import data_manager_sql as dm
+from database import SessionLocal
+from models_sql import Base, Hypothesis, HypothesisEdge, MetricPoint, Snapshot, Update
+from search import ensure_search_index
+from sqlalchemy import create_engine, func, select
+
+def _make_project(make_project):
+    project, root, (child,) = make_project("Archive Project", children=("Child claim",))
+    dm.add_update(child, "Archive Author", "Evidence", {"accuracy": 0.8}, "supporting")
+    dm.link_hypotheses(child, root, "supports")
+    dm.flush_snapshots(project.id)
+    return project, root, child
+
+def test_round_trip_sql_to_json_to_sql(make_project):
+    project, root, child = _make_project(make_project)
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "backup.rarc")
+
+    with SessionLocal() as db:
+        counts = archive.write_archive(path, archive.read_sql(db, [project.id]), source="sql")
+    assert counts["project"] == 1 and counts["hypothesis"] == 2 and counts["update"] == 1 and counts["edge"] == 1
+    assert counts["snapshot"] >= 1
+    assert archive.read_header(path)["version"] == archive.VERSION
+
+    # Archive -> JSON store (data_manager layout)
+    store = os.path.join(tmp, "data")
+    archive.load_json_store(archive.read_archive(path), store)
+    with open(os.path.join(store, "hypotheses.json")) as f:
+        hypotheses = json.load(f)
+    assert hypotheses[root]["children"] == [child]
+    assert hypotheses[child]["updates"][0]["content"] == "Evidence"
+    assert os.listdir(os.path.join(store, "history", project.id))
+
+    # JSON store -> a second SQL database, directly
+    engine = create_engine(f"sqlite:///{os.path.join(tmp, 'target.db')}")
+    Base.metadata.create_all(bind=engine)
+    ensure_search_index(engine)
+    archive.load_sql(archive.read_json_store(store), engine=engine)
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(Hypothesis)).scalar() == 2
+        assert conn.execute(select(Update.content)).scalar() == "Evidence"
+        assert conn.execute(select(MetricPoint.value)).scalar() == 0.8
+        # The JSON store keys snapshots by whole second, so same-second snapshots collapse
+        history = os.listdir(os.path.join(store, "history", project.id))
+        assert conn.execute(select(func.count()).select_from(Snapshot)).scalar() == len(history)
+
+    with pytest.raises(ValueError):
+        archive.load_sql(archive.read_archive(path), engine=engine)
+    archive.load_sql(archive.read_archive(path), engine=engine, replace=True)
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(Hypothesis)).scalar() == 2
+        assert conn.execute(select(HypothesisEdge.kind)).scalar() == "supports"
+
+def test_parents_come_before_children():
+    rows = [{"id": "c", "parent_id": "b"}, {"id": "b", "parent_id": "a"}, {"id": "a", "parent_id": None},
+            {"id": "x", "parent_id": "y"}, {"id": "y", "parent_id": "x"}]
+    order = [h["id"] for h in archive._parents_first(rows)]
+    assert order.index("a") < order.index("b") < order.index("c")
+    assert sorted(order) == ["a", "b", "c", "x", "y"]
@@ -0,0 +1,75 @@
+import copy
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import change_feed
+import data_manager_sql as dm
+from database import SessionLocal
+
+def _replay(project_id, nodes, cursor, limit=500):
+    """Follows the feed from `cursor` in pages of `limit`, as the app's live view does."""
+    while True:
+        changes, cursor = dm.get_changes_since(project_id, cursor, limit=limit)
+        if not changes:
+            return cursor
+        assert change_feed.apply_changes(nodes, None, changes)
+
+def test_changes_since_pages_in_revision_order(make_project):
+    project, root, _ = make_project("Feed paging")
+    start = dm.get_latest_revision(project.id)
+    for i in range(4):
+        dm.add_subhypothesis(root, f"Child {i}")
+    with SessionLocal() as db:
+        first, cursor = change_feed.changes_since(db, project.id, start, limit=3)
+        rest, end = change_feed.changes_since(db, project.id, cursor, limit=500)
+        assert change_feed.changes_since(db, project.id, end) == ([], end)
+    revisions = [c["revision"] for c in first + rest]
+    assert revisions == list(range(start + 1, end + 1)) and len(first) == 3
+    created = [c["entity_id"] for c in first + rest if c["operation"] == "create"]
+    assert created == dm.get_hypothesis(root).children
+
+def test_replayed_node_map_matches_a_full_reload(make_project):
+    project, root, (a, b) = make_project("Feed replay", children=("A", "B"))
+    nodes, cursor = dm.load_project_nodes(project.id)
+    nodes = copy.deepcopy(nodes)
+
+    dm.add_subhypothesis(a, "A1")
+    a1 = dm.get_hypothesis(a).children[0]
+    dm.add_update(a1, "Ada", "Confirmed", {"accuracy": 0.9}, "supporting")  # rolls up to A and the root
+    dm.add_update(b, "Bo", "Refuted", {}, "refuting")
+    dm.add_update(a1, "Ada", "Again", {}, "neutral")
+    dm.set_metric_target(a1, "accuracy", 0.8)
+    dm.reverse_relationship(a1)  # A1 takes A's place under the root
+    edge = dm.link_hypotheses(b, a, "subhypothesis")
+    dm.unlink_hypotheses(edge)
+    dm.add_subhypothesis(b, "B1")
+    dm.delete_hypothesis(b)
+
+    cursor = _replay(project.id, nodes, cursor, limit=4)
+    reloaded, latest = dm.load_project_nodes(project.id)
+    assert cursor == latest
+    assert nodes == reloaded
+    assert list(nodes) == list(reloaded)
+    assert len(nodes[a1]["updates"]) == 2 and nodes[a1]["children"] == [a]
+    assert {n["derived_status"] for n in nodes.values()} != {None}  # rolled-up statuses came through the feed
+
+def test_undo_asks_for_a_reload(make_project):
+    project, root, _ = make_project("Feed undo", children=("Child",))
+    dm.flush_snapshots(project.id)
+    nodes, cursor = dm.load_project_nodes(project.id)
+    dm.add_subhypothesis(root, "Other")
+    dm.flush_snapshots(project.id)
+    dm.undo_last_action(project.id)
+    changes, _ = dm.get_changes_since(project.id, cursor)
+    assert change_feed.apply_changes(copy.deepcopy(nodes), None, changes) is False
+
+@pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="needs TEST_POSTGRES_URL")
+def test_notifications_between_waits_are_kept():
+    engine = create_engine(os.environ["TEST_POSTGRES_URL"])
+    assert change_feed.wait_for_changes(engine, timeout=0) == set()  # starts listening
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_notify(:channel, 'p1:7')"), {"channel": change_feed.NOTIFY_CHANNEL})
+    assert change_feed.wait_for_changes(engine, timeout=1) == {"p1"}
+    assert change_feed.wait_for_changes(engine, timeout=0) == set()
@@ -0,0 +1,55 @@
+import data_manager_sql as dm
+from compact_tree import CompactTree
+from database import SessionLocal
+from read_cache import approx_size
+
+def _make_project(make_project):
+    project, root, (a, b) = make_project("Compact Project", children=("Child A", "Child B"))
+    dm.add_subhypothesis(a, "Grandchild")
+    for i in range(20):
+        dm.add_update(a, f"Author {i % 3}", f"Run {i}", {"accuracy": i / 20}, "supporting")
+    dm.add_update(b, "Author 0", "Negative", {}, "refuting")
+    dm.set_metric_target(a, "accuracy", 0.9)
+    dm.flush_snapshots(project.id)
+    return project, root, a, b
+
+def test_round_trips_snapshot_and_sql_state(make_project):
+    project, root, a, b = _make_project(make_project)
+    with SessionLocal() as db:
+        state = dm.capture_project_state(db, project.id)
+        from_sql = CompactTree.from_sql(db, project.id)
+
+    tree = CompactTree.from_snapshot(state)
+    assert tree.to_snapshot() == state
+    assert from_sql.to_snapshot() == state
+    assert tree.status_counts() == {"open": 2, "tested": 0, "proven": 1, "disproven": 1}
+    assert tree.node(a).children == [h for h in state[a]["children"]]
+    assert tree.node(root).parent_id is None and tree.node(a).parent_id == root
+    assert approx_size(tree) < approx_size(state)
+
+def test_cached_snapshots_are_compact_and_read_like_the_payload(make_project):
+    project, root, a, b = _make_project(make_project)
+    version = dm.get_snapshots(project.id)[0]
+    snapshot = dm.load_snapshot_hypotheses(project.id, version)
+    # The newest version holds every edit made before the flush
+    assert isinstance(snapshot, CompactTree) and snapshot[root]["statement"] == "Root claim"
+    assert len(snapshot[a]["updates"]) == 20
+
+    with SessionLocal() as db:
+        tree = CompactTree.from_snapshot(dm.capture_project_state(db, project.id))
+    h = dm.get_hypothesis(a, tree)
+    assert h.statement == "Child A" and h.status == "proven"
+    assert len(h.updates) == 20 and {u.author for u in h.updates} == {"Author 0", "Author 1", "Author 2"}
+    assert h.metrics == [{"name": "accuracy", "target": 0.9, "goal": "maximize"}]
+    assert dm.get_hypothesis("missing", tree) is None
+
+def test_irregular_ids_and_metrics_round_trip():
+    state = {
+        "root": {"id": "root", "project_id": "p", "parent_id": None, "statement": "S", "status": "custom",
+                 "metrics": [], "position": {"x": 1.0, "y": 2.0}, "children": ["c"],
+                 "updates": [{"id": "not-a-uuid", "author": "A", "date": 5, "content": "x",
+                              "metrics": {"steps": 10, "note": "n"}, "evidence_status": "neutral"}]},
+        "c": {"id": "c", "project_id": "p", "parent_id": "root", "statement": "C", "status": "open",
+              "metrics": [], "position": {}, "children": [], "updates": []},
+    }
+    assert CompactTree.from_snapshot(state).to_snapshot() == state
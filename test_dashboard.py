@@ -0,0 +1,44 @@
+import data_manager_sql as dm
+from database import SessionLocal
+from models_sql import Project
+
+def _make_projects(prefix, n):
+    ids = []
+    for i in range(n):
+        project = dm.create_project(f"{prefix} {i}", "Root")
+        ids.append(project.id)
+    # Spread last activity out: project i was last touched at second 1000 + i
+    with SessionLocal() as db:
+        for i, project_id in enumerate(ids):
+            db.query(Project).filter(Project.id == project_id).update({"last_activity": 1000 + i})
+        db.commit()
+    return ids
+
+def test_pages_cover_every_project_once_most_recent_first():
+    ids = _make_projects("Paged", 7)
+    seen, cursor = [], None
+    while True:
+        page = dm.get_dashboard_projects(cursor=cursor, title_prefix="paged", page_size=3)
+        seen += [p["id"] for p in page["projects"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ids[::-1]
+
+    # A write moves its project to the front
+    root = next(p.north_star_hypothesis_id for p in dm.get_projects() if p.id == ids[2])
+    dm.add_subhypothesis(root, "Fresh")
+    assert dm.get_dashboard_projects(title_prefix="paged", page_size=3)["projects"][0]["id"] == ids[2]
+
+def test_counts_statuses_and_last_update(make_project):
+    project, root, (a, b) = make_project("Counted_ project", "Root", children=("A", "B"))
+    dm.add_update(a, "Ada", "Worked", {}, "supporting")
+    dm.create_project("Counted other", "Root")
+
+    # "_" is matched literally, not as a LIKE wildcard
+    (row,) = dm.get_dashboard_projects(title_prefix="Counted_")["projects"]
+    assert row["id"] == project.id and row["node_count"] == 3
+    assert row["status_counts"] == {"open": 2, "tested": 0, "proven": 1, "disproven": 0}
+    assert row["last_update"] is not None
+    assert dm.get_dashboard_projects(title_prefix="Counted", status="archived")["projects"] == []
+    assert "active" in dm.get_project_statuses()
@@ -0,0 +1,94 @@
+import pytest
+
+import data_manager_sql as dm
+from database import collect_queries
+
+def _graph(make_project):
+    """Root with children A and B; C under A."""
+    project, root, (a, b) = make_project("Graph", "Root", children=("A", "B"))
+    ids = {"A": a, "B": b}
+    dm.add_subhypothesis(ids["A"], "C")
+    ids["C"] = dm.get_hypothesis(ids["A"]).children[0]
+    ids["Root"] = root
+    return project, ids
+
+def _kinds(project_id):
+    return {(link["source"], link["target"], link["kind"]) for link in dm.get_project_edges(project_id)}
+
+def test_extra_parents_and_cycle_checks(make_project):
+    project, ids = _graph(make_project)
+    # C also belongs under B, and counts towards B's rolled-up status
+    edge_id = dm.link_hypotheses(ids["B"], ids["C"], "subhypothesis")
+    assert dm.link_hypotheses(ids["B"], ids["C"], "subhypothesis") == edge_id
+    dm.add_update(ids["C"], "Ada", "Confirmed", {}, "supporting")
+    assert dm.get_hypothesis(ids["B"]).derived_status == "proven"
+    assert dm.get_hypothesis(ids["A"]).derived_status == "proven"
+
+    # Through the tree and the extra parent alike, in one query
+    with collect_queries("link_hypotheses") as stats:
+        with pytest.raises(ValueError, match="cycle"):
+            dm.link_hypotheses(ids["C"], ids["Root"], "subhypothesis")
+    assert sum("WITH RECURSIVE" in q["sql"] for q in stats.statements) == 1
+    with pytest.raises(ValueError, match="cycle"):
+        dm.link_hypotheses(ids["C"], ids["B"], "subhypothesis")
+
+    # depends_on forms its own graph; supports may point anywhere
+    dm.link_hypotheses(ids["A"], ids["B"], "depends_on")
+    with pytest.raises(ValueError, match="cycle"):
+        dm.link_hypotheses(ids["B"], ids["A"], "depends_on")
+    dm.link_hypotheses(ids["C"], ids["Root"], "supports")
+    with pytest.raises(ValueError):
+        dm.link_hypotheses(ids["A"], ids["B"], "contradicts")
+
+    assert _kinds(project.id) == {
+        (ids["Root"], ids["A"], "tree"), (ids["Root"], ids["B"], "tree"), (ids["A"], ids["C"], "tree"),
+        (ids["B"], ids["C"], "subhypothesis"), (ids["A"], ids["B"], "depends_on"), (ids["C"], ids["Root"], "supports"),
+    }
+    report = dm.generate_project_report(project.id)
+    assert "C is also a sub-hypothesis of B" in report and "A **depends on** B" in report
+
+    dm.unlink_hypotheses(edge_id)
+    assert dm.get_hypothesis(ids["B"]).derived_status in (None, "open")
+
+def test_delete_and_undo_keep_edges_consistent(make_project):
+    project, ids = _graph(make_project)
+    dm.link_hypotheses(ids["B"], ids["C"], "subhypothesis")
+    dm.link_hypotheses(ids["A"], ids["B"], "supports")
+    dm.add_update(ids["C"], "Ada", "Confirmed", {}, "supporting")
+    dm.flush_snapshots(project.id)
+
+    dm.delete_hypothesis(ids["C"])
+    assert {kind for _, _, kind in _kinds(project.id)} == {"tree", "supports"}
+    assert dm.get_hypothesis(ids["B"]).derived_status in (None, "open")
+
+    # The restored version has C again; the edges that survived come back with their ids
+    dm.flush_snapshots(project.id)
+    assert dm.undo_last_action(project.id)
+    assert (ids["A"], ids["B"], "supports") in _kinds(project.id)
+    assert dm.get_hypothesis(ids["C"]).statement == "C"
+
+def test_reverse_relationship_refuses_to_close_a_cycle(make_project):
+    project, ids = _graph(make_project)
+    dm.add_subhypothesis(ids["A"], "X")
+    ids["X"] = [c for c in dm.get_hypothesis(ids["A"]).children if c != ids["C"]][0]
+    edge_id = dm.link_hypotheses(ids["X"], ids["C"], "subhypothesis")
+
+    # A would hang under C while C still hangs under X, itself under A
+    with pytest.raises(ValueError, match="cycle"):
+        dm.reverse_relationship(ids["C"])
+    assert dm.get_hypothesis(ids["C"]).parent_id == ids["A"] and dm.get_hypothesis(ids["A"]).parent_id == ids["Root"]
+
+    dm.unlink_hypotheses(edge_id)
+    dm.reverse_relationship(ids["C"])
+    assert dm.get_hypothesis(ids["A"]).parent_id == ids["C"] and dm.get_hypothesis(ids["C"]).parent_id == ids["Root"]
+
+def test_graph_edges_carry_their_endpoints_and_kind(make_project):
+    pytest.importorskip("streamlit")
+    import app
+    project, ids = _graph(make_project)
+    edge_id = dm.link_hypotheses(ids["B"], ids["C"], "depends_on")
+    elements = app.build_cytoscape_elements(project.id, ids["Root"], dm.load_project_nodes(project.id)[0],
+                                            adjacency=dm.get_project_edges(project.id))
+    edges = {(e["source"], e["target"]): e for e in (el["data"] for el in elements) if "source" in e}
+    assert edges[(ids["A"], ids["C"])]["kind"] == "tree"
+    assert edges[(ids["B"], ids["C"])]["kind"] == "depends_on" and edges[(ids["B"], ids["C"])]["link_id"] == edge_id
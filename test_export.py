@@ -0,0 +1,37 @@
+import csv
+import io
+import json
+
+import data_manager_sql as dm
+from database import engine
+
+def _make_project(make_project, n_updates=30):
+    project, root, (child,) = make_project("Export Project", children=("Child claim",))
+    for i in range(n_updates):
+        dm.add_update(child, "Export Author", f"Run {i}", {"accuracy": i / n_updates}, "neutral")
+    return project, root, child
+
+def test_export_formats_cover_the_whole_project(make_project):
+    project, root, child = _make_project(make_project)
+
+    records = [json.loads(line) for line in "".join(dm.export_project(project.id, "jsonl")).splitlines()]
+    kinds = [r["type"] for r in records]
+    assert kinds.count("project") == 1 and kinds.count("hypothesis") == 2
+    assert kinds.count("update") == 30 and kinds.count("metric") == 30
+
+    updates = list(csv.DictReader(io.StringIO("".join(dm.export_project(project.id, "csv", "updates")))))
+    assert len(updates) == 30 and {u["hypothesis_id"] for u in updates} == {child}
+    metrics = list(csv.DictReader(io.StringIO("".join(dm.export_project(project.id, "csv", "metrics")))))
+    assert {m["name"] for m in metrics} == {"accuracy"}
+
+    md = "".join(dm.export_project(project.id, "markdown"))
+    assert md.index("Root claim") < md.index("Child claim") < md.index("Run 0")
+    assert md.count("(Export Author)") == 30
+
+def test_export_streams_and_releases_its_connection(make_project):
+    project, _, _ = _make_project(make_project, n_updates=5)
+    dm.flush_snapshots()  # the background writer holds a connection while it captures
+    chunks = dm.export_project(project.id, "jsonl")
+    next(chunks)
+    chunks.close()  # consumer stops early
+    assert engine.pool.checkedout() == 0
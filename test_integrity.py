@@ -0,0 +1,104 @@
+import json
+
+from sqlalchemy import event, text
+
+import data_manager_sql as dm
+import integrity
+from database import engine
+
+def _ids(pid):
+    with engine.connect() as conn:
+        return dict(conn.execute(text(
+            "SELECT h.statement, h.id FROM hypotheses h JOIN projects p ON p.pk = h.project_pk WHERE p.id = :p"), {"p": pid}).all())
+
+def _corrupt_project():
+    project = dm.create_project("Integrity", "Root")
+    pid, root = project.id, project.north_star_hypothesis_id
+    dm.add_subhypothesis(root, "A")
+    ids = _ids(pid)
+    dm.add_subhypothesis(ids["A"], "B")
+    dm.add_subhypothesis(_ids(pid)["B"], "C")
+    dm.add_subhypothesis(root, "D")
+    ids = _ids(pid)
+    dm.add_update(ids["D"], "Ada", "Result", {}, "supporting")
+    with engine.begin() as conn:
+        conn.execute(text("PRAGMA foreign_keys = OFF"))
+        pks = dict(conn.execute(text("SELECT statement, pk FROM hypotheses")).all())
+        # A loop A -> C -> B -> A, an orphan whose parent is gone, and a dangling north star
+        conn.execute(text("UPDATE hypotheses SET parent_pk = :c WHERE pk = :a"), {"a": pks["A"], "c": pks["C"]})
+        conn.execute(text("UPDATE hypotheses SET parent_pk = 999999 WHERE pk = :d"), {"d": pks["D"]})
+        conn.execute(text("INSERT INTO updates (id, hypothesis_pk, author, content) VALUES ('lost', 888888, 'Bo', 'x')"))
+        conn.execute(text("UPDATE projects SET north_star_hypothesis_id = 'gone' WHERE id = :p"), {"p": pid})
+    return pid, root, ids
+
+def _tree(pid):
+    with engine.connect() as conn:
+        return dict(conn.execute(text(
+            "SELECT h.id, parent.id FROM hypotheses h JOIN projects p ON p.pk = h.project_pk "
+            "LEFT JOIN hypotheses parent ON parent.pk = h.parent_pk WHERE p.id = :p"), {"p": pid}).all())
+
+def test_check_finds_each_problem_in_a_few_queries_and_repair_clears_them():
+    pid, root, ids = _corrupt_project()
+    statements = []
+    listen = lambda *args: args[2].startswith(("SELECT", "WITH")) and statements.append(args[2])
+    with engine.connect() as conn:
+        event.listen(engine, "before_cursor_execute", listen)
+        try:
+            found = integrity.check(conn)
+        finally:
+            event.remove(engine, "before_cursor_execute", listen)
+    assert len(statements) <= 10
+    assert [r["project_id"] for r in found["dangling_north_star"]] == [pid]
+    assert [r["id"] for r in found["dangling_parent"]] == [ids["D"]]
+    assert [r["id"] for r in found["orphan_update"]] == ["lost"]
+    assert len(found["cycle"]) == 1 and sorted(found["cycle"][0]["ids"]) == sorted(ids[s] for s in "ABC")
+
+    with engine.begin() as conn:
+        integrity.repair(conn, log=lambda msg: None)
+    with engine.connect() as conn:
+        assert not any(integrity.check(conn).values())
+    # The oldest root is the north star again, and nothing was lost on the way
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT north_star_hypothesis_id FROM projects WHERE id = :p"), {"p": pid}).scalar() == root
+    tree = _tree(pid)
+    assert len(tree) == 5 and tree[ids["D"]] == root and tree[ids["A"]] == root and tree[ids["C"]] == ids["B"]
+
+def test_json_store_children_rebuilt_from_parent_id(tmp_path):
+    projects = {"p": {"id": "p", "title": "P", "north_star_hypothesis_id": "r"}}
+    hyps = {h_id: {"id": h_id, "project_id": "p", "parent_id": parent, "children": children}
+            for h_id, parent, children in [("r", None, ["x", "ghost"]), ("x", "y", ["y"]), ("y", "x", []), ("z", "missing", [])]}
+    for name, data in (("projects.json", projects), ("hypotheses.json", hyps)):
+        (tmp_path / name).write_text(json.dumps(data))
+
+    assert integrity.main(["--backend", "json", "--data-dir", str(tmp_path), "--json"]) == 1
+    assert integrity.main(["--backend", "json", "--data-dir", str(tmp_path), "--repair", "--json"]) == 0
+    hyps = json.loads((tmp_path / "hypotheses.json").read_text())
+    assert hyps["r"]["children"] == ["x", "z"] and hyps["x"]["children"] == ["y"]
+    assert hyps["z"]["parent_id"] == "r" and hyps["x"]["parent_id"] == "r"
+
+def test_extra_parent_loops_are_found_and_deletes_leave_no_orphans(make_project):
+    project, root, (a, x) = make_project("Edge loop", children=("A", "X"))
+    dm.add_subhypothesis(a, "B")
+    dm.add_subhypothesis(x, "Y")
+    # Deleting a hypothesis takes its subtree along instead of stranding it as extra roots
+    dm.delete_hypothesis(x)
+    assert "Y" not in _ids(project.id)
+    with engine.connect() as conn:
+        assert not any(integrity.check(conn, project.id).values())
+
+    # B -> A as an extra parent loops back through the tree link A -> B
+    b = _ids(project.id)["B"]
+    with engine.begin() as conn:
+        pks = dict(conn.execute(text("SELECT id, pk FROM hypotheses WHERE id IN (:a, :b)"), {"a": a, "b": b}).all())
+        conn.execute(text("INSERT INTO hypothesis_edges (id, project_pk, source_pk, target_pk, kind) "
+                          "SELECT 'loop', project_pk, :b, :a, 'subhypothesis' FROM hypotheses WHERE pk = :a"),
+                     {"a": pks[a], "b": pks[b]})
+    with engine.connect() as conn:
+        found = integrity.check(conn, project.id)
+    assert [r["id"] for r in found["edge_cycle"]] == ["loop"] and found["cycle"] == []
+
+    with engine.begin() as conn:
+        integrity.repair(conn, project.id, log=lambda msg: None)
+    with engine.connect() as conn:
+        assert not any(integrity.check(conn, project.id).values())
+    assert _tree(project.id)[b] == a
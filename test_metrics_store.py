@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+
+import data_manager_sql as dm
+import metrics_store
+from database import SessionLocal
+from models_sql import Hypothesis, MetricPoint, project_pk
+
+DAY = metrics_store.SECONDS_PER_DAY
+
+def _points(rows):
+    return pd.DataFrame(rows, columns=metrics_store.POINT_COLUMNS)
+
+def test_summarize_points_slope_and_trend():
+    points = _points(
+        # Rising 0.1 per day, logged out of order
+        [("h1", f"u{i}", "accuracy", 0.5 + 0.1 * i, int(i * DAY)) for i in (2, 0, 3, 1)]
+        # Falling 2 per day, and a single point whose slope is 0
+        + [("h1", f"l{i}", "loss", 10 - 2 * i, int(i * DAY)) for i in range(3)]
+        + [("h2", "x", "accuracy", 0.3, 0)]
+    )
+    summary = metrics_store.summarize_points(points).set_index(["hypothesis_id", "name"])
+    rising, falling, single = summary.loc[("h1", "accuracy")], summary.loc[("h1", "loss")], summary.loc[("h2", "accuracy")]
+    assert rising["slope_per_day"] == pytest.approx(0.1) and rising["latest"] == pytest.approx(0.8)
+    assert (rising["points"], rising["first_date"], rising["last_date"]) == (4, 0, int(3 * DAY))
+    assert falling["slope_per_day"] == pytest.approx(-2) and (falling["max"], falling["min"]) == (10, 6)
+    assert single["slope_per_day"] == 0 and single["points"] == 1
+    assert metrics_store.summarize_points(_points([])).empty
+
+def test_evaluate_targets_for_maximize_and_minimize():
+    points = _points([
+        ("h1", "a", "accuracy", 0.95, 1), ("h1", "b", "accuracy", 0.85, 2),
+        ("h1", "c", "loss", 0.4, 1), ("h1", "d", "loss", 0.2, 2),
+    ])
+    targets = pd.DataFrame([
+        ("h1", "S", "accuracy", 0.9, "maximize"),  # best 0.95, but the latest run fell short
+        ("h1", "S", "loss", 0.25, "minimize"),
+        ("h1", "S", "f1", 0.5, "maximize"),  # never logged
+    ], columns=["hypothesis_id", "statement", "name", "target", "goal"])
+    result = metrics_store.evaluate_targets(points, targets).set_index("name")
+    assert list(result["attained"]) == [False, True, False]
+    assert result.loc["accuracy", "best"] == pytest.approx(0.95) and result.loc["loss", "best"] == pytest.approx(0.2)
+    assert result.loc["f1", "points"] == 0
+    assert metrics_store.evaluate_targets(points, targets.iloc[0:0]).empty
+
+def test_points_are_recorded_rebuilt_and_backfilled(make_project):
+    project, root, (child,) = make_project("Metrics", children=("Child",))
+    dm.add_update(child, "Ada", "Run", {"accuracy": "0.7", "loss": 1, "note": "text", "flag": True}, "neutral")
+    dm.add_update(child, "Ada", "Run", {"accuracy": 0.9}, "supporting")
+    dm.set_metric_target(child, "accuracy", 0.8)
+    evaluation = dm.evaluate_project_targets(project.id)
+    assert list(evaluation["attained"]) == [True] and evaluation["points"][0] == 2
+
+    def stored(db):
+        return sorted(db.query(MetricPoint.update_pk, MetricPoint.name, MetricPoint.value)
+                      .filter(MetricPoint.project_pk == project_pk(project.id)).all())
+
+    with SessionLocal() as db:
+        recorded = stored(db)
+        # Non-numeric values and booleans are left out
+        assert sorted((name, value) for _, name, value in recorded) == [("accuracy", 0.7), ("accuracy", 0.9), ("loss", 1.0)]
+        metrics_store.rebuild_metric_points(db, project.id)
+        assert stored(db) == recorded
+        # Updates logged before metric_points existed get their points once
+        db.query(MetricPoint).filter(MetricPoint.project_pk == project_pk(project.id)).delete(synchronize_session=False)
+        assert metrics_store.backfill_metric_points(db) == 3
+        assert metrics_store.backfill_metric_points(db) == 0
+        assert stored(db) == recorded
+        db.rollback()
+
+def test_set_metric_target_keeps_legacy_string_entries(make_project):
+    project, root, _ = make_project("Legacy metrics")
+    with SessionLocal() as db:
+        db.query(Hypothesis).filter(Hypothesis.id == root).update({"metrics": ["accuracy", "latency"]})
+        db.commit()
+    dm.set_metric_target(root, "accuracy", 0.9)
+    assert dm.get_hypothesis(root).metrics == ["latency", {"name": "accuracy", "target": 0.9, "goal": "maximize"}]
+    assert list(dm.evaluate_project_targets(project.id)["name"]) == ["accuracy"]
@@ -0,0 +1,134 @@
+import tempfile
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+import migrate
+from models_sql import AuthorRollup, Base, Change, Hypothesis, MetricPoint, Project, Snapshot, Update, project_pk
+
+# Version 1 schema: UUID strings as primary and foreign keys
+V1_DDL = [
+    """CREATE TABLE projects (id VARCHAR PRIMARY KEY, title VARCHAR NOT NULL, north_star_hypothesis_id VARCHAR,
+       status VARCHAR, members JSON, layout_mode VARCHAR, created_at INTEGER)""",
+    """CREATE TABLE hypotheses (id VARCHAR PRIMARY KEY, project_id VARCHAR REFERENCES projects(id),
+       parent_id VARCHAR REFERENCES hypotheses(id), statement TEXT NOT NULL, status VARCHAR, metrics JSON,
+       position JSON, created_at INTEGER)""",
+    """CREATE TABLE updates (id VARCHAR PRIMARY KEY, hypothesis_id VARCHAR REFERENCES hypotheses(id), author VARCHAR,
+       date INTEGER, content TEXT, metrics JSON, evidence_status VARCHAR)""",
+    """CREATE TABLE metric_points (id INTEGER PRIMARY KEY, project_id VARCHAR, hypothesis_id VARCHAR,
+       update_id VARCHAR, name VARCHAR NOT NULL, value FLOAT NOT NULL, date INTEGER)""",
+    "CREATE TABLE snapshots (id INTEGER PRIMARY KEY, project_id VARCHAR, timestamp INTEGER, data JSON)",
+    """CREATE TABLE changes (id INTEGER PRIMARY KEY, project_id VARCHAR NOT NULL, revision INTEGER NOT NULL,
+       entity VARCHAR NOT NULL, entity_id VARCHAR, operation VARCHAR NOT NULL, payload JSON, created_at INTEGER,
+       CONSTRAINT uq_changes_project_revision UNIQUE (project_id, revision))""",
+    "CREATE TABLE schema_version (version INTEGER PRIMARY KEY, applied_at INTEGER)",
+    "INSERT INTO schema_version VALUES (1, 0)",
+]
+
+# What the first release created: no metric_points, changes or schema_version yet
+BASELINE_TABLES = ("projects", "hypotheses", "updates", "snapshots")
+
+def _v1_database():
+    engine = create_engine(f"sqlite:///{tempfile.mkdtemp()}/v1.db")
+    with engine.begin() as conn:
+        for ddl in V1_DDL:
+            conn.execute(text(ddl))
+        conn.execute(text("INSERT INTO projects VALUES ('p1', 'Old', 'h-root', 'active', '[]', 'breadthfirst', 1)"))
+        conn.execute(text("INSERT INTO hypotheses VALUES ('h-root', 'p1', NULL, 'Root', 'open', '[]', '{}', 1)"))
+        for i in range(7):
+            conn.execute(text("INSERT INTO hypotheses VALUES (:id, 'p1', 'h-root', :s, 'open', '[]', '{}', 2)"),
+                         {"id": f"h-{i}", "s": f"Child {i}"})
+        conn.execute(text("INSERT INTO hypotheses VALUES ('h-deep', 'p1', 'h-3', 'Deep', 'open', '[]', '{}', 3)"))
+        conn.execute(text("""INSERT INTO updates VALUES ('u1', 'h-3', 'Ada', 5, 'Ran it', '{"accuracy": 0.7}', 'supporting')"""))
+        conn.execute(text("INSERT INTO metric_points VALUES (1, 'p1', 'h-3', 'u1', 'accuracy', 0.7, 5)"))
+        conn.execute(text("""INSERT INTO snapshots VALUES (1, 'p1', 5, '{"h-root": {"id": "h-root"}}')"""))
+        conn.execute(text("""INSERT INTO changes VALUES (1, 'p1', 1, 'update', 'u1', 'create', '{}', 5)"""))
+    return engine
+
+def test_upgrades_uuid_keys_to_surrogate_keys():
+    engine = _v1_database()
+    with engine.connect() as conn:
+        assert migrate.schema_version_of(conn) == 1
+
+    # Small batches so the backfill takes several transactions
+    migrate.migrate_v1_to_v2(engine, batch_size=3, log=lambda msg: None)
+    Base.metadata.create_all(bind=engine)
+
+    with Session(engine) as db:
+        assert migrate.schema_version_of(db.connection()) == 2
+        deep = db.query(Hypothesis).filter(Hypothesis.id == "h-deep").one()
+        assert deep.parent_id == "h-3" and deep.project_id == "p1" and deep.parent.parent_id == "h-root"
+        assert db.query(Hypothesis).filter(Hypothesis.project_pk == project_pk("p1")).count() == 9
+        update = db.query(Update).one()
+        assert update.hypothesis_id == "h-3" and update.hypothesis.statement == "Child 3"
+        point = db.query(MetricPoint).one()
+        assert (point.project_id, point.hypothesis_id, point.update_id) == ("p1", "h-3", "u1")
+        assert db.query(Snapshot).one().project_id == "p1"
+        assert db.query(Change).one().project_id == "p1"
+        assert isinstance(db.query(Project.pk).filter(Project.id == "p1").scalar(), int)
+
+    indexes = {ix["name"] for ix in inspect(engine).get_indexes("changes")}
+    assert "uq_changes_project_revision" in indexes
+    assert not any(name.endswith(migrate.STAGING_SUFFIX) for name in inspect(engine).get_table_names())
+
+def test_catch_up_copies_writes_made_during_the_backfill():
+    engine = _v1_database()
+    with engine.begin() as conn:
+        migrate._staging_tables(conn)
+    for name in migrate.V1_COPY:
+        migrate._copy_batches(engine, name, 100, lambda msg: None)
+    migrate._set_parent_pks(engine, 100)
+    # The app keeps writing to the old tables meanwhile
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE hypotheses SET statement = 'Edited', parent_id = 'h-0' WHERE id = 'h-deep'"))
+        conn.execute(text("INSERT INTO hypotheses VALUES ('h-new', 'p1', 'h-deep', 'New', 'open', '[]', '{}', 9)"))
+        conn.execute(text("DELETE FROM hypotheses WHERE id = 'h-6'"))
+    with engine.begin() as conn:
+        before = conn.execute(text("SELECT total_changes()")).scalar()
+        migrate._catch_up(conn)
+        # Only the edited, new and deleted rows: the statement and parent of h-deep, h-new and its parent, h-6
+        assert conn.execute(text("SELECT total_changes()")).scalar() - before == 5
+        migrate._swap(conn)
+
+    with Session(engine) as db:
+        deep = db.query(Hypothesis).filter(Hypothesis.id == "h-deep").one()
+        assert (deep.statement, deep.parent_id) == ("Edited", "h-0")
+        assert db.query(Hypothesis).filter(Hypothesis.id == "h-new").one().parent_id == "h-deep"
+        assert db.query(Hypothesis).filter(Hypothesis.id == "h-6").first() is None
+
+def test_upgrade_runs_every_later_step():
+    engine = _v1_database()
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE hypotheses SET status = 'proven' WHERE id = 'h-3'"))
+    migrate.upgrade(engine, log=lambda msg: None)
+    with Session(engine) as db:
+        assert migrate.schema_version_of(db.connection()) == max(migrate.MIGRATIONS)
+        rollup = db.query(AuthorRollup).one()
+        assert (rollup.author, rollup.updates, rollup.supporting, rollup.last_date) == ("Ada", 1, 1, 5)
+        # h-3 is proven, so its open root rolls up to tested
+        root = db.query(Hypothesis).filter(Hypothesis.id == "h-root").one()
+        assert root.derived_status == "tested"
+        # Last activity comes from the latest change-feed row
+        assert db.query(Project.last_activity).filter(Project.id == "p1").scalar() == 5
+
+def test_upgrade_from_the_first_release_schema():
+    engine = create_engine(f"sqlite:///{tempfile.mkdtemp()}/baseline.db")
+    with engine.begin() as conn:
+        for ddl in V1_DDL:
+            if any(ddl.startswith(f"CREATE TABLE {name} ") for name in BASELINE_TABLES):
+                conn.execute(text(ddl))
+        conn.execute(text("INSERT INTO projects VALUES ('p1', 'Old', 'h-root', 'active', '[]', 'breadthfirst', 1)"))
+        conn.execute(text("INSERT INTO hypotheses VALUES ('h-root', 'p1', NULL, 'Root', 'open', '[]', '{}', 1)"))
+        conn.execute(text("""INSERT INTO updates VALUES ('u1', 'h-root', 'Ada', 5, 'Ran it', '{"accuracy": 0.7}', 'neutral')"""))
+        conn.execute(text("""INSERT INTO snapshots VALUES (1, 'p1', 5, '{"h-root": {"id": "h-root"}}')"""))
+        assert migrate.schema_version_of(conn) == 1
+
+    migrate.upgrade(engine, log=lambda msg: None)
+    with Session(engine) as db:
+        assert migrate.schema_version_of(db.connection()) == max(migrate.MIGRATIONS)
+        assert db.query(Update).one().hypothesis_id == "h-root"
+        assert db.query(Snapshot).one().project_id == "p1"
+        assert db.query(Change).count() == 0
+        # Points of evidence logged before metric_points existed are backfilled
+        point = db.query(MetricPoint).one()
+        assert (point.name, point.value, point.update_id) == ("accuracy", 0.7, "u1")
@@ -0,0 +1,50 @@
+import data_manager_sql as dm
+import people
+from database import SessionLocal
+
+def _make_project(make_project, author):
+    project, root, (side,) = make_project(f"{author}'s project", "Root", children=("Side",))
+    for i in range(5):
+        dm.add_update(root, f"{author}, Coauthor", f"Run {i}", {}, "supporting" if i % 2 else "neutral")
+    dm.add_update(side, author, "Side run", {}, "refuting")
+    return project, root, side
+
+def test_rollups_follow_adds_and_deletes(make_project):
+    project, root, side = _make_project(make_project, "Grace")
+    summary = dm.get_author_summary("Grace")
+    assert summary["updates"] == 6 and summary["evidence"] == {"supporting": 2, "refuting": 1, "neutral": 3}
+    assert [p["id"] for p in summary["projects"]] == [project.id]
+    assert sum(w["updates"] for w in summary["weekly"]) == 6
+    assert dm.get_author_summary("Coauthor")["updates"] >= 5
+    assert "Grace" in dm.get_all_authors()
+
+    dm.delete_hypothesis(side)
+    summary = dm.get_author_summary("Grace")
+    assert summary["updates"] == 5 and summary["evidence"]["refuting"] == 0
+
+    # What the rollups hold must match a rebuild from the updates themselves
+    with SessionLocal() as db:
+        before = people.author_summary(db, "Grace")
+        people.rebuild_author_rollups(db, project.id)
+        assert people.author_summary(db, "Grace") == before
+        db.rollback()
+
+def test_activity_feed_pages_newest_first(make_project):
+    _make_project(make_project, "Linus")
+    seen, cursor = [], None
+    while True:
+        page = dm.get_author_activity("Linus", cursor=cursor, page_size=4)
+        seen += page["items"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == 6 and len({u["update_id"] for u in seen}) == 6
+    assert [u["date"] for u in seen] == sorted((u["date"] for u in seen), reverse=True)
+    assert isinstance(seen[0]["date"], int)
+    assert dm.get_updates_by_author("Linus") == seen
+    assert dm.get_author_summary("Nobody") is None
+
+def test_split_authors():
+    assert people.split_authors(" Ada, Bob; Ada ;") == ["Ada", "Bob"]
+    assert people.split_authors(None) == []
+    assert people.week_of(people.EPOCH_MONDAY + 3 * 86400) == people.EPOCH_MONDAY
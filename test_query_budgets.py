@@ -0,0 +1,68 @@
+import data_manager_sql as dm
+from database import assert_max_queries
+
+# Statement budgets per data-manager operation. Budgets are fixed while the
+# fixture project has FANOUT nodes, so an N+1 pattern blows through them.
+FANOUT = 25
+
+def _make_project(make_project):
+    project, root, _ = make_project("Budget Project", "Root hypothesis", children=[f"Child {i}" for i in range(FANOUT)])
+    nodes, _ = dm.load_project_nodes(project.id)
+    for h_id in nodes:
+        dm.add_update(h_id, "Budget Author", "Some evidence", {"accuracy": 0.5}, "neutral")
+    dm.flush_snapshots(project.id)
+    return project, [h for h in nodes if h != root]
+
+def test_read_budgets(make_project):
+    project, children = _make_project(make_project)
+    with assert_max_queries(1, "get_projects"):
+        dm.get_projects()
+    with assert_max_queries(3, "get_hypothesis"):
+        dm.get_hypothesis(children[0])
+    with assert_max_queries(1, "get_snapshots"):
+        dm.get_snapshots(project.id)
+    with assert_max_queries(5, "generate_project_report"):
+        dm.generate_project_report(project.id)
+    with assert_max_queries(2, "load_project_nodes"):
+        dm.load_project_nodes(project.id)
+    with assert_max_queries(1, "get_changes_since"):
+        dm.get_changes_since(project.id, 0)
+    with assert_max_queries(2, "search_hypotheses"):
+        dm.search_hypotheses("evidence")
+    with assert_max_queries(1, "get_dashboard_projects"):
+        dm.get_dashboard_projects(page_size=5)
+    with assert_max_queries(2, "evaluate_project_targets"):
+        dm.evaluate_project_targets(project.id)
+    oldest = dm.get_snapshots(project.id)[-1]
+    with assert_max_queries(3, "diff_versions"):
+        dm.diff_versions(project.id, oldest)
+    with assert_max_queries(1, "get_project_edges"):
+        dm.get_project_edges(project.id)
+    with assert_max_queries(1, "get_updates"):
+        dm.get_updates(children[0], limit=5)
+    with assert_max_queries(1, "get_evidence_counts"):
+        dm.get_evidence_counts(children[0])
+
+def test_write_budgets(make_project):
+    project, children = _make_project(make_project)
+    root = project.north_star_hypothesis_id
+    with assert_max_queries(16, "create_project"):
+        dm.create_project("Another", "Root")
+    with assert_max_queries(10, "add_subhypothesis"):
+        dm.add_subhypothesis(root, "One more")
+    with assert_max_queries(16, "add_update"):
+        dm.add_update(children[0], "Budget Author", "More evidence", {"accuracy": 0.7}, "supporting")
+    h = dm.get_hypothesis(children[1])
+    h.statement = "Renamed"
+    with assert_max_queries(8, "save_hypothesis"):
+        dm.save_hypothesis(h)
+    with assert_max_queries(8, "set_hypothesis_status"):
+        dm.set_hypothesis_status(children[1], "tested")
+    with assert_max_queries(17, "reverse_relationship"):
+        dm.reverse_relationship(children[2])
+    with assert_max_queries(10, "link_hypotheses"):
+        edge_id = dm.link_hypotheses(children[4], children[5], "subhypothesis")
+    with assert_max_queries(8, "unlink_hypotheses"):
+        dm.unlink_hypotheses(edge_id)
+    with assert_max_queries(17, "delete_hypothesis"):
+        dm.delete_hypothesis(children[3])
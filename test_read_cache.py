@@ -0,0 +1,67 @@
+import data_manager_sql as dm
+from database import assert_max_queries
+from read_cache import ReadCache
+
+def test_lru_bounds():
+    cache = ReadCache(max_entries=2, max_bytes=10_000, enabled=True)
+    cache.get_or_load(("a",), lambda: "x")
+    cache.get_or_load(("b",), lambda: "y")
+    cache.get_or_load(("a",), lambda: "stale")  # hit; "a" is now most recent
+    cache.get_or_load(("c",), lambda: "z")  # evicts "b"
+    assert cache.get_or_load(("a",), lambda: "stale") == "x"
+    assert cache.get_or_load(("b",), lambda: "reloaded") == "reloaded"
+    stats = cache.stats()
+    assert stats["evictions"] == 2 and stats["entries"] == 2
+
+    cache.get_or_load(("big",), lambda: "b" * 20_000)
+    assert cache.stats()["uncacheable"] == 1 and cache.stats()["bytes"] <= 10_000
+
+def test_load_racing_an_invalidation_is_not_stored():
+    cache = ReadCache(enabled=True)
+    def load():
+        cache.invalidate(("k",))  # a write commits while this read is in flight
+        return "old"
+    assert cache.get_or_load(("k",), load) == "old"
+    assert cache.get_or_load(("k",), lambda: "new") == "new"
+
+def test_writes_invalidate_cached_reads():
+    project = dm.create_project("Cache Project", "Root")
+    root = project.north_star_hypothesis_id
+    dm.flush_snapshots(project.id)
+
+    assert dm.get_hypothesis(root).children == []
+    with assert_max_queries(0, "cached get_hypothesis"):
+        dm.get_hypothesis(root)
+
+    dm.add_subhypothesis(root, "Child")
+    child_id = dm.get_hypothesis(root).children[0]
+    dm.add_update(child_id, "Cache Author", "Evidence", {}, "supporting")
+    child = dm.get_hypothesis(child_id)
+    assert child.status == "proven" and len(child.updates) == 1
+
+    dm.flush_snapshots(project.id)
+    timestamps = dm.get_snapshots(project.id)
+    assert len(timestamps) >= 1
+    snapshot = dm.load_snapshot_hypotheses(project.id, timestamps[0])
+    with assert_max_queries(0, "cached snapshot"):
+        assert dm.load_snapshot_hypotheses(project.id, timestamps[0]) is snapshot
+
+    dm.delete_hypothesis(child_id)
+    assert dm.get_hypothesis(child_id) is None
+    assert dm.get_hypothesis(root).children == []
+
+def test_edits_to_a_read_hypothesis_stay_out_of_the_cache_and_keep_updates(make_project):
+    project, root, (child,) = make_project("Cache edits", children=("Child",))
+    h = dm.get_hypothesis(child)
+    h.status = "tested"
+    h.updates.clear()
+    assert dm.get_hypothesis(child).status == "open"
+
+    # Evidence logged after `h` was read survives saving `h`
+    dm.add_update(child, "Ada", "Evidence", {}, "neutral")
+    dm.save_hypothesis(h)
+    saved = dm.get_hypothesis(child)
+    assert saved.status == "tested" and [u.content for u in saved.updates] == ["Evidence"]
+
+    dm.set_hypothesis_status(child, "disproven")
+    assert dm.get_hypothesis(child).status == "disproven" and len(dm.get_hypothesis(child).updates) == 1
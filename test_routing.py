@@ -0,0 +1,45 @@
+import os
+import tempfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Router, RoutingSession, routing_scope, use_primary
+from models_sql import Base, Project
+
+def _router():
+    # Two SQLite files stand in for a primary and a replica that never catches up
+    tmp = tempfile.mkdtemp()
+    primary = create_engine(f"sqlite:///{os.path.join(tmp, 'primary.db')}")
+    replica = create_engine(f"sqlite:///{os.path.join(tmp, 'replica.db')}")
+    for e in (primary, replica):
+        Base.metadata.create_all(bind=e)
+    return sessionmaker(class_=RoutingSession, router=Router(primary, [replica]), expire_on_commit=False)
+
+def _titles(Session):
+    with Session() as db:
+        return [p.title for p in db.query(Project).all()]
+
+def test_reads_go_to_replica_until_the_rerun_writes():
+    Session = _router()
+    with routing_scope():
+        assert _titles(Session) == []
+        with Session() as db:
+            db.add(Project(title="Written"))
+            db.commit()
+        # Pinned to the primary for the rest of the rerun
+        assert _titles(Session) == ["Written"]
+
+    # A new rerun reads from the (lagging) replica again
+    with routing_scope():
+        assert _titles(Session) == []
+        with use_primary():
+            assert _titles(Session) == ["Written"]
+
+def test_session_that_wrote_reads_its_writes():
+    Session = _router()
+    with Session() as db:
+        db.add(Project(title="Mine"))
+        db.commit()
+        assert [p.title for p in db.query(Project).all()] == ["Mine"]
+    assert _titles(Session) == []
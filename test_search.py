@@ -0,0 +1,56 @@
+import pytest
+
+import data_manager_sql as dm
+
+def _ids(result):
+    return [hit["entity_id"] for hit in result["hits"]]
+
+def test_ranks_denser_matches_first_and_pages_through_all_hits(make_project):
+    project, root, (dense, sparse) = make_project("Ranking", children=(
+        "Quasar quasar quasar emission",
+        "A long statement that mentions a quasar once among many other unrelated words about telescopes",
+    ))
+    first = dm.search_hypotheses("quasar")
+    assert first["total"] == 2 and _ids(first) == [dense, sparse]
+    assert "**" in first["hits"][0]["snippet"] and first["hits"][0]["project_title"] == "Ranking"
+
+    for i in range(5):
+        dm.add_update(root, "Ada", f"Pulsar run {i}", {}, "neutral")
+    pages = [dm.search_hypotheses("pulsar", page=page, page_size=2) for page in range(3)]
+    assert [len(p["hits"]) for p in pages] == [2, 2, 1] and {p["total"] for p in pages} == {5}
+    assert len({hit for p in pages for hit in _ids(p)}) == 5
+    assert dm.search_hypotheses("pulsar", page=3, page_size=2)["hits"] == []
+    # The last term is prefix-matched, for search-as-you-type
+    assert dm.search_hypotheses("puls")["total"] == 5
+
+def test_project_filter(make_project):
+    one, _, (a,) = make_project("Filter one", children=("Nebula survey",))
+    two, _, (b,) = make_project("Filter two", children=("Nebula catalogue",))
+    assert set(_ids(dm.search_hypotheses("nebula"))) == {a, b}
+    assert _ids(dm.search_hypotheses("nebula", project_id=one.id)) == [a]
+    assert _ids(dm.search_hypotheses("nebula", project_id=two.id)) == [b]
+
+def test_index_follows_add_delete_and_undo(make_project):
+    project, root, (child,) = make_project("Sync", children=("Magnetar claim",))
+    dm.add_update(child, "Ada", "Magnetar flare observed", {}, "supporting")
+    hits = dm.search_hypotheses("magnetar")["hits"]
+    assert {(h["kind"], h["hypothesis_id"]) for h in hits} == {("hypothesis", child), ("update", child)}
+
+    # Deleting a hypothesis drops it and its updates from the index
+    dm.delete_hypothesis(child)
+    assert dm.search_hypotheses("magnetar")["total"] == 0
+
+    dm.flush_snapshots(project.id)
+    dm.add_subhypothesis(root, "Blazar claim")
+    dm.flush_snapshots(project.id)
+    assert dm.search_hypotheses("blazar")["total"] == 1
+    dm.undo_last_action(project.id)
+    assert dm.search_hypotheses("blazar")["total"] == 0
+
+@pytest.mark.parametrize("query", [
+    '"unbalanced', "quasar*", "quasar NEAR pulsar", "NEAR(quasar pulsar)", "(oops", "oops)",
+    "AND", "OR NOT", "body:quasar", "^quasar", "***", "  ", "-", "é'\"",
+])
+def test_fts_syntax_in_user_queries_never_raises(query):
+    result = dm.search_hypotheses(query)
+    assert result["total"] >= 0 and isinstance(result["hits"], list)
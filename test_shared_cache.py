@@ -0,0 +1,57 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+import data_manager_sql as dm
+import shared_cache
+
+def _cache(**kwargs):
+    return shared_cache.SQLiteCache(os.path.join(tempfile.mkdtemp(), "cache.sqlite"), **kwargs)
+
+def test_ttl_and_size_bound():
+    cache = _cache(max_bytes=3500)
+    cache.set("short", "x", ttl=0.05)
+    assert cache.get("short") == (True, "x")
+    time.sleep(0.1)
+    assert cache.get("short") == (False, None)
+
+    for i in range(3):
+        cache.set(f"big-{i}", "y" * 1000)
+        time.sleep(0.01)
+    writes = cache._connect().total_changes
+    cache.get("big-0")  # recently read, so kept
+    assert cache._connect().total_changes == writes  # the read time is written with the next eviction
+    cache.set("big-3", "y" * 1000)
+    assert cache.get("big-0")[0] and not cache.get("big-1")[0] and cache.get("big-3")[0]
+    assert cache.stats()["bytes"] <= 3500
+
+def _compute_once(path, key, log):
+    cache = shared_cache.SQLiteCache(path)
+    def compute():
+        with open(log, "a") as f:
+            f.write("computed\n")
+        time.sleep(0.3)
+        return {"report": key}
+    return cache.get_or_compute(key, compute)
+
+def test_single_flight_across_processes():
+    tmp = tempfile.mkdtemp()
+    path, log = os.path.join(tmp, "cache.sqlite"), os.path.join(tmp, "computes.log")
+    shared_cache.SQLiteCache(path)  # create the schema before the workers race
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        results = pool.starmap(_compute_once, [(path, "report:p1:7", log)] * 4)
+    assert results == [{"report": "report:p1:7"}] * 4
+    with open(log) as f:
+        assert f.read().count("computed") == 1
+
+def test_reports_are_keyed_by_revision(monkeypatch):
+    project = dm.create_project("Shared", "Root")
+    first = dm.generate_project_report(project.id)
+    # A cached report is stamped with the time it was asked for, not the time it was built
+    monkeypatch.setattr(time, "strftime", lambda fmt, *args: "later")
+    again = dm.generate_project_report(project.id)
+    assert "Generated: later" in again and again.split("\n", 2)[2] == first.split("\n", 2)[2]
+    monkeypatch.undo()
+    dm.add_subhypothesis(project.north_star_hypothesis_id, "New child")
+    assert "New child" in dm.generate_project_report(project.id)
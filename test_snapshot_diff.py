@@ -0,0 +1,57 @@
+import copy
+
+import data_manager_sql as dm
+import snapshot_diff
+
+def _node(h_id, parent_id, statement, status="open"):
+    return {"id": h_id, "parent_id": parent_id, "statement": statement, "status": status,
+            "metrics": [], "position": {}, "children": [], "updates": []}
+
+def _version():
+    nodes = {"root": _node("root", None, "Root")}
+    for branch in range(5):
+        nodes[f"b{branch}"] = _node(f"b{branch}", "root", f"Branch {branch}")
+        for leaf in range(20):
+            h_id = f"b{branch}-{leaf}"
+            nodes[h_id] = _node(h_id, f"b{branch}", f"Leaf {branch}.{leaf}")
+    return nodes
+
+def test_diff_finds_each_kind_of_change():
+    old = _version()
+    new = copy.deepcopy(old)
+    new["b0-3"]["status"] = "proven"
+    new["b1-4"]["parent_id"] = "b2"
+    del new["b3-0"]
+    new["fresh"] = _node("fresh", "b4", "Fresh")
+    new["b4-1"]["position"] = {"x": 10, "y": 20}  # layout isn't content
+
+    changes = snapshot_diff.diff(snapshot_diff.tree_hashes(old), snapshot_diff.tree_hashes(new))
+    assert changes == {"added": ["fresh"], "removed": ["b3-0"], "changed": ["b0-3"], "moved": ["b1-4"]}
+    assert snapshot_diff.diff(snapshot_diff.tree_hashes(old), snapshot_diff.tree_hashes(old)) == {
+        "added": [], "removed": [], "changed": [], "moved": []}
+
+def test_identical_subtrees_are_skipped():
+    old = snapshot_diff.tree_hashes(_version())
+    changed = _version()
+    changed["b0-3"]["statement"] = "Reworded"
+    new = snapshot_diff.tree_hashes(changed)
+    # The walk never looks inside untouched branches, so breaking them can't matter
+    for h_id, entry in old["nodes"].items():
+        if not h_id.startswith("b0") and h_id != "root":
+            entry[3] = ["missing"]
+    assert snapshot_diff.diff(old, new)["changed"] == ["b0-3"]
+
+def test_diff_against_the_current_state():
+    project = dm.create_project("Versions", "Root")
+    root = project.north_star_hypothesis_id
+    dm.add_subhypothesis(root, "Child")
+    dm.flush_snapshots(project.id)
+    first = dm.get_snapshots(project.id)[0]
+    child = dm.get_hypothesis(root).children[0]
+    dm.add_update(child, "Ada", "Confirmed", {}, "supporting")
+    dm.add_subhypothesis(child, "Grandchild")
+    dm.flush_snapshots(project.id)
+
+    changes = dm.diff_versions(project.id, first)
+    assert changes["changed"] == [child] and len(changes["added"]) == 1 and not changes["removed"]
+    assert dm.get_snapshot_hashes(project.id, first)["nodes"][child][3] == []
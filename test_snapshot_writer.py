@@ -0,0 +1,62 @@
+import threading
+
+import data_manager_sql as dm
+from snapshot_writer import SnapshotWriter, action_label
+
+def test_bursts_become_one_labelled_version():
+    captured = []
+    done = threading.Event()
+    def capture(project_id, label):
+        captured.append((project_id, label))
+        done.set()
+    writer = SnapshotWriter(capture, debounce=0.2, max_delay=5.0)
+    for action in ("Save hypothesis", "Save hypothesis", "Add update"):
+        writer.request("p1", action)
+    assert done.wait(2)
+    assert writer.flush(timeout=2)
+    assert captured == [("p1", "Save hypothesis ×2, Add update")]
+    assert writer.stats()["coalesced"] == 2
+    writer.shutdown()
+    assert action_label([None, "Delete hypothesis"]) == "Delete hypothesis"
+
+def test_versions_are_unique_and_labelled():
+    project = dm.create_project("Versions", "Root")
+    root = project.north_star_hypothesis_id
+    dm.flush_snapshots(project.id)
+    dm.add_subhypothesis(root, "Child")
+    dm.add_subhypothesis(root, "Other child")
+    dm.flush_snapshots(project.id)
+    # Several versions within one second still get their own ids
+    first = dm.save_snapshot(project.id, "Manual")
+    second = dm.save_snapshot(project.id)
+
+    history = dm.get_snapshot_history(project.id)
+    assert [entry["version"] for entry in history[:2]] == [second, first] and second > first
+    assert history[1]["action"] == "Manual"
+    assert history[2]["action"] == "Add subhypothesis ×2"
+    assert len(dm.load_snapshot_hypotheses(project.id, history[2]["version"])) == 3
+    assert dm.diff_versions(project.id, first, second) == {"added": [], "removed": [], "changed": [], "moved": []}
+
+def test_undo_as_an_actor_reverts_only_their_own_edits(make_project):
+    import change_feed
+    project, root, _ = make_project("Two editors")
+    dm.flush_snapshots(project.id)
+    # Edits from two sessions in one debounce window share a version
+    with change_feed.acting_as("ada"):
+        dm.add_subhypothesis(root, "Ada's claim")
+    with change_feed.acting_as("bo"):
+        dm.add_subhypothesis(root, "Bo's claim")
+    dm.flush_snapshots(project.id)
+    with change_feed.acting_as("ada"):
+        assert not dm.undo_last_action(project.id)
+    assert len(dm.get_hypothesis(root).children) == 2
+
+    with change_feed.acting_as("ada"):
+        dm.set_hypothesis_status(root, "tested")
+        dm.flush_snapshots(project.id)
+        assert dm.undo_last_action(project.id)
+    h = dm.get_hypothesis(root)
+    assert h.status == "open" and len(h.children) == 2
+    # Going back further would drop Ada's claim too
+    with change_feed.acting_as("bo"):
+        assert not dm.undo_last_action(project.id)
@@ -0,0 +1,46 @@
+import threading
+
+import pytest
+from sqlalchemy import text
+
+import data_manager_sql as dm
+import database
+
+pytestmark = pytest.mark.skipif(not database.router.current, reason="needs SQLITE_MODE=concurrent on a SQLite file")
+
+def test_pragmas_and_pools():
+    dm.get_projects()
+    for e in database.router.engines:
+        with e.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == int(database.SQLITE_PRAGMAS["busy_timeout"])
+    assert database.engine.pool.size() == 1
+
+def test_writers_queue_while_readers_run():
+    project = dm.create_project("Concurrent", "Root")
+    root = project.north_star_hypothesis_id
+    errors = []
+    def write(i):
+        try:
+            for j in range(5):
+                dm.add_subhypothesis(root, f"Child {i}.{j}")
+        except Exception as e:
+            errors.append(e)
+
+    # A reader isn't blocked by an open write transaction, and sees only committed rows
+    committed = dm.get_latest_revision(project.id)
+    with dm.unit_of_work():
+        dm.add_subhypothesis(root, "Child")
+        seen = []
+        reader = threading.Thread(target=lambda: seen.append(dm.get_latest_revision(project.id)))
+        reader.start()
+        reader.join(5)
+        assert seen == [committed]
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert len(dm.get_hypothesis(root).children) == 41
@@ -0,0 +1,73 @@
+import pytest
+
+import data_manager_sql as dm
+import status_rollup
+from database import SessionLocal, collect_queries
+from models_sql import Hypothesis, project_pk
+
+def _derived(project_id):
+    with SessionLocal() as db:
+        rows = db.query(Hypothesis.statement, Hypothesis.status, Hypothesis.derived_status).filter(
+            Hypothesis.project_pk == project_pk(project_id))
+        return {s: d or status for s, status, d in rows}
+
+def _chain(depth):
+    project = dm.create_project("Rollup", "Root")
+    h_id = project.north_star_hypothesis_id
+    dm.add_subhypothesis(h_id, "Sibling")
+    for i in range(depth):
+        dm.add_subhypothesis(h_id, f"Level {i}")
+        h_id = [c for c in dm.get_hypothesis(h_id).children if dm.get_hypothesis(c).statement == f"Level {i}"][0]
+    return project, h_id
+
+def test_evidence_rolls_up_the_ancestor_path():
+    project, leaf = _chain(6)
+    with collect_queries("add_update") as stats:
+        dm.add_update(leaf, "Ada", "Confirmed", {}, "supporting")
+    derived = _derived(project.id)
+    # Every open level above the leaf has only proven children; the root also has an open sibling
+    assert all(derived[f"Level {i}"] == "proven" for i in range(6))
+    assert derived["Root"] == "tested" and derived["Sibling"] == "open"
+    assert dm.get_hypothesis(project.north_star_hypothesis_id).derived_status == "tested"
+    # Recomputing the path costs the same statements at any depth
+    assert sum("WITH RECURSIVE" in q["sql"] for q in stats.statements) == 1
+
+    sibling = [c for c in dm.get_hypothesis(project.north_star_hypothesis_id).children
+               if dm.get_hypothesis(c).statement == "Sibling"][0]
+    dm.delete_hypothesis(sibling)
+    assert _derived(project.id)["Root"] == "proven"
+    assert "**OPEN** (rolls up to proven): Root" in dm.generate_project_report(project.id)
+
+    dm.add_update(leaf, "Ada", "Failed to replicate", {}, "refuting")
+    derived = _derived(project.id)
+    assert derived["Level 5"] == "disproven" and derived["Level 4"] == "tested"
+    summary = dm.get_status_summary(project.id)
+    assert summary["status"] == {"open": 6, "disproven": 1} and summary["derived"] == {"tested": 6, "disproven": 1}
+
+def test_bulk_recompute_matches_incremental():
+    project, leaf = _chain(3)
+    dm.add_update(leaf, "Ada", "Confirmed", {}, "supporting")
+    incremental = _derived(project.id)
+    with SessionLocal() as db:
+        db.query(Hypothesis).filter(Hypothesis.project_pk == project_pk(project.id)).update(
+            {Hypothesis.derived_status: None}, synchronize_session=False)
+        assert set(status_rollup.recompute_project(db, project.id))
+        db.commit()
+    assert _derived(project.id) == incremental
+
+def test_rules_are_configurable():
+    rules = [("any", "disproven", "disproven")]
+    assert status_rollup.derive("open", {"disproven": 1, "proven": 3}, rules) == "disproven"
+    assert status_rollup.derive("open", {"proven": 3}, rules) == "open"
+    assert status_rollup.derive("proven", {"disproven": 1}, rules) == "proven"
+    assert status_rollup.derive("open", {}) == "open"
+
+def test_live_summary_shows_the_roll_up(make_project):
+    pytest.importorskip("streamlit")
+    import app
+    project, root, (child,) = make_project("Summary", children=("Child",))
+    dm.add_update(child, "Ada", "Confirmed", {}, "supporting")
+    # The live view passes its (non-empty) node map, as app.main does
+    nodes, _ = dm.load_project_nodes(project.id)
+    assert "**Rolled up**: 2 proven" in app.build_project_summary(project.id, nodes, live=True)
+    assert "Rolled up" not in app.build_project_summary(project.id, nodes)
@@ -0,0 +1,42 @@
+import pytest
+from sqlalchemy import text
+
+import data_manager_sql as dm
+from database import SessionLocal, engine
+from models_sql import Hypothesis, Update
+
+def _hypothesis_with_updates(n):
+    project = dm.create_project("Timeline", "Root")
+    root = project.north_star_hypothesis_id
+    with SessionLocal() as db:
+        h_pk = db.query(Hypothesis.pk).filter(Hypothesis.id == root).scalar()
+        # Several updates share a date, so the pk has to break ties
+        db.add_all(Update(hypothesis_pk=h_pk, author="Ada", content=f"Run {i}", date=1000 + i // 3,
+                          evidence_status=("supporting", "refuting", "neutral")[i % 3]) for i in range(n))
+        db.commit()
+    return root
+
+def test_pages_walk_every_update_newest_first():
+    root = _hypothesis_with_updates(50)
+    seen, cursor = [], None
+    while True:
+        page = dm.get_updates(root, before=cursor, limit=7)
+        seen += [u["content"] for u in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"Run {i}" for i in range(50)][::-1]
+    with pytest.raises(ValueError):
+        dm.get_updates(root, before="not-a-cursor")
+
+    with engine.connect() as conn:
+        plan = " ".join(str(row[-1]) for row in conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT pk FROM updates WHERE hypothesis_pk = 1 ORDER BY date DESC, pk DESC LIMIT 8")))
+    assert "ix_updates_hypothesis_date" in plan and "TEMP B-TREE" not in plan
+
+def test_evidence_counts_are_cached_until_a_write():
+    root = _hypothesis_with_updates(9)
+    assert dm.get_evidence_counts(root) == {"supporting": 3, "refuting": 3, "neutral": 3, "total": 9}
+    dm.add_update(root, "Bob", "One more", {}, "refuting")
+    assert dm.get_evidence_counts(root)["refuting"] == 4
+    assert dm.get_updates(root, limit=1)["items"][0]["content"] == "One more"
@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+from sqlalchemy import event
+
+import data_manager_sql as dm
+from database import SessionLocal, engine
+from models_sql import Snapshot
+
+@pytest.fixture
+def commits():
+    dm.get_projects()  # the schema is created on first use
+    counted = []
+    caller = threading.get_ident()
+    # Snapshots commit on the writer thread
+    listener = lambda conn: counted.append(1) if threading.get_ident() == caller else None
+    event.listen(engine, "commit", listener)
+    yield counted
+    event.remove(engine, "commit", listener)
+
+def test_each_action_commits_once(commits):
+    project = dm.create_project("Unit", "Root")
+    assert len(commits) == 1
+    root = project.north_star_hypothesis_id
+    dm.add_subhypothesis(root, "Child")
+    child = dm.get_hypothesis(root).children[0]
+    del commits[:]
+    dm.add_update(child, "Ada", "Confirmed", {"accuracy": 0.9}, "supporting")
+    dm.reverse_relationship(child)
+    assert len(commits) == 2
+    dm.flush_snapshots(project.id)
+    with SessionLocal() as db:
+        snap = db.query(Snapshot).order_by(Snapshot.id.desc()).first()
+        assert snap.timestamp == snap.version // 1_000_000 and snap.action.endswith("Add subhypothesis, Reverse relationship")
+
+def test_failed_action_rolls_back_together():
+    project = dm.create_project("Rollback", "Root")
+    root = project.north_star_hypothesis_id
+    revision = dm.get_latest_revision(project.id)
+    with pytest.raises(ValueError, match="cycle"):
+        with dm.unit_of_work():
+            dm.add_subhypothesis(root, "Child")
+            child = dm.get_hypothesis(root).children[0]  # visible inside the unit
+            dm.link_hypotheses(child, root, "subhypothesis")
+    assert dm.get_hypothesis(root).children == []
+    assert dm.get_latest_revision(project.id) == revision
+
+def test_batch_is_one_transaction_and_one_version(commits):
+    project = dm.create_project("Batch", "Root")
+    root = project.north_star_hypothesis_id
+    dm.flush_snapshots(project.id)
+    versions = len(dm.get_snapshots(project.id))
+    del commits[:]
+    with dm.unit_of_work():
+        for i in range(5):
+            dm.add_subhypothesis(root, f"Child {i}")
+        dm.set_metric_target(root, "accuracy", 0.9)
+    assert len(commits) == 1
+    dm.flush_snapshots(project.id)
+    history = dm.get_snapshot_history(project.id)
+    assert len(history) == versions + 1
+    assert history[0]["action"] == "Add subhypothesis ×5, Set metric target"
+    assert len(dm.get_hypothesis(root).children) == 5
@@ -0,0 +1,68 @@
+from models_sql import Hypothesis, Update
+from people import EVIDENCE_STATUSES
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+
+# Evidence timeline of one hypothesis for the node panel. Pages are
+# keyset-paginated on (date, pk), newest first, through the index on
+# (hypothesis_pk, date, pk), so a hypothesis with thousands of logged results
+# costs one short index range per page. Evidence counts per type are one
+# grouped query, cached by data_manager_sql until the next write.
+
+DEFAULT_PAGE_SIZE = 25
+
+def encode_cursor(date, pk) -> str:
+    return f"{date or 0}:{pk}"
+
+def decode_cursor(cursor: str):
+    try:
+        date, pk = cursor.split(":")
+        return int(date), int(pk)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid timeline cursor: {cursor!r}")
+
+def updates_page(db: Session, hypothesis_id: str, before: str = None, limit: int = DEFAULT_PAGE_SIZE) -> dict:
+    """
+    Updates of a hypothesis older than the `before` cursor, newest first:
+    {"items": [...], "next_cursor": str or None}. Pass `next_cursor` back as
+    `before` for the following page.
+    """
+    h_pk = select(Hypothesis.pk).where(Hypothesis.id == hypothesis_id).scalar_subquery()
+    q = (
+        select(Update.pk, Update.id, Update.author, Update.date, Update.content, Update.metrics, Update.evidence_status)
+        .where(Update.hypothesis_pk == h_pk)
+        .order_by(Update.date.desc(), Update.pk.desc())
+        .limit(limit + 1)
+    )
+    if before:
+        date, pk = decode_cursor(before)
+        q = q.where(or_(Update.date < date, and_(Update.date == date, Update.pk < pk)))
+    rows = db.execute(q).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].date, rows[-1].pk)
+    items = [{
+        "id": r.id,
+        "author": r.author,
+        "date": r.date,
+        "content": r.content,
+        "metrics": r.metrics or {},
+        "evidence_status": r.evidence_status,
+    } for r in rows]
+    return {"items": items, "next_cursor": next_cursor}
+
+def evidence_counts(db: Session, hypothesis_id: str) -> dict:
+    """{"supporting", "refuting", "neutral", "total"} for one hypothesis."""
+    rows = db.execute(
+        select(Update.evidence_status, func.count())
+        .join(Hypothesis, Hypothesis.pk == Update.hypothesis_pk)
+        .where(Hypothesis.id == hypothesis_id)
+        .group_by(Update.evidence_status)
+    ).all()
+    counts = dict.fromkeys(EVIDENCE_STATUSES, 0)
+    for status, n in rows:
+        counts[status if status in counts else "neutral"] += n
+    counts["total"] = sum(counts.values())
+    return counts